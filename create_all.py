@@ -10,5 +10,6 @@ async def main():
         await conn.run_sync(SQLModel.metadata.drop_all)
         await conn.run_sync(SQLModel.metadata.create_all)
         await conn.commit()
+    await engine.dispose()
 
 asyncio.run(main())
\ No newline at end of file
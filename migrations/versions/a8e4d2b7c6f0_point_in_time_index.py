@@ -0,0 +1,32 @@
+"""index of the versions current at a point in time, for as_of listings
+
+Revision ID: a8e4d2b7c6f0
+Revises: c4d1e8f2a7b3
+Create Date: 2026-10-19 11:27:35.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8e4d2b7c6f0'
+down_revision: Union[str, None] = 'c4d1e8f2a7b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = {'tenants': 'tenant', 'hosts': 'host', 'oauth_clients': 'oauthclient'}
+
+
+def upgrade() -> None:
+    for table_name, entity in TABLES.items():
+        op.create_index(f'ix_{entity}_modified_deleted', table_name, ['modified', 'deleted', 'uid'], 
+                        unique=False)
+
+
+def downgrade() -> None:
+    for table_name, entity in TABLES.items():
+        op.drop_index(f'ix_{entity}_modified_deleted', table_name=table_name)
@@ -0,0 +1,47 @@
+"""unique index over the active version of each URN
+
+Versions left active by concurrent creates racing on the same URN are
+retired first, all but the latest of each URN.
+
+Revision ID: b0e6c3a1d2f4
+Revises: 476d25360634
+Create Date: 2026-10-19 09:12:31.284915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b0e6c3a1d2f4'
+down_revision: Union[str, None] = '476d25360634'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = {'tenants': 'tenant', 'hosts': 'host', 'oauth_clients': 'oauthclient'}
+
+
+def retire_duplicates(table_name: str, key: str) -> None:
+    table = sa.table(table_name, sa.column(key), sa.column('version'), sa.column('active', sa.Boolean),
+                     sa.column('modified'), sa.column('deleted'))
+    newer = table.alias('newer')
+    op.execute(table.update()
+               .where(table.c.active == sa.true())
+               .where(sa.exists().where((newer.c[key] == table.c[key]) & (newer.c.active == sa.true()) &
+                                        (newer.c.version > table.c.version)))
+               .values(active=False, deleted=sa.func.coalesce(table.c.deleted, table.c.modified)))
+
+
+def upgrade() -> None:
+    for table_name, entity in TABLES.items():
+        retire_duplicates(table_name, 'urn')
+        op.create_index(f'ix_{entity}_urn_active', table_name, ['urn'], unique=True,
+                        sqlite_where=sa.text('active = 1'), postgresql_where=sa.text('active'))
+
+
+def downgrade() -> None:
+    for table_name, entity in TABLES.items():
+        op.drop_index(f'ix_{entity}_urn_active', table_name=table_name)
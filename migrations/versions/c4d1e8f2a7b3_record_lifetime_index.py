@@ -0,0 +1,32 @@
+"""index of the lifetime of each version, for point in time lookups
+
+Revision ID: c4d1e8f2a7b3
+Revises: f5c2a9e7b1d3
+Create Date: 2026-10-19 11:26:08.330417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d1e8f2a7b3'
+down_revision: Union[str, None] = 'f5c2a9e7b1d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = {'tenants': 'tenant', 'hosts': 'host', 'oauth_clients': 'oauthclient'}
+
+
+def upgrade() -> None:
+    for table_name, entity in TABLES.items():
+        op.create_index(f'ix_{entity}_urn_modified_deleted', table_name, ['urn', 'modified', 'deleted'], 
+                        unique=False)
+
+
+def downgrade() -> None:
+    for table_name, entity in TABLES.items():
+        op.drop_index(f'ix_{entity}_urn_modified_deleted', table_name=table_name)
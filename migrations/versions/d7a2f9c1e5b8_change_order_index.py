@@ -0,0 +1,32 @@
+"""index of the order of changes, for watchers
+
+Revision ID: d7a2f9c1e5b8
+Revises: a8e4d2b7c6f0
+Create Date: 2026-10-19 11:41:19.072254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a2f9c1e5b8'
+down_revision: Union[str, None] = 'a8e4d2b7c6f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = {'tenants': 'tenant', 'hosts': 'host', 'oauth_clients': 'oauthclient'}
+
+
+def upgrade() -> None:
+    for table_name, entity in TABLES.items():
+        op.create_index(f'ix_{entity}_changed', table_name, [sa.text('coalesce(deleted, modified)'), 'uid'], 
+                        unique=False)
+
+
+def downgrade() -> None:
+    for table_name, entity in TABLES.items():
+        op.drop_index(f'ix_{entity}_changed', table_name=table_name)
@@ -0,0 +1,38 @@
+"""host heartbeats
+
+Revision ID: e3b8c6d4f1a9
+Revises: d7a2f9c1e5b8
+Create Date: 2026-10-19 11:52:40.206815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b8c6d4f1a9'
+down_revision: Union[str, None] = 'd7a2f9c1e5b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATES = ('NEW', 'REGISTERING', 'REGISTERED', 'ONLINE', 'OFFLINE', 'WARNING', 'ERROR')
+
+
+def upgrade() -> None:
+    # the enum type exists already, created with the hosts table
+    state = sa.Enum(*STATES, name='hoststateenum').with_variant(
+        postgresql.ENUM(*STATES, name='hoststateenum', create_type=False), 'postgresql')
+    op.create_table('host_heartbeats',
+    sa.Column('urn', sqlmodel.sql.sqltypes.AutoString(length=128), nullable=False),
+    sa.Column('state', state, nullable=False),
+    sa.Column('last_seen', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('urn')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('host_heartbeats')
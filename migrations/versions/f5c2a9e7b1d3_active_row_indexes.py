@@ -0,0 +1,54 @@
+"""indexes over active rows, with at most one active version per id
+
+Replaces the (id, active) index. Versions left active by concurrent
+updates of the same record are retired first, all but the latest.
+
+Revision ID: f5c2a9e7b1d3
+Revises: b0e6c3a1d2f4
+Create Date: 2026-10-19 10:02:44.913208
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5c2a9e7b1d3'
+down_revision: Union[str, None] = 'b0e6c3a1d2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = {'tenants': 'tenant', 'hosts': 'host', 'oauth_clients': 'oauthclient'}
+
+ACTIVE = {'sqlite_where': sa.text('active = 1'), 'postgresql_where': sa.text('active')}
+
+
+def retire_duplicates(table_name: str, key: str) -> None:
+    table = sa.table(table_name, sa.column(key), sa.column('version'), sa.column('active', sa.Boolean),
+                     sa.column('modified'), sa.column('deleted'))
+    newer = table.alias('newer')
+    op.execute(table.update()
+               .where(table.c.active == sa.true())
+               .where(sa.exists().where((newer.c[key] == table.c[key]) & (newer.c.active == sa.true()) &
+                                        (newer.c.version > table.c.version)))
+               .values(active=False, deleted=sa.func.coalesce(table.c.deleted, table.c.modified)))
+
+
+def upgrade() -> None:
+    for table_name, entity in TABLES.items():
+        retire_duplicates(table_name, 'id')
+        op.drop_index(f'ix_{entity}_id_active', table_name=table_name)
+        op.create_index(f'ix_{entity}_id_active', table_name, ['id'], unique=True, **ACTIVE)
+        op.create_index(f'ix_{entity}_name_active', table_name, ['name'], unique=False, **ACTIVE)
+        op.create_index(f'ix_{entity}_uid_active', table_name, ['uid'], unique=False, **ACTIVE)
+
+
+def downgrade() -> None:
+    for table_name, entity in TABLES.items():
+        op.drop_index(f'ix_{entity}_uid_active', table_name=table_name)
+        op.drop_index(f'ix_{entity}_name_active', table_name=table_name)
+        op.drop_index(f'ix_{entity}_id_active', table_name=table_name)
+        op.create_index(f'ix_{entity}_id_active', table_name, ['id', 'active'], unique=False)
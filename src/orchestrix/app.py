@@ -1,28 +1,86 @@
+import asyncio
 import fastapi
 from contextlib import asynccontextmanager
-from .service.host import router as host_router
-from .service.tenant import router as tenant_router
-from .service.oauth_client import router as oauth_client_router
+from .service.host import HostService
+from .service.host.heartbeat import heartbeat_buffer, heartbeat_flush_loop, HeartbeatStats
+from .service.host.offline import offline_detector, OfflineDetectorStats
+from .service.tenant import TenantService
+from .service.oauth_client import OAuthClientService
 from .route import auth, cluster
-from orchestrix.db import db_engine
-from sqlmodel import SQLModel
+from .fw import apply
+from .fw.cache import cache_stats, CacheStats
+from .fw.retention import compaction_loop
+from .fw.routing import LazyRouter, install_openapi
+from .env import env
+from .metrics import MetricsMiddleware, render_metrics, PROMETHEUS_MEDIA_TYPE
+from .replica import ReadYourWritesMiddleware, ReplicaStats, replica_health_loop
+from orchestrix.db import init_engine, dispose_engine, prepare_schema, db_replicas, pool_stats, PoolStats
 
 @asynccontextmanager
 async def lifespan(app: fastapi.FastAPI):
-    async with db_engine().connect() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
+    engine = init_engine()
+    await prepare_schema(engine)
+    await offline_detector.load()
+    tasks = [asyncio.create_task(heartbeat_flush_loop(env.heartbeat_flush_interval)),
+             asyncio.create_task(offline_detector.run(env.host_offline_check_interval))]
+    if env.compaction_interval > 0:
+        tasks.append(asyncio.create_task(compaction_loop(env.compaction_interval)))
+    replicas = db_replicas()
+    if replicas is not None:
+        await replicas.check(env.db_replica_check_timeout)
+        tasks.append(asyncio.create_task(replica_health_loop(replicas, env.db_replica_check_interval,
+                                                             env.db_replica_check_timeout)))
     yield
+    for task in tasks:
+        task.cancel()
+    # let cancelled tasks finish their writes before the last flush closes the engine
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await heartbeat_buffer.flush()
+    await dispose_engine()
 
 app = fastapi.FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+if env.db_replica_urls and env.db_read_your_writes > 0:
+    app.add_middleware(ReadYourWritesMiddleware, window=env.db_read_your_writes)
 
 @app.get("/")
 def index():
     # forward to docs
     return fastapi.responses.RedirectResponse(url="/docs")
 
-app.include_router(tenant_router, tags=["tenant"])
-app.include_router(host_router, tags=["host"])
-app.include_router(oauth_client_router, tags=["oauth_client"])
+@app.get("/+pool", operation_id="orchestrix-pool-stats")
+def db_pool_stats() -> PoolStats:
+    return pool_stats()
+
+@app.get("/+replicas", operation_id="orchestrix-replica-stats")
+def db_replica_stats() -> list[ReplicaStats]:
+    replicas = db_replicas()
+    return replicas.stats() if replicas else []
+
+@app.get("/+cache", operation_id="orchestrix-cache-stats")
+def entity_cache_stats() -> CacheStats:
+    return cache_stats()
+
+@app.get("/+heartbeat", operation_id="orchestrix-heartbeat-stats")
+def heartbeat_stats() -> HeartbeatStats:
+    return heartbeat_buffer.stats()
+
+@app.get("/+offline", operation_id="orchestrix-offline-stats")
+def offline_stats() -> OfflineDetectorStats:
+    return offline_detector.stats()
+
+@app.get("/+metrics", operation_id="orchestrix-metrics", response_class=fastapi.responses.PlainTextResponse)
+def prometheus_metrics():
+    return fastapi.responses.Response(render_metrics(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+for service, tag in [(TenantService, "tenant"), (HostService, "host"), (OAuthClientService, "oauth_client")]:
+    if env.lazy_routes:
+        app.router.routes.append(LazyRouter(service.register(), tags=[tag]))
+    else:
+        app.include_router(service.router(), tags=[tag])
+app.include_router(apply.router, tags=["apply"])
 #app.include_router(auth.router, tags=["auth"])
 #app.include_router(cluster.router, tags=["cluster"])
 
+install_openapi(app, env.openapi_cache)
+
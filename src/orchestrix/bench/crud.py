@@ -0,0 +1,215 @@
+"""
+Benchmark suite of the generated CRUD routes, run in-process against a
+scratch SQLite database or the database given with --db-url.
+
+    orchestrix bench [--tenants N] [--hosts N] [--concurrency 1,10] [--output FILE]
+    orchestrix bench --baseline FILE [--threshold PCT]
+"""
+from datetime import datetime
+from pydantic import BaseModel, Field
+from sqlalchemy.engine import make_url
+from typing import Awaitable, Callable
+import asyncio
+import itertools
+import platform
+import random
+import time
+
+__all__ = ['OPERATIONS', 'OperationResult', 'SuiteResult', 'Regression', 'run_suite', 'compare']
+
+class OperationResult(BaseModel):
+    operation: str
+    concurrency: int
+    requests: int = 0
+    # 4xx responses, conflicts of concurrent writes to the same record
+    rejected: int = 0
+    # 5xx responses
+    errors: int = 0
+    throughput: float = 0.0
+    mean_ms: float = 0.0
+    p50_ms: float = 0.0
+    p99_ms: float = 0.0
+
+class SuiteResult(BaseModel):
+    started: datetime
+    dialect: str
+    python: str = Field(default_factory=platform.python_version)
+    tenants: int
+    hosts: int
+    oauth_clients: int
+    duration: float
+    results: list[OperationResult] = Field(default_factory=list)
+
+    def result(self, operation: str, concurrency: int) -> OperationResult | None:
+        for r in self.results:
+            if r.operation == operation and r.concurrency == concurrency:
+                return r
+        return None
+
+class Regression(BaseModel):
+    operation: str
+    concurrency: int
+    metric: str
+    baseline: float
+    current: float
+    change: float
+
+class Fixture:
+    """
+    Records seeded for the run, operations pick their targets from these
+    """
+
+    def __init__(self, tenants: list[str], hosts: list[dict]):
+        self.tenants = tenants
+        self.hosts = hosts
+        self.serial = itertools.count()
+
+    def host(self) -> dict:
+        return random.choice(self.hosts)
+
+Operation = Callable[['httpx.AsyncClient', Fixture], Awaitable['httpx.Response']]
+
+async def _create(client, fixture: Fixture):
+    n = next(fixture.serial)
+    return await client.post('/hosts', json={'name': f'bench{n}', 'tenant_urn': random.choice(fixture.tenants),
+                                             'hostname': f'bench{n}.bench'})
+
+async def _get_urn(client, fixture: Fixture):
+    return await client.get(f'/hosts/{fixture.host()["urn"]}')
+
+async def _get_id(client, fixture: Fixture):
+    return await client.get(f'/hosts/{fixture.host()["id"]}')
+
+async def _get_name(client, fixture: Fixture):
+    return await client.get(f'/hosts/{fixture.host()["name"]}')
+
+async def _update(client, fixture: Fixture):
+    host = fixture.host()
+    return await client.put(f'/hosts/{host["urn"]}', json={'tenant_urn': host['tenant_urn'],
+                                                           'hostname': f'{host["name"]}.{next(fixture.serial)}'})
+
+async def _list(client, fixture: Fixture):
+    return await client.get('/hosts', params={'page_size': 100})
+
+async def _history(client, fixture: Fixture):
+    return await client.get(f'/hosts/{fixture.host()["urn"]}/+history')
+
+async def _apply(client, fixture: Fixture):
+    # a manifest of 10 hosts, about half of them changed
+    documents = []
+    for host in random.sample(fixture.hosts, min(10, len(fixture.hosts))):
+        hostname = host['hostname'] if random.random() < 0.5 else f'{host["name"]}.{next(fixture.serial)}'
+        documents.append({'metadata': {'entity_type': 'host', 'urn': host['urn']},
+                          'data': {'name': host['name'], 'tenant_urn': host['tenant_urn'], 'hostname': hostname}})
+    return await client.post('/+apply', json={'documents': documents})
+
+OPERATIONS: dict[str, Operation] = {
+    'create': _create,
+    'get_urn': _get_urn,
+    'get_id': _get_id,
+    'get_name': _get_name,
+    'update': _update,
+    'list': _list,
+    'history': _history,
+    'apply': _apply,
+}
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+async def _bulk_create(client, path: str, records: list[dict], chunk: int = 1000) -> list[dict]:
+    created = []
+    for i in range(0, len(records), chunk):
+        response = await client.post(f'{path}/+bulk', json={'records': records[i:i + chunk]})
+        response.raise_for_status()
+        created.extend(r['record'] for r in response.json()['results'])
+    return created
+
+async def seed(client, tenants: int, hosts: int, oauth_clients: int) -> Fixture:
+    tenant_urns = [r['urn'] for r in await _bulk_create(client, '/tenants',
+                                                        [{'name': f't{i}'} for i in range(tenants)])]
+    host_records = await _bulk_create(client, '/hosts', [
+        {'name': f'h{i}', 'tenant_urn': tenant_urns[i % tenants], 'hostname': f'h{i}.bench'}
+        for i in range(hosts)])
+    await _bulk_create(client, '/oauth_clients', [
+        {'name': f'c{i}', 'tenant_urn': tenant_urns[i % tenants], 'client_id': f'c{i}', 'client_secret': 'bench'}
+        for i in range(oauth_clients)])
+    return Fixture(tenant_urns, host_records)
+
+async def measure(client, fixture: Fixture, name: str, concurrency: int, duration: float) -> OperationResult:
+    operation = OPERATIONS[name]
+    latencies: list[float] = []
+    rejected = errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal rejected, errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await operation(client, fixture)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code // 100 == 4:
+                rejected += 1
+            elif response.status_code // 100 != 2:
+                errors += 1
+            # the in-process transport never suspends, let the other workers run
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return OperationResult(operation=name, concurrency=concurrency, requests=len(latencies), 
+                           rejected=rejected, errors=errors,
+                           throughput=len(latencies) / elapsed,
+                           mean_ms=sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+                           p50_ms=percentile(latencies, 0.5) * 1000, p99_ms=percentile(latencies, 0.99) * 1000)
+
+async def run_suite(*, operations: list[str], concurrency: list[int], duration: float,
+                    tenants: int, hosts: int, oauth_clients: int,
+                    progress: Callable[[OperationResult], None] | None = None) -> SuiteResult:
+    """
+    Seed the configured database and measure each operation at each
+    concurrency level for `duration` seconds. Operations run in the given
+    order, writes of earlier operations are seen by later ones.
+    """
+    import httpx
+    from orchestrix.app import app, lifespan
+    from orchestrix.env import env
+
+    result = SuiteResult(started=datetime.now(), dialect=make_url(env.db_url).get_backend_name(),
+                         tenants=tenants, hosts=hosts, oauth_clients=oauth_clients, duration=duration)
+    random.seed(0)
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            fixture = await seed(client, tenants, hosts, oauth_clients)
+            for level in concurrency:
+                for name in operations:
+                    measured = await measure(client, fixture, name, level, duration)
+                    result.results.append(measured)
+                    if progress:
+                        progress(measured)
+    return result
+
+def compare(baseline: SuiteResult, current: SuiteResult, threshold: float) -> list[Regression]:
+    """
+    Operations whose throughput dropped or p99 latency rose by more than
+    `threshold` percent against the baseline
+    """
+    regressions = []
+    for r in current.results:
+        base = baseline.result(r.operation, r.concurrency)
+        if base is None:
+            continue
+        checks = [('throughput', base.throughput, r.throughput, -1), ('p99_ms', base.p99_ms, r.p99_ms, 1)]
+        for metric, before, after, worse in checks:
+            if not before:
+                continue
+            change = (after - before) / before * 100
+            if change * worse > threshold:
+                regressions.append(Regression(operation=r.operation, concurrency=r.concurrency, metric=metric,
+                                              baseline=before, current=after, change=change))
+    return regressions
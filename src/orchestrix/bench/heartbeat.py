@@ -0,0 +1,69 @@
+"""
+Load benchmark of host heartbeat ingestion against a scratch SQLite database.
+
+    python -m orchestrix.bench.heartbeat [--hosts N] [--duration S] [--concurrency C]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+async def run(hosts: int, duration: float, concurrency: int, change_rate: float):
+    import httpx
+    from orchestrix.app import app, lifespan
+    from orchestrix.service.host.heartbeat import heartbeat_buffer
+
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            tenant = (await client.post('/tenants', json={'name': 'bench'})).json()['record']['urn']
+            urns = []
+            for i in range(0, hosts, 1000):
+                records = [{'name': f'h{n}', 'tenant_urn': tenant, 'hostname': f'h{n}.bench'} 
+                           for n in range(i, min(i + 1000, hosts))]
+                response = await client.post('/hosts/+bulk', json={'records': records})
+                urns.extend(r['urn'] for r in response.json()['results'])
+
+            sent = 0
+            deadline = time.perf_counter() + duration
+            async def agent():
+                nonlocal sent
+                while time.perf_counter() < deadline:
+                    state = 'warning' if random.random() < change_rate else 'online'
+                    response = await client.post(f'/hosts/{random.choice(urns)}/+heartbeat', 
+                                                 json={'state': state})
+                    assert response.status_code == 202, response.text
+                    sent += 1
+                    # the in-process transport never suspends, let other agents and the flush run
+                    await asyncio.sleep(0)
+
+            start = time.perf_counter()
+            await asyncio.gather(*[agent() for _ in range(concurrency)])
+            await heartbeat_buffer.flush()
+            elapsed = time.perf_counter() - start
+
+    stats = heartbeat_buffer.stats()
+    print(f'hosts           {hosts}')
+    print(f'heartbeats      {sent}')
+    print(f'heartbeats/s    {sent / elapsed:.0f}')
+    print(f'flushes         {stats.flushes}')
+    print(f'hosts written   {stats.flushed}')
+    print(f'state changes   {stats.state_changes}')
+    print(f'last flush      {stats.last_flush_duration * 1000:.1f} ms')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hosts', type=int, default=2000)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--change-rate', type=float, default=0.01, 
+                        help='Fraction of heartbeats reporting a different state')
+    args = parser.parse_args()
+
+    os.environ.setdefault('ORCHESTRIX_DB_URL', f'sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db')
+    asyncio.run(run(args.hosts, args.duration, args.concurrency, args.change_rate))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Microbenchmark of record identifier resolution and validation.
+
+    python -m orchestrix.bench.identifier [-n ITERATIONS]
+"""
+from uuid import UUID
+from uuid_extensions import uuid7
+import argparse
+import re
+import timeit
+from orchestrix.fw.model import resolve_identifier, is_valid_urn, is_valid_name
+
+SAMPLES = {
+    'urn': 'urn:orchestrix:host:host(urn:orchestrix:tenant:t1,h4)',
+    'id': str(uuid7()),
+    'name': 'web_server_01',
+}
+
+def legacy_resolve(identifier: str):
+    # the try/except dispatch resolve_identifier replaced, kept as a baseline
+    try:
+        if not re.match(r"^urn:[a-z0-9][a-z0-9-]{0,31}:[a-z0-9]+:[a-z0-9_\(\):,]+$", identifier):
+            raise ValueError("URN is not valid")
+        return 'urn', identifier
+    except ValueError:
+        try:
+            return 'id', UUID(identifier)
+        except ValueError:
+            return 'name', identifier
+
+def measure(fn, arg, number: int) -> float:
+    return min(timeit.repeat(lambda: fn(arg), number=number, repeat=5)) / number * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--iterations', type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f'{"case":<24}{"ns/call":>12}')
+    for kind, sample in SAMPLES.items():
+        assert resolve_identifier(sample)[0] == legacy_resolve(sample)[0] == kind
+        print(f'{"resolve " + kind:<24}{measure(resolve_identifier, sample, args.iterations):>12.0f}')
+        print(f'{"legacy resolve " + kind:<24}{measure(legacy_resolve, sample, args.iterations):>12.0f}')
+    print(f'{"is_valid_urn":<24}{measure(is_valid_urn, SAMPLES["urn"], args.iterations):>12.0f}')
+    print(f'{"is_valid_name":<24}{measure(is_valid_name, SAMPLES["name"], args.iterations):>12.0f}')
+
+if __name__ == '__main__':
+    main()
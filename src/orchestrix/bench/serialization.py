@@ -0,0 +1,70 @@
+"""
+Microbenchmark of list response serialization, through the response model
+and through the fast path of services with fast_serialization.
+
+    python -m orchestrix.bench.serialization [--sizes 10,1000,10000] [--duration S]
+"""
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from uuid_extensions import uuid7
+import argparse
+import asyncio
+import json
+import time
+from orchestrix.fw.model import ts_now
+from orchestrix.fw.service import PaginationMeta
+from orchestrix.service.host.model import Host, HostService, HostStateEnum
+
+def make_records(count: int) -> list[Host]:
+    now = ts_now()
+    tenant = 'urn:orchestrix:tenant:bench'
+    return [Host(uid=uuid7(), id=uuid7(), name=f'h{i}', tenant_urn=tenant, hostname=f'h{i}.bench',
+                 urn=f'urn:orchestrix:host:host({tenant},h{i})', state=HostStateEnum.ONLINE,
+                 created=now, modified=now, version=1, active=True)
+            for i in range(count)]
+
+def list_route() -> APIRoute:
+    for route in HostService.router().routes:
+        if route.operation_id == 'orchestrix-list-host':
+            return route
+    raise LookupError('list route of hosts is not registered')
+
+async def standard(field, records: list[Host], meta: PaginationMeta) -> bytes:
+    # what FastAPI does with the dict returned by a route
+    content = await serialize_response(field=field, response_content={'records': records, 'meta': meta})
+    return JSONResponse(content).body
+
+async def fast(field, records: list[Host], meta: PaginationMeta) -> bytes:
+    return HostService.json_response(records=records, meta=meta).body
+
+async def measure(fn, field, records: list[Host], meta: PaginationMeta, duration: float) -> float:
+    count = 0
+    start = time.perf_counter()
+    while True:
+        await fn(field, records, meta)
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= duration:
+            return count / elapsed
+
+async def run(sizes: list[int], duration: float):
+    field = list_route().response_field
+    print(f'{"rows":>8}{"standard/s":>14}{"fast/s":>14}{"speedup":>10}{"fast rows/s":>14}')
+    for size in sizes:
+        records = make_records(size)
+        meta = PaginationMeta(page_size=size)
+        assert (json.loads(await standard(field, records, meta)) ==
+                json.loads(await fast(field, records, meta)))
+        slow_rate = await measure(standard, field, records, meta, duration)
+        fast_rate = await measure(fast, field, records, meta, duration)
+        print(f'{size:>8}{slow_rate:>14.1f}{fast_rate:>14.1f}{fast_rate / slow_rate:>9.2f}x{fast_rate * size:>14.0f}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10,1000,10000')
+    parser.add_argument('--duration', type=float, default=2)
+    args = parser.parse_args()
+    asyncio.run(run([int(s) for s in args.sizes.split(',')], args.duration))
+
+if __name__ == '__main__':
+    main()
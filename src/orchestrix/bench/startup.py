@@ -0,0 +1,69 @@
+"""
+Time until a fresh process is ready to serve, for each startup mode:
+importing the app, running its lifespan startup and answering a first
+request, measured in new interpreters against a migrated scratch database. Run
+from the directory of alembic.ini.
+
+    python -m orchestrix.bench.startup [--runs N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# run in the child process, prints the phase timings as JSON
+PROBE = '''
+import time
+start = time.perf_counter()
+import asyncio, json, httpx
+from orchestrix.app import app, lifespan
+imported = time.perf_counter()
+
+async def main():
+    async with lifespan(app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            (await client.get("/hosts")).raise_for_status()
+        first = time.perf_counter()
+    return ready, first
+
+ready, first = asyncio.run(main())
+print(json.dumps({"import": imported - start, "ready": ready - start, "first_request": first - start}))
+'''
+
+MODES = {
+    'create_all, eager routes': {'ORCHESTRIX_DB_SCHEMA': 'create', 'ORCHESTRIX_LAZY_ROUTES': 'false'},
+    'alembic check, eager routes': {'ORCHESTRIX_DB_SCHEMA': 'check', 'ORCHESTRIX_LAZY_ROUTES': 'false'},
+    'alembic check, lazy routes': {'ORCHESTRIX_DB_SCHEMA': 'check', 'ORCHESTRIX_LAZY_ROUTES': 'true'},
+    'skip, lazy routes': {'ORCHESTRIX_DB_SCHEMA': 'skip', 'ORCHESTRIX_LAZY_ROUTES': 'true'},
+}
+
+def probe(extra_env: dict[str, str]) -> dict[str, float]:
+    result = subprocess.run([sys.executable, '-c', PROBE], env={**os.environ, **extra_env},
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def run(runs: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_env = {'ORCHESTRIX_DB_URL': f'sqlite+aiosqlite:///{tmp}/startup.db',
+                  'ORCHESTRIX_COMPACTION_INTERVAL': '0'}
+        subprocess.run([sys.executable, '-m', 'alembic', 'upgrade', 'head'], env={**os.environ, **db_env},
+                       capture_output=True, check=True)
+        print(f'{"mode":<30}{"import s":>10}{"ready s":>10}{"1st req s":>12}')
+        for name, mode_env in MODES.items():
+            samples = [probe({**db_env, **mode_env}) for _ in range(runs)]
+            median = {k: statistics.median(s[k] for s in samples) for k in samples[0]}
+            print(f'{name:<30}{median["import"]:>10.3f}{median["ready"]:>10.3f}{median["first_request"]:>12.3f}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    run(args.runs)
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,19 @@
+import asyncio
 import click
 import os
+import sys
+import tempfile
 from .app import app
 from .command.env import env
 import fastapi
 import uvicorn
 import httpx
 from .command.model import *
-from .fw.command import handle_response, load_data_file
+from .fw.retention import compact_all
+from .bench.crud import OPERATIONS, SuiteResult, run_suite, compare
+from .db import dispose_engine
+from .fw.command import handle_response, load_data_file, concurrency_options, run_jobs
+import functools
 from getpass import getpass
 
 @click.group()
@@ -19,6 +26,10 @@ def cli():
 @click.option('-w', '--workers', default=1, help='Workers')
 @click.option('-r', '--reload', is_flag=True, help='Reload')
 def run(host, port, reload, workers):
+    from .env import env as server_env
+    if workers > 1 and server_env.cache_enabled:
+        print("Warning: the entity cache is kept per process, workers read records written by "
+              "other workers stale for up to ORCHESTRIX_CACHE_TTL seconds", file=sys.stderr)
     uvicorn.run('orchestrix.app:app', host=host, port=port, use_colors=True, reload=reload, workers=workers)
 
 @click.command()
@@ -33,36 +44,144 @@ def login(tenant: str):
 
 @click.command()
 @click.argument('data')
-def apply(data: str):
+@click.option('--dry-run', is_flag=True, help='Show planned changes without writing them')
+@click.option('-b', '--batch-size', default=None, type=click.IntRange(min=1), 
+              help='Split the manifest into batches of this many documents, sent whole by default')
+@concurrency_options
+def apply(data: str, dry_run: bool, batch_size: int | None, concurrency: int, http2: bool):
+    """
+    Apply a manifest. Sent whole, it is applied in a single transaction. 
+    Split into batches, each batch is its own transaction and batches of 
+    the same entity type are sent concurrently, one entity type at a time 
+    in manifest order so parents exist before their children.
+    """
     server = env.host
-    service_paths = {
-        'tenant': '/tenants',
-        'host': '/hosts'
-    }
-    with httpx.Client() as client:
-        for d in load_data_file(data):
-            urn = d['metadata']['urn']
-            entity_type = d['metadata']['entity_type']
-            service_path = service_paths[entity_type]
-            response = client.get(f"{server}{service_path}/{urn}")
-            check_result = handle_response(response, print_errors=False)
-            if check_result is not None:
-                print(f"Creating {urn}")
-                response = client.post(f"{server}{service_path}", json=d['data'])
-                result = handle_response(response)
-                if result is None:
-                    continue
-            else:
-                print(f"Updating {urn}")
-                response = client.put(f"{server}{service_path}/{urn}", json=d['data'])
-                result = handle_response(response)
-                if result is None:
-                    continue
-            print(result['status'])
+    documents = [d for d in load_data_file(data) if d]
+    if not documents:
+        print("No documents to apply", file=sys.stderr)
+        return
+    for i, d in enumerate(documents):
+        if not isinstance(d, dict) or not isinstance(d.get('metadata'), dict) or \
+                not d['metadata'].get('entity_type'):
+            raise click.UsageError(f"Document {i} has no metadata.entity_type")
+    waves: dict[str, list[dict]] = {}
+    if batch_size:
+        for d in documents:
+            waves.setdefault(d['metadata']['entity_type'], []).append(d)
+    else:
+        waves[''] = documents
+    size = batch_size or len(documents)
+
+    def print_result(response):
+        result = handle_response(response)
+        if result is None:
+            return
+        for item in result['results']:
+            print(f"{item['action'].capitalize()} {item['urn']}")
+
+    failed = 0
+    for entity_type, docs in waves.items():
+        batches = [docs[i:i + size] for i in range(0, len(docs), size)]
+        def jobs(client):
+            async def post(batch):
+                response = await client.post(f"{server}/+apply", params={'dry_run': dry_run}, 
+                                             json={'documents': batch}, timeout=None)
+                if response.status_code // 100 == 2:
+                    print_result(response)
+                return response
+            return [(f"{entity_type or 'manifest'} batch {i + 1}/{len(batches)}", functools.partial(post, b)) 
+                    for i, b in enumerate(batches)]
+        failed += run_jobs(jobs, concurrency=concurrency, http2=http2)
+    if dry_run:
+        print("Dry run, no changes written")
+    if failed:
+        sys.exit(1)
+
+@click.command()
+@click.argument('entity_types', nargs=-1)
+@click.option('-b', '--batch-size', default=None, type=click.IntRange(min=1), 
+              help='Versions deleted per transaction')
+@click.option('--dry-run', is_flag=True, help='Count reclaimable versions without deleting them')
+def compact(entity_types: tuple[str], batch_size: int | None, dry_run: bool):
+    """
+    Remove superseded record versions according to each service's retention 
+    policy, directly against the configured database
+    """
+    async def _compact():
+        try:
+            return await compact_all(list(entity_types), batch_size=batch_size, dry_run=dry_run)
+        finally:
+            await dispose_engine()
+    try:
+        results = asyncio.run(_compact())
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    for result in results:
+        print(f"{result.entity_type}: {result.reclaimed} versions {'reclaimable' if dry_run else 'reclaimed'}")
+
+def int_list(ctx, param, value: str) -> list[int]:
+    try:
+        return [int(v) for v in value.split(',')]
+    except ValueError:
+        raise click.BadParameter('expected comma separated integers')
+
+@click.command()
+@click.option('--db-url', default=None, help='Empty database to run against, a scratch SQLite database by default')
+@click.option('--tenants', default=10, type=click.IntRange(min=1), help='Tenants seeded')
+@click.option('--hosts', default=1000, type=click.IntRange(min=1), help='Hosts seeded')
+@click.option('--oauth-clients', default=100, type=click.IntRange(min=0), help='OAuth clients seeded')
+@click.option('-c', '--concurrency', default='1,10,50', callback=int_list, help='Concurrency levels, comma separated')
+@click.option('-d', '--duration', default=5.0, type=click.FloatRange(min=0, min_open=True), 
+              help='Seconds each operation runs at each concurrency level')
+@click.option('-O', '--operation', 'operations', multiple=True, type=click.Choice(list(OPERATIONS)), 
+              help='Operations to run, all of them by default')
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='Write the results as JSON to this file')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), 
+              help='Results of an earlier run to compare against')
+@click.option('--threshold', default=10.0, type=click.FloatRange(min=0), 
+              help='Percent of throughput lost or p99 latency gained against the baseline that fails the run')
+def bench(db_url: str | None, tenants: int, hosts: int, oauth_clients: int, concurrency: list[int], 
+          duration: float, operations: tuple[str], output: str | None, baseline: str | None, threshold: float):
+    """
+    Measure throughput and latency of the CRUD routes with the app running 
+    in-process. Exits with an error when a request failed with a server error
+    or a result regressed against the baseline by more than the threshold.
+    """
+    from .env import env as server_env
+    if not db_url:
+        # a scratch database, created rather than migrated
+        server_env.db_url = f'sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db'
+        server_env.db_schema = 'create'
+    else:
+        server_env.db_url = db_url
+
+    def progress(r):
+        print(f'{r.operation:<10} c={r.concurrency:<4} {r.throughput:>9.1f} req/s  '
+              f'p50 {r.p50_ms:>8.2f} ms  p99 {r.p99_ms:>8.2f} ms  '
+              f'rejected {r.rejected}  errors {r.errors}', flush=True)
+
+    result = asyncio.run(run_suite(operations=list(operations or OPERATIONS), concurrency=concurrency, 
+                                   duration=duration, tenants=tenants, hosts=hosts, 
+                                   oauth_clients=oauth_clients, progress=progress))
+    if output:
+        with open(output, 'w') as f:
+            f.write(result.model_dump_json(indent=2))
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(SuiteResult.model_validate_json(f.read()), result, threshold)
+        for r in regressions:
+            print(f'Regression: {r.operation} c={r.concurrency} {r.metric} '
+                  f'{r.baseline:.2f} -> {r.current:.2f} ({r.change:+.1f}%)')
+        if regressions:
+            sys.exit(1)
+    if any(r.errors for r in result.results):
+        sys.exit(1)
 
 cli.add_command(run)
 cli.add_command(login)
 cli.add_command(apply)
+cli.add_command(compact)
+cli.add_command(bench)
 cli.add_command(tenant)
 cli.add_command(host)
 cli.add_command(oauth_client)
@@ -1,19 +1,231 @@
-from fastapi import Depends
+from fastapi import Depends, Request
+from pydantic import BaseModel
+import sqlalchemy as sa
 from sqlalchemy import MetaData
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from sqlmodel.ext.asyncio.session import AsyncSession
-from typing import Annotated
+from typing import Annotated, AsyncContextManager
+import time
 from .env import env
+from .metrics import instrument_engine
+from .replica import SAFE_METHODS, Replica, ReplicaSet, reads_from_primary
+from .sqlite import WriteQueue, configure_sqlite
 
 metadata = MetaData()
 
-def db_engine():
-    engine = create_async_engine(env.db_url)
+class PoolStats(BaseModel):
+    size: int = 0
+    checked_in: int = 0
+    checked_out: int = 0
+    overflow: int = 0
+    connects: int = 0
+    checkouts: int = 0
+    wait_time_total: float = 0.0
+    wait_time_max: float = 0.0
+    # sessions of the SQLite write queue and their group commits
+    write_sessions: int = 0
+    write_commits: int = 0
+    write_failed_commits: int = 0
+    write_wait_time_total: float = 0.0
+
+class _PoolCounters:
+    """
+    Process wide counters, kept outside of the pool so they survive
+    pool recreation on dispose
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_checkout(self, wait: float):
+        self.checkouts += 1
+        self.wait_time_total += wait
+        if wait > self.wait_time_max:
+            self.wait_time_max = wait
+
+_counters = _PoolCounters()
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool which records how long callers waited for a connection
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        conn = super().connect()
+        _counters.record_checkout(time.perf_counter() - start)
+        return conn
+
+_engine: AsyncEngine | None = None
+_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+_write_queue: WriteQueue | None = None
+_replicas: ReplicaSet | None = None
+
+def _is_memory_db(url: str) -> bool:
+    u = make_url(url)
+    return u.get_backend_name() == 'sqlite' and u.database in (None, '', ':memory:')
+
+def _is_file_db(url: str) -> bool:
+    return make_url(url).get_backend_name() == 'sqlite' and not _is_memory_db(url)
+
+def engine_options(url: str) -> dict:
+    opts = {
+        'echo': env.db_echo,
+        'pool_pre_ping': env.db_pool_pre_ping,
+    }
+    if _is_memory_db(url):
+        # a memory database only exists within its connection
+        opts['poolclass'] = StaticPool
+        return opts
+    opts.update({
+        'poolclass': InstrumentedPool,
+        'pool_size': env.db_pool_size,
+        'max_overflow': env.db_max_overflow,
+        'pool_recycle': env.db_pool_recycle,
+        'pool_timeout': env.db_pool_timeout,
+    })
+    return opts
+
+def create_engine(url: str | None = None) -> AsyncEngine:
+    url = url or env.db_url
+    engine = create_async_engine(url, **engine_options(url))
+
+    instrument_engine(engine)
+
+    @sa.event.listens_for(engine.sync_engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        _counters.connects += 1
+
+    if _is_file_db(url):
+        configure_sqlite(engine)
+
+    if engine.dialect.name == 'sqlite':
+        # the sqlite driver only opens a transaction before DML statements, so
+        # a SAVEPOINT issued first becomes the outer transaction and its 
+        # RELEASE commits. Open the transaction explicitly in that case.
+        @sa.event.listens_for(engine.sync_engine, 'savepoint')
+        def _sqlite_savepoint(conn, name):
+            if not conn.connection.driver_connection.in_transaction:
+                conn.exec_driver_sql('BEGIN')
+
     return engine
 
-async def _db_session_dependency():
-    async with AsyncSession(db_engine()) as session:
+def init_engine() -> AsyncEngine:
+    global _engine, _sessionmaker, _write_queue, _replicas
+    if _engine is None:
+        _engine = create_engine()
+        _sessionmaker = async_sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+        if env.sqlite_write_queue and _is_file_db(env.db_url):
+            _write_queue = WriteQueue(_engine, env.sqlite_max_group_commit)
+        if env.db_replica_urls:
+            _replicas = ReplicaSet([Replica(url, create_engine(url)) for url in env.db_replica_urls])
+    return _engine
+
+async def dispose_engine():
+    global _engine, _sessionmaker, _write_queue, _replicas
+    if _engine is not None:
+        await _engine.dispose()
+    if _replicas is not None:
+        await _replicas.dispose()
+    _engine = None
+    _sessionmaker = None
+    _write_queue = None
+    _replicas = None
+
+def schema_heads() -> set[str]:
+    """
+    Head revisions of the alembic migrations
+    """
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    return set(ScriptDirectory.from_config(Config(env.alembic_config)).get_heads())
+
+async def check_schema(engine: AsyncEngine):
+    """
+    Fail unless the database is migrated to the alembic head revisions. A
+    single query, where `create_all` reflects every table.
+    """
+    from alembic.runtime.migration import MigrationContext
+    heads = schema_heads()
+    async with engine.connect() as conn:
+        current = set(await conn.run_sync(lambda c: MigrationContext.configure(c).get_current_heads()))
+    if current != heads:
+        raise RuntimeError(f'Database schema is at {sorted(current) or "no revision"}, expected '
+                           f'{sorted(heads)}. Run `alembic upgrade head` to migrate it.')
+
+async def prepare_schema(engine: AsyncEngine):
+    if env.db_schema == 'create':
+        from sqlmodel import SQLModel
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+    elif env.db_schema == 'check':
+        await check_schema(engine)
+
+def db_engine() -> AsyncEngine:
+    return init_engine()
+
+def db_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    init_engine()
+    return _sessionmaker
+
+def db_replicas() -> ReplicaSet | None:
+    init_engine()
+    return _replicas
+
+def db_read_session(request: Request | None = None) -> AsyncSession:
+    """
+    Session of a transaction that only reads, from a healthy replica unless
+    the client wrote within the read-your-writes window
+    """
+    init_engine()
+    if _replicas is not None and not (request is not None and reads_from_primary(request)):
+        session = _replicas.session()
+        if session is not None:
+            return session
+    return _sessionmaker()
+
+def db_write_session() -> AsyncContextManager[AsyncSession]:
+    """
+    Session of a transaction that writes, through the write queue of a
+    SQLite database and from the pool otherwise
+    """
+    init_engine()
+    if _write_queue is not None:
+        return _write_queue.session()
+    return _sessionmaker()
+
+def pool_stats() -> PoolStats:
+    stats = PoolStats(
+        connects=_counters.connects,
+        checkouts=_counters.checkouts,
+        wait_time_total=_counters.wait_time_total,
+        wait_time_max=_counters.wait_time_max,
+    )
+    if _engine is not None and isinstance(_engine.pool, AsyncAdaptedQueuePool):
+        pool = _engine.pool
+        stats.size = pool.size()
+        stats.checked_in = pool.checkedin()
+        stats.checked_out = pool.checkedout()
+        stats.overflow = pool.overflow()
+    if _write_queue is not None:
+        stats.write_sessions = _write_queue.sessions
+        stats.write_commits = _write_queue.commits
+        stats.write_failed_commits = _write_queue.failed_commits
+        stats.write_wait_time_total = _write_queue.wait_time_total
+    return stats
+
+async def _db_session_dependency(request: Request):
+    context = db_read_session(request) if request.method in SAFE_METHODS else db_write_session()
+    async with context as session:
         yield session
         await session.commit()
 
-DbSession = Annotated[AsyncSession, Depends(_db_session_dependency)]
\ No newline at end of file
+DbSession = Annotated[AsyncSession, Depends(_db_session_dependency)]
@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Literal
 import pendulum
 
 class OrchestrixSettings(BaseSettings):
@@ -6,8 +7,63 @@ class OrchestrixSettings(BaseSettings):
     db_pool_size: int = 5
     db_max_overflow: int = 10
     db_pool_recycle: int = 3600
+    db_pool_timeout: float = 30
     db_echo: bool = False
     db_pool_pre_ping: bool = True
+    # read-only copies of db_url, reads of the generated routes are spread
+    # over them. A JSON list in ORCHESTRIX_DB_REPLICA_URLS.
+    db_replica_urls: list[str] = []
+    db_replica_check_interval: float = 5.0
+    db_replica_check_timeout: float = 2.0
+    # seconds the reads of a client that wrote go to the primary, 0 disables
+    db_read_your_writes: float = 5.0
+    # pragmas of file SQLite databases, set on every connection
+    sqlite_journal_mode: str = 'wal'
+    sqlite_synchronous: str = 'normal'
+    sqlite_busy_timeout: int = 5000
+    sqlite_mmap_size: int = 268435456
+    # negative sizes are in KiB
+    sqlite_cache_size: int = -65536
+    # run writing sessions of a file SQLite database one at a time and
+    # commit the sessions that queued up together
+    sqlite_write_queue: bool = True
+    sqlite_max_group_commit: int = 100
+    # the entity cache is kept per process, other workers' writes only
+    # reach it when entries expire after cache_ttl seconds. Only enable it
+    # with a single worker, or where reads that stale are acceptable.
+    cache_enabled: bool = False
+    cache_size: int = 10000
+    cache_ttl: float = 5.0
+    # records embedded per record by a to-many ?expand=, unless the 
+    # expansion sets its own limit
+    expand_limit: int = 100
+    watch_poll_interval: float = 5.0
+    watch_keepalive: float = 15.0
+    # seconds of changes watchers read again, changes committing later than
+    # this after they were timestamped can be missed
+    watch_overlap: float = 1.0
+    # changes a watch cursor holds, past them the overlap is cut short so
+    # the cursor fits in a URL or a Last-Event-ID header
+    watch_cursor_limit: int = 64
+    heartbeat_flush_interval: float = 1.0
+    host_offline_timeout: float = 60.0
+    host_offline_check_interval: float = 5.0
+    # seconds between compactions of the services with a retention policy,
+    # 0 disables the background task
+    compaction_interval: float = 0
+    compaction_batch_size: int = 500
+    # seconds, 0 disables the slow query log
+    slow_query_threshold: float = 0.5
+    debug_query_header: bool = False
+    # check: require the database at the alembic head revision, create: 
+    # create missing tables on startup, for tests and development, skip: 
+    # trust the database as is
+    db_schema: Literal['create', 'check', 'skip'] = 'check'
+    alembic_config: str = 'alembic.ini'
+    # build the routes of each service on its first request
+    lazy_routes: bool = False
+    # file keeping the generated OpenAPI document across restarts
+    openapi_cache: str | None = None
     timezone: str = pendulum.local_timezone().name
 
     class Config:
@@ -0,0 +1,134 @@
+import fastapi
+from pydantic import BaseModel, Field, ValidationError
+from sqlmodel import SQLModel
+from typing import Any, Literal
+from orchestrix.db import DbSession
+from orchestrix.fw.exc import BulkOperationError
+from orchestrix.fw.service import BaseResult, ErrorDetail, BulkItemResult, Service, service_registry
+
+__all__ = ['ApplyDocument', 'ApplyRequest', 'ApplyResult', 'apply_documents', 'router']
+
+APPLY_ACTIONS = Literal["create", "update", "unchanged"]
+
+class ApplyMetadata(BaseModel):
+    entity_type: str
+    urn: str | None = None
+
+class ApplyDocument(BaseModel):
+    metadata: ApplyMetadata
+    data: dict[str, Any] = Field(default_factory=dict)
+
+class ApplyRequest(BaseModel):
+    documents: list[ApplyDocument]
+
+class ApplyItemResult(BaseResult):
+    index: int
+    entity_type: str
+    urn: str | None = None
+    action: APPLY_ACTIONS | None = None
+
+    def fail(self, detail: list[dict]):
+        self.status = "error"
+        self.detail = [ErrorDetail(loc=['body', 'documents', self.index] + list(d.get('loc', [])),
+                                   msg=d.get('msg'), type=d.get('type')) for d in detail]
+
+class ApplyResult(BaseResult):
+    dry_run: bool = False
+    results: list[ApplyItemResult] = Field(default_factory=list)
+
+def _dependency_order(entity_types: list[str]) -> list[str]:
+    # parents before children, so references created by the same manifest resolve
+    tables = {t: i for i, t in enumerate(SQLModel.metadata.sorted_tables)}
+    return sorted(entity_types, key=lambda et: tables.get(service_registry[et].model_class().__table__, 0))
+
+def _merge_bulk_results(items: list[ApplyItemResult], bulk_results: list[BulkItemResult]):
+    for item, r in zip(items, bulk_results):
+        if r.status == "error":
+            # drop the ['body', 'records', n] prefix of the bulk location
+            item.fail([{**d.model_dump(), 'loc': d.loc[3:]} for d in r.detail or []])
+
+async def _apply_entity_type(svc: Service, documents: list[tuple[ApplyDocument, ApplyItemResult]]):
+    CreateModel = svc.createmodel_class()
+    UpdateModel = svc.updatemodel_class()
+
+    parsed = []
+    for doc, item in documents:
+        try:
+            data = CreateModel.model_validate(doc.data)
+        except ValidationError as e:
+            item.fail([{'loc': ['data'] + list(err['loc']), 'msg': err['msg'], 'type': err['type']} 
+                       for err in e.errors()])
+            continue
+        urn = svc.urn(data)
+        if item.urn and item.urn != urn:
+            item.fail([{'loc': ['metadata', 'urn'], 'msg': f'URN does not match data: {urn}', 
+                        'type': 'value_error'}])
+            continue
+        item.urn = urn
+        parsed.append((doc, item, data))
+
+    current = await svc.get_many([item.urn for _, item, _ in parsed])
+    creates, updates = [], []
+    for doc, item, data in parsed:
+        model = current.get(item.urn)
+        if model is None:
+            item.action = "create"
+            creates.append((item, data))
+            continue
+        if not UpdateModel.model_fields:
+            item.action = "unchanged"
+            continue
+        update = UpdateModel.model_validate(doc.data)
+        candidate = svc.new_version(model, update)
+        if all(getattr(model, f) == getattr(candidate, f) for f in UpdateModel.model_fields):
+            # skip unchanged records so no new version is written
+            item.action = "unchanged"
+            continue
+        item.action = "update"
+        updates.append((item, update))
+
+    if creates:
+        results = await svc.bulk_create([data for _, data in creates], mode='partial')
+        _merge_bulk_results([item for item, _ in creates], results)
+    if updates:
+        results = await svc.bulk_update([(item.urn, data) for item, data in updates], mode='partial')
+        _merge_bulk_results([item for item, _ in updates], results)
+
+async def apply_documents(request: fastapi.Request, db: DbSession, 
+                          documents: list[ApplyDocument], *, dry_run: bool = False) -> list[ApplyItemResult]:
+    """
+    Converge the database to a manifest of documents of mixed entity types, 
+    in one transaction. With `dry_run`, the plan is computed by applying the
+    changes and rolling them back.
+    """
+    items = [ApplyItemResult(index=i, entity_type=d.metadata.entity_type, urn=d.metadata.urn) 
+             for i, d in enumerate(documents)]
+    groups: dict[str, list[tuple[ApplyDocument, ApplyItemResult]]] = {}
+    for doc, item in zip(documents, items):
+        if doc.metadata.entity_type not in service_registry:
+            item.fail([{'loc': ['metadata', 'entity_type'], 
+                        'msg': f'Unknown entity type {doc.metadata.entity_type}', 'type': 'value_error'}])
+            continue
+        groups.setdefault(doc.metadata.entity_type, []).append((doc, item))
+
+    for entity_type in _dependency_order(list(groups.keys())):
+        svc = service_registry[entity_type](request, db)
+        await _apply_entity_type(svc, groups[entity_type])
+
+    detail = [d.model_dump() for i in items if i.status == "error" for d in i.detail or []]
+    if detail:
+        raise BulkOperationError(detail=detail)
+    if dry_run:
+        await db.rollback()
+    return items
+
+router = fastapi.APIRouter()
+
+@router.post('/+apply', operation_id='orchestrix-apply')
+async def apply(request: fastapi.Request, db: DbSession, data: ApplyRequest, 
+                dry_run: bool = False) -> ApplyResult:
+    results = await apply_documents(request, db, data.documents, dry_run=dry_run)
+    return {
+        "dry_run": dry_run,
+        "results": results
+    }
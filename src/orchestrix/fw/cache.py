@@ -0,0 +1,154 @@
+from collections import OrderedDict
+from pydantic import BaseModel
+from sqlmodel import Session
+from typing import Any, Hashable
+import abc
+import sqlalchemy as sa
+import time
+from ..sqlite import on_commit
+
+__all__ = ['CacheStats', 'CacheBackend', 'LRUCache', 'default_cache', 'cache_stats']
+
+# session.info keys
+DIRTY_KEY = 'orchestrix.cache.dirty'
+PENDING_KEY = 'orchestrix.cache.pending'
+
+class CacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    size: int = 0
+
+class CacheBackend(abc.ABC):
+    """
+    Entity cache backend. Values are stored with the record version they
+    were read at, and `invalidate` sets a version floor on a key so that
+    a value read before a write committed can not be stored afterwards.
+    """
+
+    @abc.abstractmethod
+    def get(self, key: Hashable) -> Any | None:
+        raise NotImplementedError("get must be implemented")
+
+    @abc.abstractmethod
+    def set(self, key: Hashable, value: Any, version: int):
+        raise NotImplementedError("set must be implemented")
+
+    @abc.abstractmethod
+    def invalidate(self, key: Hashable, version: int):
+        raise NotImplementedError("invalidate must be implemented")
+
+    @abc.abstractmethod
+    def clear(self):
+        raise NotImplementedError("clear must be implemented")
+
+    @abc.abstractmethod
+    def stats(self) -> CacheStats:
+        raise NotImplementedError("stats must be implemented")
+
+class LRUCache(CacheBackend):
+    """
+    In-process LRU cache with a time to live on every entry
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+        self._floors: OrderedDict[Hashable, tuple[float, int]] = OrderedDict()
+        self._stats = CacheStats()
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self._stats.misses += 1
+            return None
+        expires, _, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            self._stats.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self._stats.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, version: int):
+        now = time.monotonic()
+        floor = self._floors.get(key)
+        if floor is not None:
+            expires, min_version = floor
+            if expires < now:
+                del self._floors[key]
+            elif version < min_version:
+                return
+        self._data[key] = (now + self.ttl, version, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._stats.evictions += 1
+
+    def invalidate(self, key: Hashable, version: int):
+        now = time.monotonic()
+        self._data.pop(key, None)
+        self._stats.invalidations += 1
+        floor = self._floors.pop(key, None)
+        if floor is not None and floor[0] >= now:
+            version = max(version, floor[1])
+        self._floors[key] = (now + self.ttl, version)
+        # floors are kept in expiry order
+        while self._floors:
+            k, (expires, _) = next(iter(self._floors.items()))
+            if expires >= now:
+                break
+            del self._floors[k]
+
+    def clear(self):
+        self._data.clear()
+        self._floors.clear()
+
+    def stats(self) -> CacheStats:
+        return self._stats.model_copy(update={'size': len(self._data)})
+
+def _default_cache() -> LRUCache | None:
+    from ..env import env
+    if not env.cache_enabled:
+        return None
+    return LRUCache(maxsize=env.cache_size, ttl=env.cache_ttl)
+
+default_cache = _default_cache()
+
+def cache_stats() -> CacheStats:
+    if default_cache is None:
+        return CacheStats()
+    return default_cache.stats()
+
+def mark_written(session: Session, backend: CacheBackend, entity: str, keys: list[tuple[Hashable, int]]):
+    """
+    Record a write of `entity` in the session transaction. Reads of that
+    entity bypass the cache until the transaction ends, and `keys` are
+    invalidated now and again once the transaction commits.
+    """
+    session.info.setdefault(DIRTY_KEY, set()).add(entity)
+    session.info.setdefault(PENDING_KEY, []).append((backend, keys))
+    for key, version in keys:
+        backend.invalidate(key, version)
+
+def is_written(session: Session, entity: str) -> bool:
+    return entity in session.info.get(DIRTY_KEY, ())
+
+@sa.event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session: Session):
+    pending = session.info.pop(PENDING_KEY, [])
+    session.info.pop(DIRTY_KEY, None)
+
+    def invalidate():
+        for backend, keys in pending:
+            for key, version in keys:
+                backend.invalidate(key, version)
+    on_commit(session, invalidate)
+
+@sa.event.listens_for(Session, 'after_rollback')
+def _reset_on_rollback(session: Session):
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(DIRTY_KEY, None)
@@ -1,5 +1,7 @@
 import click
 from pydantic import BaseModel
+import asyncio
+import functools
 import httpx 
 from uuid import UUID
 from tabulate import tabulate
@@ -11,18 +13,18 @@ import yaml
 
 def load_data_file(path: str) -> list[dict]:
     if path == '-':
-        d = sys.stdin.read()
+        payload = sys.stdin.read()
     elif path.lower().endswith('.json'):
         with open(path) as f:
-            d = json.loads(path)
+            d = json.load(f)
+        return d if isinstance(d, list) else [d]
     elif path.lower().endswith('.yaml') or path.lower().endswith('.yml'):
         with open(path) as f:
             payload = f.read()
-            blocks = payload.split('---')
-            return [yaml.safe_load(b) for b in blocks]
     else:
         raise ValueError(f"Unknown extension {path.lower().split('.')[-1]}")
-    return [d]
+    # JSON is a subset of YAML, so stdin may carry either
+    return [d for d in yaml.safe_load_all(payload) if d is not None]
 
 
 def handle_response(response: httpx.Response, print_errors=True) -> dict:
@@ -38,6 +40,115 @@ def handle_response(response: httpx.Response, print_errors=True) -> dict:
         return
     return response.json()
 
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+def iter_stream(client: httpx.Client, url: str, params: dict | None = None):
+    """
+    Yield records from a list endpoint in streaming mode, reading the 
+    newline delimited JSON body incrementally
+    """
+    with client.stream('GET', url, params=params, headers={'Accept': NDJSON_MEDIA_TYPE}) as response:
+        if response.status_code // 100 != 2:
+            response.read()
+            handle_response(response)
+            return
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+def print_records(records, model: type[BaseModel] | None, hidden_fields: list[str], ndjson: bool = False) -> int:
+    """
+    Print records as a table or as JSON lines. Without a model, records are
+    printed as received, for partial records of selected fields.
+    """
+    count = 0
+    data = []
+    for r in records:
+        if model is None:
+            row = {k: v for k, v in r.items() if k not in hidden_fields}
+        else:
+            row = model.model_validate(r).model_dump(mode='json' if ndjson else 'python', exclude=set(hidden_fields))
+        count += 1
+        if ndjson:
+            print(json.dumps(row), flush=True)
+        else:
+            data.append(row)
+    if data:
+        print(tabulate(data, headers='keys'))
+    return count
+
+def async_client(*, concurrency: int = 8, http2: bool = False) -> httpx.AsyncClient:
+    """
+    Shared client for a command run. Connections are kept alive and reused
+    across requests, up to one per concurrent request.
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        return httpx.AsyncClient(http2=http2, limits=limits, timeout=httpx.Timeout(30.0, connect=10.0))
+    except ImportError:
+        raise click.UsageError("HTTP/2 requires the h2 package, install httpx[http2]")
+
+async def run_concurrently(jobs: list, *, concurrency: int = 8) -> int:
+    """
+    Run `(label, coroutine function)` request jobs with at most `concurrency`
+    in flight. Progress is printed as jobs complete and failures are reported
+    at the end. Returns the number of failed jobs.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    total = len(jobs)
+    done = 0
+    failures = []
+
+    async def run(label, job):
+        nonlocal done
+        async with semaphore:
+            try:
+                response = await job()
+            except httpx.HTTPError as e:
+                response = e
+        done += 1
+        if isinstance(response, Exception) or response.status_code // 100 != 2:
+            failures.append((label, response))
+            print(f"[{done}/{total}] {label}: error", file=sys.stderr)
+            return
+        status = response.status_code
+        # a 204 or a body other than a JSON result only reports the status code
+        if response.content and response.headers.get('content-type', '').startswith('application/json'):
+            body = response.json()
+            if isinstance(body, dict):
+                status = body.get('status', status)
+        print(f"[{done}/{total}] {label}: {status}")
+
+    await asyncio.gather(*[run(label, job) for label, job in jobs])
+    for label, response in failures:
+        print(f"FAILED {label}", file=sys.stderr)
+        if isinstance(response, Exception):
+            print(f"{type(response).__name__}: {response}", file=sys.stderr)
+        else:
+            handle_response(response)
+    if total > 1:
+        print(f"{total - len(failures)} succeeded, {len(failures)} failed", file=sys.stderr)
+    return len(failures)
+
+def concurrency_options(func):
+    """
+    Add --concurrency and --http2 options to a command
+    """
+    func = click.option('--http2', is_flag=True, envvar='ORCHESTRIX_HTTP2', help='Use HTTP/2')(func)
+    func = click.option('-c', '--concurrency', default=8, show_default=True, type=click.IntRange(min=1),
+                        envvar='ORCHESTRIX_CONCURRENCY', help='Maximum number of requests in flight')(func)
+    return func
+
+def run_jobs(build_jobs, *, concurrency: int, http2: bool):
+    """
+    Build jobs against a shared async client and run them, returning the
+    number of failed jobs
+    """
+    async def main():
+        async with async_client(concurrency=concurrency, http2=http2) as client:
+            return await run_concurrently(build_jobs(client), concurrency=concurrency)
+    return asyncio.run(main())
+
 def construct_command(name: str, model: type[BaseModel], 
                       service_path: str,
                       server: str):
@@ -52,47 +163,35 @@ def construct_command(name: str, model: type[BaseModel],
         pass
 
     @click.command()
-    def list():
+    @click.option('--ndjson', is_flag=True, help='Print records as they arrive, one JSON document per line')
+    def list(ndjson: bool):
         with httpx.Client() as client:
-            response = client.get(f"{server}/{service_path}")
-            items = [model.model_validate(i) for i in response.json()['records']]
-            data = [i.model_dump() for i in items]
-            if not data:
+            # only fetch fields that are shown, internal fields are hidden
+            hidden = ['uid', 'id', 'created', 'modified', 'deleted', 'version', 'active']
+            fields = [f for f in model.model_fields if f not in hidden]
+            records = iter_stream(client, f"{server}/{service_path}", params={'fields': ','.join(fields)})
+            if not print_records(records, None, [], ndjson):
                 print("No items found")
-                return
-            for row in data:
-                # hide internal fields
-                for f in ['uid', 'id', 'created', 'modified', 'deleted', 'version', 'active']:
-                    del row[f]
-            tbl = tabulate(data, headers='keys')
-            print(tbl)
 
     @click.command()
-    def history():
+    @click.option('--ndjson', is_flag=True, help='Print records as they arrive, one JSON document per line')
+    def history(ndjson: bool):
         with httpx.Client() as client:
-            response = client.get(f"{server}/{service_path}/+history")
-            items = [model.model_validate(i) for i in response.json()['records']]
-            data = [i.model_dump() for i in items]
-            if not data:
+            # hide uid fields
+            records = iter_stream(client, f"{server}/{service_path}/+history")
+            if not print_records(records, model, ['uid', 'id'], ndjson):
                 print("No items found", file=sys.stderr)
-                return
-            for row in data:
-                # hide uid fields
-                for f in ['uid', 'id']:
-                    del row[f]
-            tbl = tabulate(data, headers='keys')
-            print(tbl)
 
     @click.command()
     @click.argument('data')
-    def create(data: str):
-        with httpx.Client() as client:
-            for d in load_data_file(data):
-                response = client.post(f"{server}/{service_path}", json=d)
-                result = handle_response(response)
-                if result is None:
-                    continue
-                print(result['status'])
+    @concurrency_options
+    def create(data: str, concurrency: int, http2: bool):
+        documents = load_data_file(data)
+        def jobs(client):
+            return [(d.get('name', f'#{i}'), functools.partial(client.post, f"{server}/{service_path}", json=d))
+                    for i, d in enumerate(documents)]
+        if run_jobs(jobs, concurrency=concurrency, http2=http2):
+            sys.exit(1)
 
     @click.command()
     @click.argument('name')
@@ -106,43 +205,57 @@ def construct_command(name: str, model: type[BaseModel],
 
     @click.command()
     @click.argument('name')
-    def history(name: str):
+    @click.option('--ndjson', is_flag=True, help='Print records as they arrive, one JSON document per line')
+    def history(name: str, ndjson: bool):
         with httpx.Client() as client:
-            response = client.get(f"{server}/{service_path}/{name}/+history")
-            items = [model.model_validate(i) for i in response.json()['records']]
-            data = [i.model_dump() for i in items]
-            if not data:
+            # hide uid fields
+            records = iter_stream(client, f"{server}/{service_path}/{name}/+history")
+            if not print_records(records, model, ['uid', 'id'], ndjson):
                 print("No items found", file=sys.stderr)
-                return
-            for row in data:
-                # hide uid fields
-                for f in ['uid', 'id']:
-                    del row[f]
-            tbl = tabulate(data, headers='keys')
-            print(tbl)
 
 
     @click.command()
-    @click.argument('name')
-    def delete(name: str):
-        with httpx.Client() as client:
-            response = client.delete(f"{server}/{service_path}/{name}")
-            result = handle_response(response)
-            if result is None:
-                return 
-            print(result['status'])
+    @click.argument('names', nargs=-1, required=True)
+    @concurrency_options
+    def delete(names: tuple[str], concurrency: int, http2: bool):
+        def jobs(client):
+            return [(name, functools.partial(client.delete, f"{server}/{service_path}/{name}")) 
+                    for name in names]
+        if run_jobs(jobs, concurrency=concurrency, http2=http2):
+            sys.exit(1)
 
     @click.command()
-    @click.argument('name')
-    @click.argument('data')
-    def update(name: str, data: str):
-        with httpx.Client() as client:
-            for d in load_data_file(data):
-                response = client.put(f"{server}/{service_path}/{name}", json=d)
-                result = handle_response(response)
-                if result is None:
-                    continue
-                print(result['status'])
+    @click.argument('args', nargs=-1, required=True, metavar='[NAME] DATA')
+    @concurrency_options
+    def update(args: tuple[str], concurrency: int, http2: bool):
+        """
+        Update NAME with each document in DATA. Without NAME, each document
+        is applied to the record named by its `name` field. Documents of the
+        same record are sent one at a time in file order, different records
+        are updated concurrently.
+        """
+        if len(args) > 2:
+            raise click.UsageError("Expected [NAME] DATA")
+        name = args[0] if len(args) == 2 else None
+        documents = load_data_file(args[-1])
+        targets = [name or d.get('name') for d in documents]
+        if not all(targets):
+            raise click.UsageError("Documents without a name field require NAME")
+        by_target: dict[str, list[dict]] = {}
+        for t, d in zip(targets, documents):
+            by_target.setdefault(t, []).append(d)
+
+        def jobs(client):
+            async def put(target, docs):
+                # each update supersedes the version written before it, stop at the first failure
+                for d in docs:
+                    response = await client.put(f"{server}/{service_path}/{target}", json=d)
+                    if response.status_code // 100 != 2:
+                        break
+                return response
+            return [(t, functools.partial(put, t, docs)) for t, docs in by_target.items()]
+        if run_jobs(jobs, concurrency=concurrency, http2=http2):
+            sys.exit(1)
 
 
     command.add_command(list)
@@ -66,4 +66,24 @@ class ModelValidationError(OrchestrixError):
                 "msg": "Model failed validation" or message,
                 "type": "model_validation_error"
         }]
-        super().__init__(status_code, detail, headers)
\ No newline at end of file
+        super().__init__(status_code, detail, headers)
+
+class PreconditionFailedError(OrchestrixError):
+    """
+    Exception raised when a conditional request does not match the record version
+    """
+    def __init__(self, *, message = None, headers = None):
+        status_code = 412
+        detail = [{
+                "msg": message or "Precondition failed",
+                "type": "precondition_failed_error"
+        }]
+        super().__init__(status_code, detail, headers)
+
+class BulkOperationError(OrchestrixError):
+    """
+    Exception raised when an all-or-nothing bulk operation fails on any item
+    """
+    def __init__(self, *, detail: list[dict], headers = None):
+        status_code = 422
+        super().__init__(status_code, detail, headers)
@@ -4,7 +4,7 @@ from uuid import UUID
 from datetime import datetime
 import sqlalchemy as sa
 from pydantic import AfterValidator, BaseModel
-from typing import Annotated, Optional
+from typing import Annotated, Literal, Optional
 import re
 import pendulum
 
@@ -13,10 +13,27 @@ def ts_now() -> datetime:
     tz = pendulum.timezone(env.timezone)
     return datetime.now(tz=tz)
 
+def localize(ts: datetime) -> datetime:
+    """
+    Convert a timestamp to the configured timezone, the timezone of stored 
+    timestamps. Naive timestamps are taken to be in that timezone already.
+    """
+    from ..env import env
+    tz = pendulum.timezone(env.timezone)
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=tz)
+    return ts.astimezone(tz)
+
+NAME_PATTERN = re.compile(r"[a-z0-9_]+")
+URN_PATTERN = re.compile(r"urn:[a-z0-9][a-z0-9-]{0,31}:[a-z0-9]+:[a-z0-9_\(\):,]+")
+UUID_PATTERN = re.compile(r"[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}")
+
+IdentifierKind = Literal['urn', 'id', 'name']
+
 def is_valid_name(name: str) -> str:
     if not name:
         raise ValueError("Name cannot be empty")
-    if not re.match("^[a-z0-9_]+$", name):
+    if NAME_PATTERN.fullmatch(name) is None:
         raise ValueError("Name can only contain lowercase letters, numbers, and underscores")
     if len(name) > 64:
         raise ValueError("Name cannot be longer than 64 characters")
@@ -25,21 +42,53 @@ def is_valid_name(name: str) -> str:
 def is_valid_urn(urn: str) -> str:
     if not urn:
         raise ValueError("URN cannot be empty")
-    if not re.match(r"^urn:[a-z0-9][a-z0-9-]{0,31}:[a-z0-9]+:[a-z0-9_\(\):,]+$", urn):
+    if URN_PATTERN.fullmatch(urn) is None:
         raise ValueError("URN is not valid")
     if len(urn) > 128:
         raise ValueError("URN cannot be longer than 128 characters")
     return urn
 
+def resolve_identifier(identifier: str | UUID) -> tuple[IdentifierKind, str | UUID]:
+    """
+    Classify a record identifier as a URN, an id or a name, returning the kind
+    and the normalized value. Dispatches on the prefix and length so the 
+    common cases cost a single match, and never raises.
+    """
+    if isinstance(identifier, UUID):
+        return 'id', identifier
+    if identifier.startswith('urn:'):
+        # a string with a colon can be neither a name nor an id, so an invalid 
+        # URN is still looked up as one and simply matches nothing
+        return 'urn', identifier
+    if len(identifier) in (32, 36) and UUID_PATTERN.fullmatch(identifier) is not None:
+        return 'id', UUID(identifier)
+    return 'name', identifier
+
 class CoreIndex(type(SQLModel)):
     def __new__(cls, name: str, bases: tuple[type], attrs: dict, **kwargs):
         c = super().__new__(cls, name, bases, attrs, **kwargs)
 
         if kwargs.get('table', False):
+            # indexes over active rows only, so lookups of the current version 
+            # do not grow with the number of superseded versions. SQLite only 
+            # uses a partial index when the query repeats its exact predicate.
+            active = {'sqlite_where': sa.text('active = 1'), 'postgresql_where': sa.text('active')}
             core_indexes = (
                 sa.Index(f'ix_{name.lower()}_id_version', 'id', 'version', unique=True),
-                sa.Index(f"ix_{name.lower()}_id_active", "id", "active"),
                 sa.Index(f'ix_{name.lower()}_urn_version', 'urn', 'version', unique=True),
+                # at most one active version per URN, create relies on it to detect duplicates
+                sa.Index(f'ix_{name.lower()}_urn_active', 'urn', unique=True, **active),
+                sa.Index(f"ix_{name.lower()}_id_active", "id", unique=True, **active),
+                sa.Index(f'ix_{name.lower()}_name_active', 'name', **active),
+                # keyset pagination of active records
+                sa.Index(f'ix_{name.lower()}_uid_active', 'uid', **active),
+                # lifetime of each version, for point in time lookups
+                sa.Index(f'ix_{name.lower()}_urn_modified_deleted', 'urn', 'modified', 'deleted'),
+                # versions current at a point in time across records, for as_of 
+                # listings and their ETag, covering the uid they are paged by
+                sa.Index(f'ix_{name.lower()}_modified_deleted', 'modified', 'deleted', 'uid'),
+                # order of changes, for watchers
+                sa.Index(f'ix_{name.lower()}_changed', sa.text('coalesce(deleted, modified)'), 'uid'),
             )
             if hasattr(c, "__table_args__"):
                 c.__table_args__ = (c.__table_args__ + core_indexes)
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+from pydantic import BaseModel
+from sqlmodel import select
+from typing import TYPE_CHECKING
+import asyncio
+import logging
+import sqlalchemy as sa
+from ..db import db_engine, db_sessionmaker, db_write_session
+from .model import ts_now
+
+if TYPE_CHECKING:
+    from .service import Service
+
+__all__ = ['RetentionPolicy', 'CompactionResult', 'compact', 'compact_all', 'compaction_loop']
+
+logger = logging.getLogger(__name__)
+
+class RetentionPolicy(BaseModel):
+    """
+    Which superseded versions of a record to keep. A version is removed
+    unless one of the rules keeps it, active versions are never removed.
+    """
+    # newest superseded versions of each record that are always kept
+    keep_last: int = 0
+    # versions superseded within this period are always kept
+    keep_for: timedelta | None = None
+    # older versions are thinned to the last version of each day instead of removed
+    thin_daily: bool = False
+    # versions superseded longer ago than this are removed even when thinned
+    max_age: timedelta | None = None
+
+class CompactionResult(BaseModel):
+    entity_type: str
+    reclaimed: int = 0
+
+def _day(column, dialect_name: str):
+    if dialect_name == 'sqlite':
+        return sa.func.date(column)
+    return sa.cast(column, sa.Date)
+
+def reclaimable_query(model_class, policy: RetentionPolicy, now: datetime, dialect_name: str,
+                      ids: list | None = None):
+    """
+    Select the uid of every superseded version the policy does not keep,
+    of the records with the given `ids` or of all records
+    """
+    rank = sa.func.row_number().over(partition_by=model_class.id,
+                                     order_by=model_class.version.desc())
+    day_rank = sa.func.row_number().over(partition_by=(model_class.id, _day(model_class.deleted, dialect_name)),
+                                         order_by=model_class.version.desc())
+    versions = (select(model_class.uid, model_class.deleted,
+                       rank.label('rank'), day_rank.label('day_rank'))
+                .where(model_class.active == False))
+    if ids is not None:
+        versions = versions.where(model_class.id.in_(ids))
+    versions = versions.subquery()
+
+    filter = versions.c.rank > policy.keep_last
+    if policy.keep_for is not None:
+        filter &= versions.c.deleted < now - policy.keep_for
+    if policy.thin_daily:
+        daily = versions.c.day_rank == 1
+        if policy.max_age is not None:
+            daily &= versions.c.deleted >= now - policy.max_age
+        filter &= ~daily
+    return select(versions.c.uid).where(filter)
+
+async def compact(service_class: type['Service'], *, batch_size: int | None = None,
+                  now: datetime | None = None, dry_run: bool = False) -> CompactionResult:
+    """
+    Remove superseded versions of a service's records according to its
+    retention policy. Each batch of deletes is its own short transaction
+    so compaction never holds locks for long.
+    """
+    from ..env import env
+    from .service import chunked
+    entity_type = service_class.urn_entity_type()
+    result = CompactionResult(entity_type=entity_type)
+    policy = service_class.retention()
+    if policy is None:
+        return result
+
+    model_class = service_class.model_class()
+    batch_size = batch_size or env.compaction_batch_size
+    now = now or ts_now()
+    sessionmaker = db_sessionmaker()
+    dialect_name = db_engine().dialect.name
+
+    if dry_run:
+        reclaimable = reclaimable_query(model_class, policy, now, dialect_name).subquery()
+        async with sessionmaker() as session:
+            count = await session.exec(select(sa.func.count()).select_from(reclaimable))
+            result.reclaimed = count.one()
+        return result
+
+    # the policy ranks the versions of each record on their own, so records
+    # are paged by id and the versions of a page are ranked without reading
+    # the others. Each batch of deletes is its own short transaction.
+    last = None
+    while True:
+        page = (select(model_class.id).where(model_class.active == False)
+                .group_by(model_class.id).order_by(model_class.id).limit(batch_size))
+        if last is not None:
+            page = page.where(model_class.id > last)
+        async with sessionmaker() as session:
+            ids = list((await session.exec(page)).all())
+            if not ids:
+                return result
+            uids = list((await session.exec(
+                reclaimable_query(model_class, policy, now, dialect_name, ids))).all())
+        for chunk in chunked(uids, batch_size):
+            async with db_write_session() as session:
+                deleted = await session.exec(sa.delete(model_class).where(model_class.uid.in_(chunk)))
+                await session.commit()
+            result.reclaimed += deleted.rowcount
+            # let other work in between batches
+            await asyncio.sleep(0)
+        last = ids[-1]
+
+async def compact_all(entity_types: list[str] | None = None, **kwargs) -> list[CompactionResult]:
+    from .service import service_registry
+    entity_types = entity_types or list(service_registry.keys())
+    results = []
+    for entity_type in entity_types:
+        if entity_type not in service_registry:
+            raise ValueError(f'Unknown entity type {entity_type}')
+        results.append(await compact(service_registry[entity_type], **kwargs))
+    return results
+
+async def compaction_loop(interval: float):
+    """
+    Compact every registered service each `interval` seconds, for running
+    as a background task of the app
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            for result in await compact_all():
+                if result.reclaimed:
+                    logger.info('Compacted %s, %d versions reclaimed', result.entity_type, result.reclaimed)
+        except Exception:
+            logger.exception('History compaction failed')
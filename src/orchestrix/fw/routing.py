@@ -0,0 +1,136 @@
+from fastapi.openapi.utils import get_openapi
+from pathlib import Path
+from starlette._utils import get_route_path
+from starlette.routing import BaseRoute, Match, NoMatchFound
+from typing import TYPE_CHECKING, Any
+import fastapi
+import hashlib
+import json
+import logging
+import pydantic
+
+if TYPE_CHECKING:
+    from .service import Service
+
+__all__ = ['LazyRouter', 'expand_routes', 'install_openapi']
+
+logger = logging.getLogger(__name__)
+
+# scope key of the route a lazy router matched
+MATCHED_KEY = 'orchestrix.lazy_route'
+
+class LazyRouter(BaseRoute):
+    """
+    Routes of a service, built on the first request under its path instead
+    of when the app starts. Building the routes, with the request and
+    response models of every route, is most of the startup time of a worker.
+    """
+
+    def __init__(self, service: type['Service'], tags: list[str] | None = None):
+        self.service = service
+        self.prefix = service.service_path()
+        self.tags = tags
+        self._router: fastapi.APIRouter | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._router is not None
+
+    @property
+    def routes(self) -> list[BaseRoute]:
+        if self._router is None:
+            router = fastapi.APIRouter()
+            router.include_router(self.service.router(), tags=self.tags)
+            self._router = router
+        return self._router.routes
+
+    def matches(self, scope) -> tuple[Match, dict]:
+        if scope['type'] != 'http':
+            return Match.NONE, {}
+        path = get_route_path(scope)
+        if path != self.prefix and not path.startswith(self.prefix + '/'):
+            return Match.NONE, {}
+        partial = None
+        for route in self.routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return match, {**child_scope, MATCHED_KEY: route}
+            if match == Match.PARTIAL and partial is None:
+                partial = {**child_scope, MATCHED_KEY: route}
+        if partial is not None:
+            return Match.PARTIAL, partial
+        return Match.NONE, {}
+
+    async def handle(self, scope, receive, send):
+        await scope[MATCHED_KEY].handle(scope, receive, send)
+
+    def url_path_for(self, name: str, /, **path_params: Any):
+        for route in self.routes:
+            try:
+                return route.url_path_for(name, **path_params)
+            except NoMatchFound:
+                pass
+        raise NoMatchFound(name, path_params)
+
+def expand_routes(routes: list[BaseRoute]) -> list[BaseRoute]:
+    """
+    Routes with lazy routers replaced by their routes, loading them
+    """
+    expanded = []
+    for route in routes:
+        expanded.extend(route.routes if isinstance(route, LazyRouter) else [route])
+    return expanded
+
+def source_fingerprint() -> str:
+    """
+    Digest of the package sources and the versions generating schemas
+    from them, a cached document is stale once it changes
+    """
+    root = Path(__file__).resolve().parent.parent
+    digest = hashlib.sha256(f'{fastapi.__version__}/{pydantic.VERSION}'.encode())
+    for path in sorted(root.rglob('*.py')):
+        stat = path.stat()
+        digest.update(f'{path.relative_to(root)}:{stat.st_mtime_ns}:{stat.st_size}'.encode())
+    return digest.hexdigest()
+
+def install_openapi(app: fastapi.FastAPI, cache_path: str | None = None):
+    """
+    Generate the OpenAPI document including the routes of lazy routers,
+    and keep it in `cache_path` so later starts of the same code serve it
+    without building any route
+    """
+    def openapi() -> dict[str, Any]:
+        if app.openapi_schema:
+            return app.openapi_schema
+        fingerprint = source_fingerprint() if cache_path else None
+        if cache_path:
+            try:
+                cached = json.loads(Path(cache_path).read_text())
+                if cached.get('fingerprint') == fingerprint:
+                    app.openapi_schema = cached['document']
+                    return app.openapi_schema
+            except (OSError, ValueError):
+                pass
+        app.openapi_schema = get_openapi(
+            title=app.title,
+            version=app.version,
+            openapi_version=app.openapi_version,
+            summary=app.summary,
+            description=app.description,
+            terms_of_service=app.terms_of_service,
+            contact=app.contact,
+            license_info=app.license_info,
+            routes=expand_routes(app.routes),
+            webhooks=app.webhooks.routes,
+            tags=app.openapi_tags,
+            servers=app.servers,
+            separate_input_output_schemas=app.separate_input_output_schemas,
+        )
+        if cache_path:
+            try:
+                Path(cache_path).write_text(json.dumps({'fingerprint': fingerprint,
+                                                        'document': app.openapi_schema}))
+            except OSError:
+                logger.warning('Could not write the OpenAPI cache to %s', cache_path, exc_info=True)
+        return app.openapi_schema
+    app.openapi = openapi
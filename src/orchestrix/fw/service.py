@@ -1,17 +1,31 @@
-from pydantic import BaseModel, Field, create_model, AnyUrl
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter, ValidationError, create_model, AnyUrl
 import fastapi
-from fastapi import Depends
+from fastapi import Depends, Query, Header
+from fastapi.responses import StreamingResponse
 import sqlalchemy as sa
 from uuid import UUID
+from datetime import datetime, timedelta
+from sqlalchemy.orm import aliased
 from sqlmodel import SQLModel, Session, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 import sqlalchemy.exc as saexc
-from orchestrix.db import DbSession
-from orchestrix.fw.model import ts_now, Core, is_valid_urn
-from orchestrix.fw.exc import ModelValidationError, AlreadyExistError
-from typing import Generic, TypeVar, Any, Literal, Annotated, Union, List
+from sqlalchemy.dialects import postgresql, sqlite
+from orchestrix.db import DbSession, db_read_session
+from orchestrix.fw.model import ts_now, localize, Core, resolve_identifier, IdentifierKind
+from orchestrix.fw.retention import RetentionPolicy
+from orchestrix.fw.cache import CacheBackend, default_cache, mark_written, is_written
+from orchestrix.fw.watch import change_notifier, mark_changed
+from orchestrix.fw.exc import (ModelValidationError, AlreadyExistError, FieldValidationError, 
+                               OrchestrixError, BulkOperationError, PreconditionFailedError)
+from typing import Generic, TypeVar, Any, Literal, Annotated, Union, List, AsyncIterator, Callable, NamedTuple
 import abc
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
 import jinja2 as j2
+import struct
 from .exc import NotFoundError
 
 T = TypeVar("T", bound=Core)
@@ -41,6 +55,199 @@ class ListResult(BaseResult, Generic[T]):
     records: list[T] | None = None
     meta: PaginationMeta | None = None
 
+class Page(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    records: list[Any] = Field(default_factory=list)
+    page_size: int
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+    etag: str | None = None
+    # the records were not fetched, the client has the current page
+    not_modified: bool = False
+
+    def meta(self, request: fastapi.Request) -> PaginationMeta:
+        meta = PaginationMeta(page_size=self.page_size)
+        if self.next_cursor:
+            meta.next_page = str(request.url.include_query_params(cursor=self.next_cursor))
+        if self.prev_cursor:
+            meta.prev_page = str(request.url.include_query_params(cursor=self.prev_cursor))
+        return meta
+
+BULK_MODES = Literal["atomic", "partial"]
+
+# upper bound of bound parameters per IN (...) clause
+IN_CHUNK_SIZE = 500
+
+def chunked(items: list, size: int = IN_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+class BulkItemResult(BaseResult, Generic[T]):
+    index: int
+    urn: str | None = None
+    record: T | None = None
+
+    def fail(self, error: OrchestrixError, loc: list[Any] | None = None):
+        self.status = "error"
+        self.record = None
+        detail = error.detail if isinstance(error.detail, list) else [{'msg': str(error.detail)}]
+        self.detail = [ErrorDetail(**{**d, 'loc': (loc or []) + list(d.get('loc', []))}) for d in detail]
+
+class BulkResult(BaseResult, Generic[T]):
+    results: list[BulkItemResult[T]] = Field(default_factory=list)
+
+def bulk_failure(results: list[BulkItemResult]) -> BulkOperationError | None:
+    detail = []
+    for r in results:
+        if r.status == "error":
+            detail.extend(d.model_dump() for d in r.detail or [])
+    if detail:
+        return BulkOperationError(detail=detail)
+    return None
+
+def version_etag(urn: str, version: int) -> str:
+    digest = hashlib.blake2b(urn.encode(), digest_size=8).hexdigest()
+    return f'"{version}-{digest}"'
+
+def record_etag(model: Core) -> str:
+    return version_etag(model.urn, model.version)
+
+def collection_etag(keys: list[UUID], changed: datetime | None, more: bool) -> str:
+    changed = localize(changed).isoformat() if changed else ''
+    digest = hashlib.blake2b(f'{",".join(k.hex for k in keys)}/{changed}/{more}'.encode(), 
+                             digest_size=8).hexdigest()
+    return f'"{len(keys)}-{digest}"'
+
+def etag_matches(if_none_match: str | None, etag: str | None) -> bool:
+    """
+    Whether an If-None-Match header matches `etag`, using the weak comparison
+    """
+    if if_none_match is None or etag is None:
+        return False
+    tags = [t.strip().removeprefix('W/') for t in if_none_match.split(',')]
+    return '*' in tags or etag in tags
+
+def not_modified_response(etag: str) -> fastapi.Response:
+    return fastapi.Response(status_code=304, headers={'ETag': etag})
+
+def parse_if_match(value: str | None) -> int | None:
+    """
+    Version expected by an If-Match header, None when any version matches
+    """
+    if value is None or value.strip() == '*':
+        return None
+    tag = value.strip().removeprefix('W/').strip('"')
+    try:
+        # the version leads the tag
+        return int(tag.split('-')[0])
+    except ValueError:
+        raise FieldValidationError(field_location=['header', 'if-match'], message='Invalid If-Match header')
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+def wants_stream(request: fastapi.Request, stream: bool = False) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get('accept', '')
+
+CURSOR_DIRECTIONS = Literal["next", "prev"]
+
+def encode_cursor(key: UUID, direction: CURSOR_DIRECTIONS = "next") -> str:
+    raw = direction[0].encode('ascii') + key.bytes
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple[CURSOR_DIRECTIONS, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction = {b'n': 'next', b'p': 'prev'}[raw[:1]]
+        return direction, UUID(bytes=raw[1:])
+    except (binascii.Error, KeyError, ValueError):
+        raise FieldValidationError(field_location=['query', 'cursor'], message='Invalid cursor')
+
+class WatchWindow(NamedTuple):
+    """
+    Position of a watcher. Changes after `floor`, a (change time, uid) 
+    keyset, are read again and those in `seen` are skipped.
+    """
+    floor: tuple[datetime, UUID]
+    seen: dict[UUID, datetime]
+
+WATCH_CURSOR_VERSION = b'\x01'
+WATCH_EPOCH = datetime(1970, 1, 1)
+
+def _microseconds(delta: timedelta) -> int:
+    return delta // timedelta(microseconds=1)
+
+def encode_watch_cursor(window: WatchWindow) -> str:
+    """
+    Cursor of the floor and of the changes seen after it, each as its uid
+    and the microseconds it changed after the floor
+    """
+    changed, key = window.floor
+    raw = (WATCH_CURSOR_VERSION + struct.pack('>q', _microseconds(changed - localize(WATCH_EPOCH))) + 
+           key.bytes + b''.join(k.bytes + struct.pack('>q', _microseconds(c - changed)) 
+                                for k, c in window.seen.items()))
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_watch_cursor(cursor: str) -> WatchWindow:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        if raw[:1] != WATCH_CURSOR_VERSION:
+            # earlier cursors listed every change of the overlap as text, 
+            # they resume after the latest one
+            changed, entries = raw.decode('ascii').split('/')
+            return WatchWindow((localize(datetime.fromisoformat(changed)), 
+                                UUID(hex=entries.split(',')[0])), {})
+        if (len(raw) - 25) % 24:
+            raise ValueError(cursor)
+        changed = localize(WATCH_EPOCH) + timedelta(microseconds=struct.unpack('>q', raw[1:9])[0])
+        seen = {UUID(bytes=raw[i:i + 16]): changed + timedelta(microseconds=struct.unpack('>q', raw[i + 16:i + 24])[0])
+                for i in range(25, len(raw), 24)}
+        return WatchWindow((changed, UUID(bytes=raw[9:25])), seen)
+    except (binascii.Error, UnicodeDecodeError, ValueError, struct.error):
+        raise FieldValidationError(field_location=['query', 'since'], message='Invalid cursor')
+
+def advance_watch_window(window: WatchWindow, key: UUID, changed: datetime, 
+                         overlap: float, limit: int) -> WatchWindow:
+    """
+    Add a change read by a watcher to the window. The floor moves up to 
+    `overlap` seconds before the latest change, and past the oldest changes
+    when more than `limit` are seen, so the cursor stays small.
+    """
+    seen = {**window.seen, key: localize(changed)}
+    floor = max(window.floor, (max(seen.values()) - timedelta(seconds=overlap), UUID(int=0)))
+    for k in sorted(seen, key=lambda k: (seen[k], k))[:max(len(seen) - limit, 0)]:
+        floor = max(floor, (seen[k], k))
+    return WatchWindow(floor, {k: c for k, c in seen.items() if (c, k) > floor})
+
+# cursor before any change
+WATCH_START = encode_watch_cursor(WatchWindow((localize(WATCH_EPOCH), UUID(int=0)), {}))
+
+EVENT_STREAM_MEDIA_TYPE = 'text/event-stream'
+
+def wants_events(request: fastapi.Request) -> bool:
+    return EVENT_STREAM_MEDIA_TYPE in request.headers.get('accept', '')
+
+class Expansion(BaseModel):
+    """
+    Related records a response can embed with ?expand=. Records of `service`
+    whose `remote_field` equals the `local_field` of the expanded record.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    service: type
+    local_field: str
+    remote_field: str
+    many: bool = False
+    # records embedded per expanded record of a to-many relation, 
+    # `expand_limit` when not set
+    limit: int | None = None
+
+class WatchResult(BaseResult, Generic[T]):
+    records: list[T]
+    cursor: str
+
+# services with mounted routes, keyed by urn entity type
+service_registry: dict[str, type['Service']] = {}
 
 def redefine_model(name, Model: type[BaseModel], *, exclude=None) -> type[BaseModel]:
     exclude = exclude or []
@@ -63,17 +270,22 @@ class Service(Generic[S], abc.ABC):
     
     @classmethod
     def createmodel_class(cls) -> type[BaseModel]:
-        model_class = cls.model_class()
-        schema_class = cls.schema_class()
-        return redefine_model(f'Create {model_class.__name__}', schema_class, 
-                                     exclude=cls.internal_fields())
+        # built once per service, apply asks for it on every request
+        if '_createmodel_class' not in cls.__dict__:
+            model_class = cls.model_class()
+            schema_class = cls.schema_class()
+            cls._createmodel_class = redefine_model(f'Create {model_class.__name__}', schema_class, 
+                                                    exclude=cls.internal_fields())
+        return cls._createmodel_class
     
     @classmethod
     def updatemodel_class(cls) -> type[BaseModel]:
-        model_class = cls.model_class()
-        schema_class = cls.schema_class()
-        return redefine_model(f'Update {model_class.__name__}', schema_class,
-                                     exclude=cls.internal_fields() + cls.immutable_fields())
+        if '_updatemodel_class' not in cls.__dict__:
+            model_class = cls.model_class()
+            schema_class = cls.schema_class()
+            cls._updatemodel_class = redefine_model(f'Update {model_class.__name__}', schema_class,
+                                                    exclude=cls.internal_fields() + cls.immutable_fields())
+        return cls._updatemodel_class
 
 
     @classmethod
@@ -106,6 +318,42 @@ class Service(Generic[S], abc.ABC):
         # fields that can't be updated, but not internal fields
         return ['name']
     
+    @classmethod
+    def default_page_size(cls) -> int:
+        return 100
+
+    @classmethod
+    def max_page_size(cls) -> int:
+        return 1000
+
+    @classmethod
+    def max_bulk_size(cls) -> int:
+        return 5000
+
+    @classmethod
+    def stream_batch_size(cls) -> int:
+        return 500
+
+    @classmethod
+    def cache(cls) -> CacheBackend | None:
+        # return None to disable caching of this service
+        return default_cache
+
+    @classmethod
+    def expansions(cls) -> dict[str, Expansion]:
+        # relations that can be embedded in responses, by name
+        return {}
+
+    @classmethod
+    def retention(cls) -> RetentionPolicy | None:
+        # superseded versions to keep, None keeps the full history
+        return None
+
+    @classmethod
+    def fast_serialization(cls) -> bool:
+        # serialize records straight to JSON instead of validating them against the response model
+        return False
+
     @classmethod
     def urn_namespace(cls) -> str:
         model_class = cls.model_class()
@@ -126,125 +374,773 @@ class Service(Generic[S], abc.ABC):
         urn = f'urn:{namespace}:{entity_type}:{model.name}'
         return urn
 
-    async def create(self, data: Core) -> S:
+    def new_record(self, data: Core) -> S:
         model_class = self.__class__.model_class()
-        data = await self.validate_data(data)
         parsed_data = data.model_dump(exclude=self.internal_fields())
-        urn = self.urn(data)
-        parsed_data['urn'] = urn
-        if not parsed_data:
-            raise ValueError("No data provided")
-        
+        parsed_data['urn'] = self.urn(data)
+        return model_class(**parsed_data)
+
+    def new_version(self, model: S, data: Core) -> S:
+        model_class = self.__class__.model_class()
+        newdata = model.model_dump(exclude=self.noninheritable_fields())
+        newdata.update(data.model_dump(exclude_unset=True))
+        newdata['version'] = model.version + 1
+        return model_class(**newdata)
+
+    def cache_keys(self, model: S) -> list[tuple]:
+        entity = self.__class__.model_class().__name__
+        return [(entity, 'urn', model.urn), (entity, 'id', model.id), (entity, 'name', model.name)]
+
+    def cache_record(self, model: S):
+        cache = self.cache()
+        snapshot = model.model_dump()
+        for key in self.cache_keys(model):
+            cache.set(key, snapshot, model.version)
+
+    def invalidate(self, records: list[S], *, retired: bool = False):
+        """
+        Invalidate cached copies of written records. A retired version may not
+        be cached again, a new version may.
+        """
+        if not records:
+            return
+        mark_changed(self.db.sync_session, self.__class__.model_class().__name__)
+        cache = self.cache()
+        if cache is None:
+            return
+        keys = [(key, r.version + 1 if retired else r.version) 
+                for r in records for key in self.cache_keys(r)]
+        mark_written(self.db.sync_session, cache, self.__class__.model_class().__name__, keys)
+
+    async def insert_record(self, model: S) -> bool:
+        """
+        Insert a record in a single statement, returning False instead of 
+        raising when it conflicts with a unique index
+        """
+        model_class = self.__class__.model_class()
+        dialect = self.db.get_bind().dialect
+        values = model.model_dump()
+        upsert_insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}.get(dialect.name)
+        if upsert_insert is not None and dialect.insert_returning:
+            stmt = (upsert_insert(model_class).values(**values)
+                    .on_conflict_do_nothing().returning(model_class.uid))
+            result = await self.db.exec(stmt)
+            return result.first() is not None
         try:
-            await self.get(urn)
-            raise AlreadyExistError(message=f'Already Exists: {urn}')
-        except NotFoundError:
-            pass
-        model = model_class(**parsed_data)
-        self.db.add(model)
+            async with self.db.begin_nested():
+                await self.db.exec(sa.insert(model_class).values(**values))
+        except saexc.IntegrityError:
+            return False
+        return True
+
+    async def create(self, data: Core) -> S:
+        data = await self.validate_data(data)
+        model = self.new_record(data)
+        urn = model.urn
+
         try:
-            await self.db.flush()
+            inserted = await self.insert_record(model)
+            if not inserted:
+                # either an active record exists, or the URN was deleted 
+                # and is created again as the next version of its history
+                if await self.continue_history([model]):
+                    raise AlreadyExistError(message=f'Already Exists: {urn}')
+                inserted = await self.insert_record(model)
         except saexc.IntegrityError as e:
             raise ModelValidationError(message=e.args[0])
-        await self.db.refresh(model)
+        if not inserted:
+            raise AlreadyExistError(message=f'Already Exists: {urn}')
+        self.invalidate([model])
         return model
 
-    async def get(self, model_id: str | UUID) -> S:
+    def identifier_filter(self, model_id: str | UUID) -> tuple[Any, IdentifierKind, str | UUID]:
+        """
+        Filter matching a URN, id or name, with the identifier kind and 
+        normalized value
+        """
         model_class = self.__class__.model_class()
+        kind, model_id = resolve_identifier(model_id)
+        return getattr(model_class, kind) == model_id, kind, model_id
 
-        if isinstance(model_id, str):
-            try:
-                is_valid_urn(model_id)
-                filter = model_class.urn == model_id
-            except ValueError:
-                try:
-                    model_id = UUID(model_id)
-                    filter = model_class.id == model_id
-                except ValueError:
-                    filter = model_class.name == model_id
+    def current_filter(self, as_of: datetime | None = None):
+        """
+        Filter matching the versions current at `as_of`, the active versions
+        when it is not given. A version is current from when it was written
+        (`modified`) until it was superseded or deleted (`deleted`).
+        """
+        model_class = self.__class__.model_class()
+        if as_of is None:
+            return model_class.active == True
+        as_of = localize(as_of)
+        return ((model_class.modified <= as_of) & 
+                (model_class.deleted.is_(None) | (model_class.deleted > as_of)))
 
+    async def get(self, model_id: str | UUID, *, cached: bool = True, 
+                  as_of: datetime | None = None) -> S:
+        """
+        Get the active record by URN, id or name, or the version that was 
+        current at `as_of`. Reads go through the cache unless `cached` is 
+        false, `as_of` is given or this transaction wrote to the entity type.
+        """
+        model_class = self.__class__.model_class()
+        filter, kind, model_id = self.identifier_filter(model_id)
+
+        cache = self.cache() if cached and as_of is None else None
+        if cache is not None and not is_written(self.db.sync_session, model_class.__name__):
+            snapshot = cache.get((model_class.__name__, kind, model_id))
+            if snapshot is not None:
+                return model_class.model_validate(snapshot)
         else:
-            filter = model_class.id == model_id
+            cache = None
 
-        filter &= (model_class.active == True)
+        filter &= self.current_filter(as_of)
         result = await self.db.exec(select(model_class).where(filter))
         obj = result.first()
         if not obj:
             raise NotFoundError(message=f"{model_class.__name__}({model_id})")
+        if cache is not None:
+            self.cache_record(obj)
         return obj
+
+    async def get_etag(self, model_id: str | UUID, *, as_of: datetime | None = None) -> str | None:
+        """
+        ETag of the record `get` returns, from a lookup of only its urn and
+        version. None when there is no such record.
+        """
+        model_class = self.__class__.model_class()
+        filter, kind, model_id = self.identifier_filter(model_id)
+
+        cache = self.cache() if as_of is None else None
+        if cache is not None and not is_written(self.db.sync_session, model_class.__name__):
+            snapshot = cache.get((model_class.__name__, kind, model_id))
+            if snapshot is not None:
+                return version_etag(snapshot['urn'], snapshot['version'])
+
+        filter &= self.current_filter(as_of)
+        result = await self.db.exec(select(model_class.urn, model_class.version).where(filter))
+        row = result.first()
+        return version_etag(row.urn, row.version) if row else None
     
-    async def get_history(self, model_id: str | UUID) -> list[S]:
+    async def get_history(self, model_id: str | UUID, *, cursor: str | None = None,
+                          page_size: int | None = None, fields: list[str] | None = None,
+                          etag: bool = False, if_none_match: str | None = None) -> Page:
         model_class = self.__class__.model_class()
 
-        if isinstance(model_id, str):
-            try:
-                is_valid_urn(model_id)
-                filter = model_class.urn == model_id
-            except ValueError:
-                model_id = UUID(model_id)
-                filter = model_class.id == model_id
-        else:
-            filter = model_class.id == model_id
+        filter, kind, model_id = self.identifier_filter(model_id)
+        if kind == 'name':
+            # names are not unique across parents, follow the active record
+            filter = model_class.id == (await self.get(model_id)).id
 
-        results = await self.db.exec(select(model_class).where(filter))
-        return results
+        return await self.paginate(self.select(fields).where(filter), 
+                                   cursor=cursor, page_size=page_size, 
+                                   etag=etag, if_none_match=if_none_match)
 
 
-    async def update(self, model_id: str | UUID, data: Core) -> S:
+    async def retire(self, model_id: str | UUID, *, expected_version: int | None = None,
+                     now: datetime | None = None) -> S:
+        """
+        Mark the active version as superseded with a single UPDATE ... RETURNING,
+        optionally only if it is still at `expected_version`
+        """
+        model_class = self.__class__.model_class()
+        filter, kind, model_id = self.identifier_filter(model_id)
+        if kind == 'name':
+            # names are not unique across parents, retire exactly one record
+            filter = model_class.urn == (await self.get(model_id)).urn
+        filter &= (model_class.active == True)
+        if expected_version is not None:
+            filter &= (model_class.version == expected_version)
 
-        data = await self.validate_data(data)
-        model = await self.get(model_id)
-        model_class = self.model_class()
-        # delete old record
-        old_version = model.version
-        model.sqlmodel_update({'deleted': ts_now(), 'active': False})
-        # create new record
-        newdata = model.model_dump(exclude=self.noninheritable_fields())
-        newdata.update(data.model_dump(exclude_unset=True))
-        newdata['version'] = old_version + 1
-        new = model_class(**newdata)
-        self.db.add(new)
-        await self.db.flush()
-        await self.db.refresh(model)
+        stmt = sa.update(model_class).where(filter).values(deleted=now or ts_now(), active=False)
+        if self.db.get_bind().dialect.update_returning:
+            result = await self.db.exec(stmt.returning(model_class))
+            model = result.scalar_one_or_none()
+        else:
+            result = await self.db.exec(select(model_class).where(filter).with_for_update())
+            model = result.first()
+            if model is not None:
+                await self.db.exec(stmt)
+                await self.db.refresh(model)
+
+        if model is None:
+            if expected_version is not None:
+                # distinguish a stale version from a missing record
+                current = await self.get(model_id, cached=False)
+                raise PreconditionFailedError(
+                    message=f'{model_class.__name__}({model_id}) is at version {current.version}, '
+                            f'expected {expected_version}')
+            raise NotFoundError(message=f"{model_class.__name__}({model_id})")
+        self.invalidate([model], retired=True)
         return model
 
-    async def delete(self, model_id: str | UUID):
-        model = await self.get(model_id)
-        model.sqlmodel_update({'deleted': ts_now(), 'active': False})
-        await self.db.flush()
+    async def update(self, model_id: str | UUID, data: Core, *, 
+                     expected_version: int | None = None) -> S:
+        """
+        Write a new version of a record. Returns the new version.
+        """
+        data = await self.validate_data(data)
+        now = ts_now()
+        model = await self.retire(model_id, expected_version=expected_version, now=now)
+        new = self.new_version(model, data)
+        # the new version takes over the instant the old one is superseded
+        new.modified = now
+        await self.insert_records([new])
+        return new
+
+    async def delete(self, model_id: str | UUID, *, expected_version: int | None = None):
+        await self.retire(model_id, expected_version=expected_version)
 
-    async def list_active(self) -> list[S]:
+    async def get_many(self, urns: list[str]) -> dict[str, S]:
+        """
+        Load the active records for a list of URNs, one IN (...) query per chunk
+        """
         model_class = self.__class__.model_class()
-        filter = (model_class.active == True)
-        models = await self.db.exec(select(model_class).where(filter))
-        return models.all()
-    
-    async def list_history(self) -> list[S]:
+        found = {}
+        for chunk in chunked(list(set(urns))):
+            result = await self.db.exec(select(model_class).where(
+                model_class.urn.in_(chunk) & (model_class.active == True)))
+            found.update({m.urn: m for m in result.all()})
+        return found
+
+    async def existing_urns(self, urns: list[str]) -> set[str]:
+        model_class = self.__class__.model_class()
+        found = set()
+        for chunk in chunked(list(set(urns))):
+            result = await self.db.exec(select(model_class.urn).where(
+                model_class.urn.in_(chunk) & (model_class.active == True)))
+            found.update(result.all())
+        return found
+
+    async def continue_history(self, records: list[S]) -> set[str]:
+        """
+        Turn new records of deleted URNs into the next version of their
+        history, with the id of the URN. Returns the URNs that have an active
+        record, those can not be created.
+        """
+        model_class = self.__class__.model_class()
+        by_urn = {r.urn: r for r in records}
+        existing = await self.existing_urns(list(by_urn))
+        for chunk in chunked([urn for urn in by_urn if urn not in existing]):
+            result = await self.db.exec(select(model_class.urn, model_class.id, 
+                                               sa.func.max(model_class.version))
+                                        .where(model_class.urn.in_(chunk))
+                                        .group_by(model_class.urn, model_class.id))
+            for urn, id, version in result.all():
+                record = by_urn[urn]
+                # follow the latest history, should a URN have had several ids
+                if record.version <= version:
+                    record.id, record.version = id, version + 1
+        return existing
+
+    async def insert_records(self, records: list[S]):
+        """
+        Insert records with a single executemany statement
+        """
+        if not records:
+            return
+        model_class = self.__class__.model_class()
+        await self.db.exec(sa.insert(model_class), params=[r.model_dump() for r in records])
+        self.invalidate(records)
+
+    async def retire_records(self, records: list[S], *, now: datetime | None = None):
+        """
+        Mark records as superseded with one UPDATE per chunk
+        """
         model_class = self.__class__.model_class()
-        models = await self.db.exec(select(model_class))
-        return models
+        now = now or ts_now()
+        for chunk in chunked([r.uid for r in records]):
+            # the loaded records are left as they were, a savepoint rolled back
+            # would otherwise expire them and a retry could not read them
+            await self.db.exec(sa.update(model_class).where(model_class.uid.in_(chunk))
+                               .values(deleted=now, active=False)
+                               .execution_options(synchronize_session=False))
+        self.invalidate(records, retired=True)
+
+    async def _write_batch(self, pending: dict[int, tuple[list[S], list[S]]],
+                           results: list[BulkItemResult], mode: BULK_MODES):
+        """
+        Retire and insert records of a batch. In partial mode, a batch failing on
+        a constraint is replayed item by item inside savepoints so only the
+        conflicting items are reported as failed.
+        """
+        async def write(items):
+            now = ts_now()
+            retire = [r for retire, _ in items for r in retire]
+            insert = [r for _, insert in items for r in insert]
+            if retire:
+                # new versions take over the instant the old ones are superseded
+                for r in insert:
+                    r.modified = now
+            await self.retire_records(retire, now=now)
+            await self.insert_records(insert)
+
+        if mode == 'atomic':
+            try:
+                await write(list(pending.values()))
+            except saexc.IntegrityError:
+                raise AlreadyExistError(message='Conflicting concurrent write, retry the batch')
+            return
+
+        try:
+            async with self.db.begin_nested():
+                await write(list(pending.values()))
+            return
+        except saexc.IntegrityError:
+            pass
+        for i, item in list(pending.items()):
+            try:
+                async with self.db.begin_nested():
+                    await write([item])
+            except saexc.IntegrityError:
+                results[i].fail(AlreadyExistError(message=f'Already Exists: {results[i].urn}'))
+                del pending[i]
+
+    async def bulk_create(self, items: list[Core], *, mode: BULK_MODES = 'atomic') -> list[BulkItemResult]:
+        results = [BulkItemResult(index=i) for i in range(len(items))]
+        pending: dict[int, S] = {}
+        seen = set()
+        for i, data in enumerate(await self.validate_many(items)):
+            if isinstance(data, OrchestrixError):
+                results[i].fail(data, ['body', 'records', i])
+                continue
+            record = self.new_record(data)
+            results[i].urn = record.urn
+            if record.urn in seen:
+                results[i].fail(AlreadyExistError(message=f'Duplicate in batch: {record.urn}'), ['body', 'records', i])
+                continue
+            seen.add(record.urn)
+            pending[i] = record
+
+        existing = await self.continue_history(list(pending.values()))
+        for i, record in list(pending.items()):
+            if record.urn in existing:
+                results[i].fail(AlreadyExistError(message=f'Already Exists: {record.urn}'), ['body', 'records', i])
+                del pending[i]
+
+        if mode == 'atomic' and (error := bulk_failure(results)):
+            raise error
+
+        batch = {i: ([], [record]) for i, record in pending.items()}
+        await self._write_batch(batch, results, mode)
+        for i in batch:
+            results[i].record = pending[i]
+        return results
+
+    async def bulk_update(self, items: list[tuple[str, Core]], *, mode: BULK_MODES = 'atomic') -> list[BulkItemResult]:
+        results = [BulkItemResult(index=i, urn=urn) for i, (urn, _) in enumerate(items)]
+        current = await self.get_many([urn for urn, _ in items])
+        pending: dict[int, tuple[list[S], list[S]]] = {}
+        seen = set()
+        valid = {}
+        for i, (urn, data) in enumerate(items):
+            loc = ['body', 'records', i]
+            if urn not in current:
+                results[i].fail(NotFoundError(message=urn), loc)
+                continue
+            if urn in seen:
+                results[i].fail(FieldValidationError(message=f'Duplicate in batch: {urn}'), loc)
+                continue
+            seen.add(urn)
+            valid[i] = data
+        for i, data in zip(valid, await self.validate_many(list(valid.values()))):
+            if isinstance(data, OrchestrixError):
+                results[i].fail(data, ['body', 'records', i])
+                continue
+            model = current[items[i][0]]
+            pending[i] = ([model], [self.new_version(model, data)])
+
+        if mode == 'atomic' and (error := bulk_failure(results)):
+            raise error
+
+        await self._write_batch(pending, results, mode)
+        for i, (_, new) in pending.items():
+            results[i].record = new[0]
+        return results
+
+    async def bulk_system_update(self, items: list[tuple[S, Core]], *, 
+                                 mode: BULK_MODES = 'partial') -> list[BulkItemResult]:
+        """
+        Write new versions of loaded active records, for fields the system 
+        sets rather than clients. The data is not validated, and a record 
+        superseded since it was loaded is reported as failed.
+        """
+        results = [BulkItemResult(index=i, urn=model.urn) for i, (model, _) in enumerate(items)]
+        pending = {i: ([model], [self.new_version(model, data)]) for i, (model, data) in enumerate(items)}
+        await self._write_batch(pending, results, mode)
+        for i, (_, new) in pending.items():
+            results[i].record = new[0]
+        return results
+
+    async def bulk_delete(self, urns: list[str], *, mode: BULK_MODES = 'atomic') -> list[BulkItemResult]:
+        results = [BulkItemResult(index=i, urn=urn) for i, urn in enumerate(urns)]
+        current = await self.get_many(urns)
+        pending: dict[int, tuple[list[S], list[S]]] = {}
+        seen = set()
+        for i, urn in enumerate(urns):
+            if urn not in current or urn in seen:
+                results[i].fail(NotFoundError(message=urn), ['body', 'urns', i])
+                continue
+            seen.add(urn)
+            pending[i] = ([current[urn]], [])
+
+        if mode == 'atomic' and (error := bulk_failure(results)):
+            raise error
+
+        await self._write_batch(pending, results, mode)
+        return results
+
+    async def list_active(self, *, cursor: str | None = None, page_size: int | None = None,
+                          as_of: datetime | None = None, fields: list[str] | None = None,
+                          etag: bool = False, if_none_match: str | None = None) -> Page:
+        filter = self.current_filter(as_of)
+        return await self.paginate(self.select(fields).where(filter), 
+                                   cursor=cursor, page_size=page_size, 
+                                   etag=etag, if_none_match=if_none_match)
+    
+    async def list_history(self, *, cursor: str | None = None, page_size: int | None = None,
+                           fields: list[str] | None = None, 
+                           etag: bool = False, if_none_match: str | None = None) -> Page:
+        return await self.paginate(self.select(fields), cursor=cursor, page_size=page_size,
+                                   etag=etag, if_none_match=if_none_match)
     
-    async def search(self, *, offset=0, limit=10, sa_filters=None, only_active=True, **filters):
+    async def search(self, *, cursor: str | None = None, page_size: int | None = None, 
+                     sa_filters=None, only_active=True, as_of: datetime | None = None, 
+                     fields: list[str] | None = None, etag: bool = False, 
+                     if_none_match: str | None = None, **filters) -> Page:
         model_class = self.__class__.model_class()
-        if only_active:
-            filter = (model_class.active == True)
+        if only_active or as_of is not None:
+            filter = self.current_filter(as_of)
         else:
             filter = (sa.literal(1)==1)
-        if sa_filters and filters:
+        if sa_filters is not None and filters:
             raise ValueError("Cannot use both sa_filters and filters")
         for field_name, value in filters.items():
             filter &= (getattr(model_class, field_name) == value)
-        if sa_filters:
+        if sa_filters is not None:
             filter &= sa_filters
-        models = await self.db.exec(select(model_class).where(filter).offset(offset).limit(limit))
-        return models
+        return await self.paginate(self.select(fields).where(filter), 
+                                   cursor=cursor, page_size=page_size,
+                                   etag=etag, if_none_match=if_none_match)
+
+    def select(self, fields: list[str] | None = None):
+        """
+        Select whole records, or only the columns of `fields` and the `uid`
+        key, as rows, without building model instances
+        """
+        model_class = self.__class__.model_class()
+        if not fields:
+            return select(model_class)
+        return select(*[getattr(model_class, f) for f in dict.fromkeys(['uid', *fields])])
 
+    async def paginate(self, query, *, cursor: str | None = None, page_size: int | None = None,
+                       etag: bool = False, if_none_match: str | None = None) -> Page:
+        """
+        Keyset pagination on the time ordered `uid` column. Each page is 
+        a bounded index range scan regardless of how deep it is.
+
+        With `etag` the page is tagged with the `uid` of its records, whether
+        more follow and the latest time one of them changed. Updates and 
+        deletes remove a record from listings of active records or, in 
+        listings of superseded versions, change when one was deleted. The
+        tag is read from the page alone, so it costs the same on any page.
+        When it matches `if_none_match` the page is returned as not modified.
+        """
+        model_class = self.__class__.model_class()
+        key = model_class.uid
+        page_size = min(page_size or self.default_page_size(), self.max_page_size())
+        filter = query.whereclause
+
+        direction = 'next'
+        if cursor:
+            direction, last_key = decode_cursor(cursor)
+            if direction == 'next':
+                query = query.where(key > last_key)
+            else:
+                query = query.where(key < last_key)
+
+        if direction == 'next':
+            query = query.order_by(key.asc())
+        else:
+            query = query.order_by(key.desc())
+
+        result = await self.db.exec(query.limit(page_size + 1))
+        records = list(result.all())
+        has_more = len(records) > page_size
+        records = records[:page_size]
+        if direction == 'prev':
+            records.reverse()
+
+        page = Page(records=records, page_size=page_size)
+        if etag:
+            keys = [r.uid for r in records]
+            changed = None
+            if keys:
+                # rows of selected fields may not have the change times
+                tagged = select(sa.func.max(self.changed_column())).where(key.in_(keys))
+                if filter is not None:
+                    tagged = tagged.where(filter)
+                changed = (await self.db.exec(tagged)).one()
+            page.etag = collection_etag(keys, changed, has_more)
+            if etag_matches(if_none_match, page.etag):
+                return Page(page_size=page_size, etag=page.etag, not_modified=True)
+        if not records:
+            return page
+        if direction == 'next':
+            if has_more:
+                page.next_cursor = encode_cursor(records[-1].uid, 'next')
+            if cursor:
+                page.prev_cursor = encode_cursor(records[0].uid, 'prev')
+        else:
+            if has_more:
+                page.prev_cursor = encode_cursor(records[0].uid, 'prev')
+            page.next_cursor = encode_cursor(records[-1].uid, 'next')
+        return page
+
+    def changed_column(self):
+        # when a version was written, or superseded if it has been
+        model_class = self.__class__.model_class()
+        return sa.func.coalesce(model_class.deleted, model_class.modified)
+
+    async def changes(self, since: str | None = None, *, page_size: int | None = None) -> Page:
+        """
+        Records changed after the `since` cursor, in the order they changed. 
+        Each record is returned in its latest state, deleted records as their
+        last, inactive, version. Without `since` no records are returned and 
+        the cursor points at the latest change. `next_cursor` is always set.
+
+        Changes are ordered by their timestamp, which is taken before the
+        transaction that writes them commits, so a change can commit after
+        a later one was read. The `watch_overlap` seconds before the latest
+        change read are read again and the changes the cursor already holds
+        are skipped. A change that commits later than that after its 
+        timestamp is not returned. The cursor holds at most 
+        `watch_cursor_limit` changes, past them the overlap is cut short.
+        """
+        from ..env import env
+        model_class = self.__class__.model_class()
+        changed = self.changed_column()
+        page_size = min(page_size or self.default_page_size(), self.max_page_size())
+
+        if since is None:
+            result = await self.db.exec(select(changed, model_class.uid)
+                                        .order_by(changed.desc(), model_class.uid.desc()).limit(1))
+            last = result.first()
+            cursor = encode_watch_cursor(WatchWindow((localize(last[0]), last[1]), {})) if last else WATCH_START
+            return Page(page_size=page_size, next_cursor=cursor)
+
+        window = decode_watch_cursor(since)
+        floor_changed, floor_uid = window.floor
+        # versions superseded by an update are reported through their successor
+        successor = aliased(model_class)
+        superseded = sa.exists().where((successor.id == model_class.id) & 
+                                       (successor.version == model_class.version + 1))
+        query = (select(model_class)
+                 .where(changed >= floor_changed)
+                 .where(~((changed == floor_changed) & (model_class.uid <= floor_uid)))
+                 .where(~superseded)
+                 .order_by(changed, model_class.uid)
+                 # the changes already read are among them at most once each
+                 .limit(page_size + len(window.seen)))
+        result = await self.db.exec(query)
+        records = []
+        for obj in result.all():
+            # a record deleted since it was read is changed again under the same uid
+            if window.seen.get(obj.uid) == localize(obj.deleted or obj.modified):
+                continue
+            records.append(obj)
+            window = advance_watch_window(window, obj.uid, obj.deleted or obj.modified, 
+                                          env.watch_overlap, env.watch_cursor_limit)
+            if len(records) == page_size:
+                break
+        page = Page(records=records, page_size=page_size, next_cursor=since)
+        if records:
+            page.next_cursor = encode_watch_cursor(window)
+        return page
+
+    async def watch(self, since: str | None = None, *, timeout: float = 0, 
+                    page_size: int | None = None) -> Page:
+        """
+        Wait up to `timeout` seconds for records to change after `since`. 
+        Commits in this process wake the watcher immediately, writes by 
+        other processes are picked up every `watch_poll_interval` seconds.
+        """
+        from ..env import env
+        entity = self.__class__.model_class().__name__
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            # taken before reading so a commit in between is not missed
+            changed = change_notifier.event(entity)
+            page = await self.changes(since, page_size=page_size)
+            # end the read transaction, no connection is held while waiting
+            await self.db.commit()
+            remaining = deadline - loop.time()
+            if page.records or since is None or remaining <= 0:
+                return page
+            await change_notifier.wait(changed, min(remaining, env.watch_poll_interval))
+
+    async def stream(self, query, *, rows: bool = False) -> AsyncIterator[S]:
+        """
+        Iterate over query results through a server side cursor, fetching
+        `stream_batch_size` rows at a time. Yields rows instead of records 
+        when `rows` is set, for queries of selected columns.
+        """
+        model_class = self.__class__.model_class()
+        query = query.order_by(model_class.uid.asc()).execution_options(yield_per=self.stream_batch_size())
+        if rows:
+            result = await self.db.stream(query)
+        else:
+            result = await self.db.stream_scalars(query)
+        async for obj in result:
+            yield obj
+
+    def stream_active(self, as_of: datetime | None = None, 
+                      fields: list[str] | None = None) -> AsyncIterator[S]:
+        query = self.select(fields).where(self.current_filter(as_of))
+        return self.stream(query, rows=bool(fields))
+
+    def stream_history(self, model_id: UUID | None = None, 
+                       fields: list[str] | None = None) -> AsyncIterator[S]:
+        model_class = self.__class__.model_class()
+        query = self.select(fields)
+        if model_id is not None:
+            query = query.where(model_class.id == model_id)
+        return self.stream(query, rows=bool(fields))
+
+    async def expand(self, records: list[S], names: list[str]) -> list[dict]:
+        """
+        Dump records with the active related records of each expansion in 
+        `names` embedded, loading each relation with one IN query per chunk.
+        To-many relations embed at most `limit` records, the first created,
+        and the number of related records as `{name}_count`.
+        """
+        from ..env import env
+        expansions = self.expansions()
+        dumped = [r.model_dump(mode='json') for r in records]
+        for name in names:
+            expansion = expansions[name]
+            related_class = expansion.service.model_class()
+            remote = getattr(related_class, expansion.remote_field)
+            values = list({getattr(r, expansion.local_field) for r in records})
+            related: dict[Any, list[dict]] = {}
+            counts: dict[Any, int] = {}
+            for chunk in chunked(values):
+                filter = remote.in_(chunk) & (related_class.active == True)
+                if not expansion.many:
+                    result = await self.db.exec(select(related_class).where(filter))
+                    for obj in result.all():
+                        related.setdefault(getattr(obj, expansion.remote_field), []).append(obj.model_dump(mode='json'))
+                    continue
+                # capped per expanded record in the query, counted over the same window
+                ranked = select(related_class,
+                                sa.func.row_number().over(partition_by=remote, order_by=related_class.uid).label('rank'),
+                                sa.func.count().over(partition_by=remote).label('total')
+                                ).where(filter).subquery()
+                obj_class = aliased(related_class, ranked)
+                result = await self.db.exec(select(obj_class, ranked.c.total)
+                                            .where(ranked.c.rank <= (expansion.limit or env.expand_limit))
+                                            .order_by(ranked.c.rank))
+                for obj, total in result.all():
+                    key = getattr(obj, expansion.remote_field)
+                    related.setdefault(key, []).append(obj.model_dump(mode='json'))
+                    counts[key] = total
+            for r, d in zip(records, dumped):
+                key = getattr(r, expansion.local_field)
+                found = related.get(key, [])
+                if expansion.many:
+                    d[name] = found
+                    d[f'{name}_count'] = counts.get(key, 0)
+                else:
+                    d[name] = next(iter(found), None)
+        return dumped
+
+    @classmethod
+    def field_adapters(cls) -> dict[str, TypeAdapter]:
+        # serializers of a column of values of each field, built once per service
+        if '_field_adapters' not in cls.__dict__:
+            cls._field_adapters = {k: TypeAdapter(list[f.annotation]) 
+                                   for k, f in cls.model_class().model_fields.items()}
+        return cls._field_adapters
+
+    @classmethod
+    def record_adapters(cls) -> tuple[TypeAdapter, TypeAdapter]:
+        # serializers of a record and of a list of records, built once per service
+        if '_record_adapters' not in cls.__dict__:
+            model_class = cls.model_class()
+            cls._record_adapters = (TypeAdapter(model_class), TypeAdapter(list[model_class]))
+        return cls._record_adapters
+
+    @classmethod
+    def json_response(cls, *, record: S | None = None, records: list[S] | None = None,
+                      headers: dict[str, str] | None = None, **content: Any) -> fastapi.Response:
+        """
+        Respond with records serialized straight to JSON by the model's
+        serializer. Returning them to the route would validate every record
+        against the response model again before serializing it. Other
+        `content` is serialized as is.
+        """
+        record_adapter, records_adapter = cls.record_adapters()
+        parts = {'detail': b'null', 'status': b'"success"'}
+        if record is not None:
+            parts['record'] = record_adapter.dump_json(record)
+        if records is not None:
+            parts['records'] = records_adapter.dump_json(records)
+        for key, value in content.items():
+            parts[key] = value.model_dump_json().encode() if isinstance(value, BaseModel) else json.dumps(value).encode()
+        body = b'{' + b','.join(b'"%s":%s' % (k.encode(), v) for k, v in parts.items()) + b'}'
+        return fastapi.Response(body, media_type='application/json', headers=headers)
+
+    @classmethod
+    def dump_fields(cls, records: list, fields: list[str], *, columnar: bool = False) -> list[dict] | dict[str, list]:
+        """
+        Serialize `fields` of records or rows to JSON compatible values a 
+        column at a time, without validating them. Columnar output maps each
+        field to the list of its values.
+        """
+        adapters = cls.field_adapters()
+        columns = {f: adapters[f].dump_python([getattr(r, f) for r in records], mode='json') 
+                   for f in fields}
+        if columnar:
+            return columns
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    @classmethod
+    def parse_fields(cls, fields: list[str] | None) -> list[str]:
+        names = [n.strip() for f in fields or [] for n in f.split(',') if n.strip()]
+        model_fields = cls.model_class().model_fields
+        for name in names:
+            if name not in model_fields:
+                raise FieldValidationError(field_location=['query', 'fields'], message=f'Unknown field {name}')
+        return list(dict.fromkeys(names))
+
+    @classmethod
+    def parse_expand(cls, expand: list[str] | None) -> list[str]:
+        names = [n.strip() for e in expand or [] for n in e.split(',') if n.strip()]
+        expansions = cls.expansions()
+        for name in names:
+            if name not in expansions:
+                raise FieldValidationError(field_location=['query', 'expand'], 
+                                           message=f'Unknown expansion {name}, expected one of: {", ".join(expansions)}')
+        return list(dict.fromkeys(names))
 
-    
     async def validate_data(self, data: Core) -> Core:
         # raise error if fail
         return data
 
+    async def validate_many(self, items: list[Core]) -> list[Core | OrchestrixError]:
+        """
+        Validate the data of a batch, giving the validated data or the error
+        of each item. Services whose validation reads the database override
+        it with one query for the whole batch.
+        """
+        results = []
+        for data in items:
+            try:
+                results.append(await self.validate_data(data))
+            except OrchestrixError as e:
+                results.append(e)
+        return results
+
     @classmethod
     async def get_model(cls, request: fastapi.Request, db: DbSession, urn: str) -> S:
         svc = await cls.get_service(request, db)
@@ -255,12 +1151,78 @@ class Service(Generic[S], abc.ABC):
         return cls(request, db)
 
 
+    @classmethod
+    def stream_response(cls, request: fastapi.Request, 
+                        iterate: Callable[['Service'], AsyncIterator[S]],
+                        fields: list[str] | None = None) -> StreamingResponse:
+        """
+        Stream records as newline delimited JSON. The body is produced after
+        the request scoped session is closed, so it uses a session of its own.
+        Rows of selected `fields` are serialized a batch at a time.
+        """
+        def dump(batch):
+            return ''.join(json.dumps(r) + '\n' for r in cls.dump_fields(batch, fields))
+
+        async def body():
+            async with db_read_session(request) as db:
+                svc = cls(request, db)
+                batch = []
+                async for obj in iterate(svc):
+                    if not fields:
+                        yield obj.model_dump_json() + '\n'
+                        continue
+                    batch.append(obj)
+                    if len(batch) >= cls.stream_batch_size():
+                        yield dump(batch)
+                        batch = []
+                if batch:
+                    yield dump(batch)
+        return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
+
+    @classmethod
+    def watch_response(cls, request: fastapi.Request, since: str | None, 
+                       page_size: int | None = None) -> StreamingResponse:
+        """
+        Server sent events of changed records. The id of each event is the 
+        cursor after it, so a reconnecting client resumes with Last-Event-ID.
+        A session is opened for each poll rather than held by the stream.
+        """
+        from ..env import env
+        entity_type = cls.urn_entity_type()
+
+        async def body():
+            cursor = since
+            while not await request.is_disconnected():
+                async with db_read_session(request) as db:
+                    page = await cls(request, db).watch(cursor, timeout=env.watch_keepalive, 
+                                                        page_size=page_size)
+                if cursor is None or not page.records:
+                    yield ': keepalive\n\n' if cursor else f'id: {page.next_cursor}\n\n'
+                window = decode_watch_cursor(cursor) if page.records else None
+                for obj in page.records:
+                    window = advance_watch_window(window, obj.uid, obj.deleted or obj.modified, 
+                                                  env.watch_overlap, env.watch_cursor_limit)
+                    yield (f'id: {encode_watch_cursor(window)}\nevent: {entity_type}\n'
+                           f'data: {obj.model_dump_json()}\n\n')
+                cursor = page.next_cursor
+        return StreamingResponse(body(), media_type=EVENT_STREAM_MEDIA_TYPE,
+                                 headers={'Cache-Control': 'no-cache'})
+
+    @classmethod
+    def register(cls) -> type['Service']:
+        """
+        Add the service to the registry without building its routes
+        """
+        service_registry[cls.urn_entity_type()] = cls
+        return cls
+
     @classmethod
     def router(cls) -> fastapi.APIRouter:
         if not getattr(cls, '_router', None):
             router = fastapi.APIRouter()
             cls.register_views(router, cls.service_path(), cls.model_path())
             cls._router = router
+            cls.register()
         return cls._router
 
     @classmethod
@@ -276,49 +1238,250 @@ class Service(Generic[S], abc.ABC):
         CreateModel = cls.createmodel_class()
         UpdateModel = cls.updatemodel_class()
 
+        PageSize = Annotated[int | None, Query(ge=1, le=cls.max_page_size())]
+        # expansions are resolved per request, services may import each other lazily
+        Expand = Annotated[list[str] | None, Query(description='Related records to embed, comma separated')]
+
+        Fields = Annotated[list[str] | None, Query(description='Only return these fields, comma separated')]
+        LAYOUTS = Literal['records', 'columnar']
+
+        def check_shape(fields: list[str], layout: LAYOUTS, expand: list[str] = ()):
+            if expand and (fields or layout == 'columnar'):
+                raise FieldValidationError(field_location=['query', 'expand'], 
+                                           message='expand can not be combined with fields or a columnar layout')
+
+        async def list_response(svc: 'Service', response: fastapi.Response, page: Page, 
+                                expand: list[str] = (), fields: list[str] = (), layout: LAYOUTS = 'records'):
+            if page.not_modified:
+                return not_modified_response(page.etag)
+            headers = {'ETag': page.etag} if page.etag else None
+            if fields or layout == 'columnar':
+                # rows of selected columns are serialized without validation, respond directly
+                fields = fields or list(model_class.model_fields)
+                body = {"detail": None, "status": "success"}
+                if layout == 'columnar':
+                    body["columns"] = cls.dump_fields(page.records, fields, columnar=True)
+                else:
+                    body["records"] = cls.dump_fields(page.records, fields)
+                body["meta"] = page.meta(svc.request).model_dump(mode='json')
+                return fastapi.responses.JSONResponse(body, headers=headers)
+            if not expand:
+                if cls.fast_serialization():
+                    return cls.json_response(records=page.records, meta=page.meta(svc.request), 
+                                             headers=headers)
+                response.headers.update(headers or {})
+                return {
+                    "records": page.records,
+                    "meta": page.meta(svc.request)
+                }
+            # embedded records are not part of the response model, respond directly
+            return fastapi.responses.JSONResponse({
+                "detail": None,
+                "status": "success",
+                "records": await svc.expand(page.records, expand),
+                "meta": page.meta(svc.request).model_dump(mode='json')
+            })
+
         @router.get(service_path, operation_id=f"orchestrix-list-{entity_type}")
-        async def list_active(svc: Annotated[cls, Depends(cls.get_service)]) -> ListResult[model_class]: # type: ignore
-            return {
-                "records": await svc.list_active()
-            }
+        async def list_active(svc: Annotated[cls, Depends(cls.get_service)], # type: ignore
+                              response: fastapi.Response,
+                              cursor: str | None = None,
+                              page_size: PageSize = None,
+                              as_of: datetime | None = None,
+                              expand: Expand = None,
+                              fields: Fields = None,
+                              layout: LAYOUTS = 'records',
+                              stream: bool = False,
+                              if_none_match: Annotated[str | None, Header()] = None) -> ListResult[model_class]: # type: ignore
+            expand, fields = cls.parse_expand(expand), cls.parse_fields(fields)
+            check_shape(fields, layout, expand)
+            if wants_stream(svc.request, stream):
+                return cls.stream_response(svc.request, lambda s: s.stream_active(as_of, fields), fields)
+            # embedded records change independently, expanded pages are not tagged
+            page = await svc.list_active(cursor=cursor, page_size=page_size, as_of=as_of, fields=fields,
+                                         etag=not expand, if_none_match=if_none_match)
+            return await list_response(svc, response, page, expand, fields, layout)
         
         @router.get(f'{service_path}/+history', operation_id=f"orchestrix-history-{entity_type}")
-        async def list_history(svc: Annotated[cls, Depends(cls.get_service)]) -> ListResult[model_class]: # type: ignore
+        async def list_history(svc: Annotated[cls, Depends(cls.get_service)], # type: ignore
+                               response: fastapi.Response,
+                               cursor: str | None = None,
+                               page_size: PageSize = None,
+                               fields: Fields = None,
+                               layout: LAYOUTS = 'records',
+                               stream: bool = False,
+                               if_none_match: Annotated[str | None, Header()] = None) -> ListResult[model_class]: # type: ignore
+            fields = cls.parse_fields(fields)
+            if wants_stream(svc.request, stream):
+                return cls.stream_response(svc.request, lambda s: s.stream_history(None, fields), fields)
+            page = await svc.list_history(cursor=cursor, page_size=page_size, fields=fields,
+                                          etag=True, if_none_match=if_none_match)
+            return await list_response(svc, response, page, fields=fields, layout=layout)
+
+        @router.get(f'{service_path}/+watch', operation_id=f"orchestrix-watch-{entity_type}")
+        async def watch(svc: Annotated[cls, Depends(cls.get_service)], # type: ignore
+                        since: str | None = None,
+                        timeout: Annotated[float, Query(ge=0, le=300)] = 30,
+                        page_size: PageSize = None,
+                        last_event_id: Annotated[str | None, Header()] = None) -> WatchResult[model_class]: # type: ignore
+            since = since or last_event_id
+            if wants_events(svc.request):
+                return cls.watch_response(svc.request, since, page_size)
+            page = await svc.watch(since, timeout=timeout, page_size=page_size)
+            if cls.fast_serialization():
+                return cls.json_response(records=page.records, cursor=page.next_cursor)
             return {
-                "records": await svc.list_history()
+                "records": page.records,
+                "cursor": page.next_cursor
             }
+
+        search_fields = {k: TypeAdapter(f.annotation) for k, f in model_class.model_fields.items() 
+                         if k not in ('cursor', 'page_size', 'only_active', 'as_of', 'expand', 'fields', 'layout')}
+
+        @router.get(f'{service_path}/+search', operation_id=f"orchestrix-search-{entity_type}")
+        async def search(svc: Annotated[cls, Depends(cls.get_service)], # type: ignore
+                         response: fastapi.Response,
+                         cursor: str | None = None,
+                         page_size: PageSize = None,
+                         only_active: bool = True,
+                         as_of: datetime | None = None,
+                         expand: Expand = None,
+                         fields: Fields = None,
+                         layout: LAYOUTS = 'records',
+                         if_none_match: Annotated[str | None, Header()] = None) -> ListResult[model_class]: # type: ignore
+            expand, fields = cls.parse_expand(expand), cls.parse_fields(fields)
+            check_shape(fields, layout, expand)
+            # any other query parameter matching a model field is an equality filter
+            filters = {}
+            for k, v in svc.request.query_params.items():
+                if k not in search_fields:
+                    continue
+                try:
+                    filters[k] = search_fields[k].validate_strings(v)
+                except ValidationError:
+                    raise FieldValidationError(field_location=['query', k], message=f'Invalid value for {k}')
+            page = await svc.search(cursor=cursor, page_size=page_size, only_active=only_active, 
+                                    as_of=as_of, fields=fields, etag=not expand, 
+                                    if_none_match=if_none_match, **filters)
+            return await list_response(svc, response, page, expand, fields, layout)
         
         @router.post(service_path, operation_id=f"orchestrix-create-{entity_type}")
         async def create(svc: Annotated[cls, Depends(cls.get_service)], data: CreateModel) -> Result[model_class]: # type: ignore
             created_model = await svc.create(data)
+            if cls.fast_serialization():
+                return cls.json_response(record=created_model)
             return {"record": created_model}
         
+        BulkCreateModel = create_model(f'Bulk Create {model_class.__name__}',
+                                       records=(list[CreateModel], Field(max_length=cls.max_bulk_size())))
+
+        @router.post(f'{service_path}/+bulk', operation_id=f"orchestrix-bulk-create-{entity_type}")
+        async def bulk_create(svc: Annotated[cls, Depends(cls.get_service)], # type: ignore
+                              data: BulkCreateModel, # type: ignore
+                              mode: BULK_MODES = 'atomic') -> BulkResult[model_class]: # type: ignore
+            results = await svc.bulk_create(data.records, mode=mode)
+            return {
+                "status": "error" if any(r.status == "error" for r in results) else "success",
+                "results": results
+            }
+
+        if UpdateModel.model_fields:
+            BulkUpdateItem = create_model(f'Bulk Update Item {model_class.__name__}',
+                                          urn=(str, ...), data=(UpdateModel, ...))
+            BulkUpdateModel = create_model(f'Bulk Update {model_class.__name__}',
+                                           records=(list[BulkUpdateItem], Field(max_length=cls.max_bulk_size())))
+
+            @router.put(f'{service_path}/+bulk', operation_id=f"orchestrix-bulk-update-{entity_type}")
+            async def bulk_update(svc: Annotated[cls, Depends(cls.get_service)], # type: ignore
+                                  data: BulkUpdateModel, # type: ignore
+                                  mode: BULK_MODES = 'atomic') -> BulkResult[model_class]: # type: ignore
+                results = await svc.bulk_update([(r.urn, r.data) for r in data.records], mode=mode)
+                return {
+                    "status": "error" if any(r.status == "error" for r in results) else "success",
+                    "results": results
+                }
+
+        BulkDeleteModel = create_model(f'Bulk Delete {model_class.__name__}',
+                                       urns=(list[str], Field(max_length=cls.max_bulk_size())))
+
+        @router.delete(f'{service_path}/+bulk', operation_id=f"orchestrix-bulk-delete-{entity_type}")
+        async def bulk_delete(svc: Annotated[cls, Depends(cls.get_service)], # type: ignore
+                              data: BulkDeleteModel, # type: ignore
+                              mode: BULK_MODES = 'atomic') -> BulkResult[model_class]: # type: ignore
+            results = await svc.bulk_delete(data.urns, mode=mode)
+            return {
+                "status": "error" if any(r.status == "error" for r in results) else "success",
+                "results": results
+            }
+        
         @router.get(model_path, operation_id=f"orchestrix-get-{entity_type}")
-        async def get(model: Annotated[model_class, Depends(cls.get_model)]) -> Result[model_class]: # type: ignore
+        async def get(svc: Annotated[cls, Depends(cls.get_service)], # type: ignore
+                      response: fastapi.Response,
+                      urn: str,
+                      as_of: datetime | None = None,
+                      expand: Expand = None,
+                      if_none_match: Annotated[str | None, Header()] = None) -> Result[model_class]: # type: ignore
+            expand = cls.parse_expand(expand)
+            if if_none_match is not None and not expand:
+                # answered from the version alone, before fetching the record
+                etag = await svc.get_etag(urn, as_of=as_of)
+                if etag_matches(if_none_match, etag):
+                    return not_modified_response(etag)
+            model = await svc.get(urn, as_of=as_of)
+            if expand:
+                [record] = await svc.expand([model], expand)
+                return fastapi.responses.JSONResponse({
+                    "detail": None,
+                    "status": "success",
+                    "record": record
+                })
+            etag = record_etag(model)
+            if cls.fast_serialization():
+                return cls.json_response(record=model, headers={'ETag': etag})
+            response.headers['ETag'] = etag
             return {
                 "record": model
             }
         
         @router.get(f'{model_path}/+history', operation_id=f'orchestrix-get-history-{entity_type}')
-        async def get_history(svc: Annotated[cls, Depends(cls.get_service)], model: Annotated[model_class, Depends(cls.get_model)]) -> ListResult[model_class]: # type: ignore
-            return {
-                "records": await svc.get_history(model.id)
-            }
+        async def get_history(svc: Annotated[cls, Depends(cls.get_service)], # type: ignore
+                              response: fastapi.Response,
+                              model: Annotated[model_class, Depends(cls.get_model)], # type: ignore
+                              cursor: str | None = None,
+                              page_size: PageSize = None,
+                              fields: Fields = None,
+                              layout: LAYOUTS = 'records',
+                              stream: bool = False,
+                              if_none_match: Annotated[str | None, Header()] = None) -> ListResult[model_class]: # type: ignore
+            fields = cls.parse_fields(fields)
+            if wants_stream(svc.request, stream):
+                model_id = model.id
+                return cls.stream_response(svc.request, lambda s: s.stream_history(model_id, fields), fields)
+            page = await svc.get_history(model.id, cursor=cursor, page_size=page_size, fields=fields,
+                                         etag=True, if_none_match=if_none_match)
+            return await list_response(svc, response, page, fields=fields, layout=layout)
 
         if UpdateModel.model_fields: 
             @router.put(model_path, operation_id=f'orchestrix-update-{entity_type}')
-            async def update(svc: Annotated[cls, Depends(cls.get_service)], 
-                         model: Annotated[model_class, Depends(cls.get_model)], # type: ignore
-                         data: UpdateModel) -> Result[model_class]: # type: ignore
-                updated_model = await svc.update(model.id, data)
+            async def update(svc: Annotated[cls, Depends(cls.get_service)], # type: ignore
+                             response: fastapi.Response,
+                             urn: str,
+                             data: UpdateModel, # type: ignore
+                             if_match: Annotated[str | None, Header()] = None) -> Result[model_class]: # type: ignore
+                updated_model = await svc.update(urn, data, expected_version=parse_if_match(if_match))
+                if cls.fast_serialization():
+                    return cls.json_response(record=updated_model, 
+                                             headers={'ETag': record_etag(updated_model)})
+                response.headers['ETag'] = record_etag(updated_model)
                 return {
                     "record": updated_model
                 }
         
         @router.delete(model_path, operation_id=f'orchestrix-delete-{entity_type}')
-        async def delete(svc: Annotated[cls, Depends(cls.get_service)], 
-                         model: Annotated[model_class, Depends(cls.get_model)]) -> BaseResult: # type: ignore
-            await svc.delete(model.id)
+        async def delete(svc: Annotated[cls, Depends(cls.get_service)], # type: ignore
+                         urn: str,
+                         if_match: Annotated[str | None, Header()] = None) -> BaseResult: 
+            await svc.delete(urn, expected_version=parse_if_match(if_match))
             return {
                 "status": "success"
             }
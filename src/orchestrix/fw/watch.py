@@ -0,0 +1,69 @@
+from sqlmodel import Session
+import asyncio
+import sqlalchemy as sa
+from ..sqlite import on_commit
+
+__all__ = ['ChangeNotifier', 'change_notifier', 'mark_changed']
+
+# session.info key
+PENDING_KEY = 'orchestrix.watch.pending'
+
+class ChangeNotifier:
+    """
+    In-process wake up of watchers. Watchers take the event of an entity
+    type before reading changes and wait on it, the event is set once a
+    transaction that wrote to that entity type commits.
+    """
+
+    def __init__(self):
+        self._events: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+
+    def event(self, entity: str) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        entry = self._events.get(entity)
+        if entry is None or entry[0] is not loop:
+            entry = self._events[entity] = (loop, asyncio.Event())
+        return entry[1]
+
+    def notify(self, entity: str):
+        entry = self._events.pop(entity, None)
+        if entry is None:
+            return
+        loop, event = entry
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is running:
+            event.set()
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(event.set)
+
+    @staticmethod
+    async def wait(event: asyncio.Event, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except TimeoutError:
+            return False
+
+change_notifier = ChangeNotifier()
+
+def mark_changed(session: Session, entity: str):
+    """
+    Record a write of `entity`, watchers are notified once the transaction commits
+    """
+    session.info.setdefault(PENDING_KEY, set()).add(entity)
+
+@sa.event.listens_for(Session, 'after_commit')
+def _notify_on_commit(session: Session):
+    entities = session.info.pop(PENDING_KEY, ())
+
+    def notify():
+        for entity in entities:
+            change_notifier.notify(entity)
+    on_commit(session, notify)
+
+@sa.event.listens_for(Session, 'after_rollback')
+def _reset_on_rollback(session: Session):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,250 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy.ext.asyncio import AsyncEngine
+import logging
+import sqlalchemy as sa
+import time
+from .env import env
+
+__all__ = ['Histogram', 'QueryStats', 'Metrics', 'metrics', 'instrument_engine',
+           'MetricsMiddleware', 'render_metrics', 'PROMETHEUS_MEDIA_TYPE']
+
+slow_query_logger = logging.getLogger('orchestrix.db.slow')
+
+PROMETHEUS_MEDIA_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+# label of requests that matched no route
+UNMATCHED = 'unmatched'
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        # the last count is of values above every bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        total = 0
+        result = []
+        for bound, count in zip([*self.buckets, '+Inf'], self.counts):
+            total += count
+            result.append((str(bound), total))
+        return result
+
+class QueryStats:
+    """
+    Queries run while handling a request, collected by the engine events
+    through a context variable
+    """
+    __slots__ = ('count', 'duration', 'scope')
+
+    def __init__(self, scope: dict | None = None):
+        self.count = 0
+        self.duration = 0.0
+        self.scope = scope
+
+    def operation_id(self) -> str:
+        route = (self.scope or {}).get('route')
+        return getattr(route, 'operation_id', None) or getattr(route, 'path', None) or UNMATCHED
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar('orchestrix_query_stats', default=None)
+
+class Metrics:
+    """
+    Process wide request and query metrics
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.requests: dict[tuple[str, str, int], Histogram] = {}
+        self.request_queries: dict[str, Histogram] = {}
+        self.request_db_time: dict[str, Histogram] = {}
+        self.queries = 0
+        self.query_time = 0.0
+        self.query_errors = 0
+        self.slow_queries = 0
+
+    def observe_request(self, operation_id: str, method: str, status: int,
+                        duration: float, stats: QueryStats):
+        key = (operation_id, method, status)
+        if key not in self.requests:
+            self.requests[key] = Histogram(LATENCY_BUCKETS)
+        self.requests[key].observe(duration)
+        if operation_id not in self.request_queries:
+            self.request_queries[operation_id] = Histogram(QUERY_COUNT_BUCKETS)
+            self.request_db_time[operation_id] = Histogram(LATENCY_BUCKETS)
+        self.request_queries[operation_id].observe(stats.count)
+        self.request_db_time[operation_id].observe(stats.duration)
+
+    def observe_query(self, statement: str, duration: float):
+        self.queries += 1
+        self.query_time += duration
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += duration
+        threshold = env.slow_query_threshold
+        if threshold > 0 and duration >= threshold:
+            self.slow_queries += 1
+            slow_query_logger.warning('Slow query (%.3fs) in %s: %s', duration,
+                                      stats.operation_id() if stats else 'background',
+                                      ' '.join(statement.split())[:1000])
+
+metrics = Metrics()
+
+def instrument_engine(engine: AsyncEngine):
+    """
+    Time every statement run on the engine
+    """
+    @sa.event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('orchestrix.query_start', []).append(time.perf_counter())
+
+    @sa.event.listens_for(engine.sync_engine, 'after_cursor_execute')
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info['orchestrix.query_start'].pop()
+        metrics.observe_query(statement, time.perf_counter() - start)
+
+    @sa.event.listens_for(engine.sync_engine, 'handle_error')
+    def _on_error(context):
+        starts = context.connection.info.get('orchestrix.query_start') if context.connection else None
+        if starts:
+            starts.pop()
+        metrics.query_errors += 1
+
+class MetricsMiddleware:
+    """
+    Measures the latency and queries of every HTTP request. With
+    `debug_query_header` set the DB time and query count of a request
+    are returned in its Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        stats = QueryStats(scope)
+        token = _query_stats.set(stats)
+        start = time.perf_counter()
+        status = 500
+        debug = env.debug_query_header
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if debug:
+                    timing = f'db;dur={stats.duration * 1000:.3f};desc="{stats.count} queries"'
+                    message = {**message, 'headers': [*message.get('headers', []),
+                                                      (b'server-timing', timing.encode('ascii'))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _query_stats.reset(token)
+            metrics.observe_request(stats.operation_id(), scope['method'], status,
+                                    time.perf_counter() - start, stats)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + '}'
+
+def _family(lines: list[str], name: str, kind: str, help: str):
+    lines.append(f'# HELP {name} {help}')
+    lines.append(f'# TYPE {name} {kind}')
+
+def _histogram(lines: list[str], name: str, histogram: Histogram, **labels):
+    for bound, count in histogram.cumulative():
+        lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {count}')
+    lines.append(f'{name}_sum{_labels(**labels)} {histogram.sum}')
+    lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+
+def render_metrics() -> str:
+    """
+    Request, query, pool and cache metrics in the Prometheus text format
+    """
+    from .db import db_replicas, pool_stats
+    from .fw.cache import cache_stats
+    lines = []
+
+    _family(lines, 'orchestrix_request_duration_seconds', 'histogram', 'HTTP request latency')
+    for (operation_id, method, status), histogram in sorted(metrics.requests.items()):
+        _histogram(lines, 'orchestrix_request_duration_seconds', histogram,
+                   operation_id=operation_id, method=method, status=status)
+    _family(lines, 'orchestrix_request_db_queries', 'histogram', 'DB queries per HTTP request')
+    for operation_id, histogram in sorted(metrics.request_queries.items()):
+        _histogram(lines, 'orchestrix_request_db_queries', histogram, operation_id=operation_id)
+    _family(lines, 'orchestrix_request_db_duration_seconds', 'histogram', 'DB time per HTTP request')
+    for operation_id, histogram in sorted(metrics.request_db_time.items()):
+        _histogram(lines, 'orchestrix_request_db_duration_seconds', histogram, operation_id=operation_id)
+
+    counters = [
+        ('orchestrix_db_queries_total', 'counter', 'DB queries run', metrics.queries),
+        ('orchestrix_db_query_duration_seconds_total', 'counter', 'Time spent in DB queries', metrics.query_time),
+        ('orchestrix_db_query_errors_total', 'counter', 'DB queries that failed', metrics.query_errors),
+        ('orchestrix_db_slow_queries_total', 'counter',
+         'DB queries slower than the slow query threshold', metrics.slow_queries),
+    ]
+    pool = pool_stats()
+    counters += [
+        ('orchestrix_db_pool_size', 'gauge', 'Connections kept by the pool', pool.size),
+        ('orchestrix_db_pool_checked_out', 'gauge', 'Connections in use', pool.checked_out),
+        ('orchestrix_db_pool_overflow', 'gauge', 'Connections open beyond the pool size', pool.overflow),
+        ('orchestrix_db_pool_connects_total', 'counter', 'Connections opened', pool.connects),
+        ('orchestrix_db_pool_checkouts_total', 'counter', 'Connections checked out', pool.checkouts),
+        ('orchestrix_db_pool_wait_seconds_total', 'counter',
+         'Time spent waiting for a connection', pool.wait_time_total),
+        ('orchestrix_db_write_sessions_total', 'counter', 'Sessions run by the SQLite write queue',
+         pool.write_sessions),
+        ('orchestrix_db_write_commits_total', 'counter', 'Group commits of the SQLite write queue',
+         pool.write_commits),
+        ('orchestrix_db_write_failed_commits_total', 'counter', 'Group commits that failed',
+         pool.write_failed_commits),
+        ('orchestrix_db_write_wait_seconds_total', 'counter',
+         'Time spent waiting for the SQLite write queue', pool.write_wait_time_total),
+    ]
+    cache = cache_stats()
+    lookups = cache.hits + cache.misses
+    counters += [
+        ('orchestrix_cache_hits_total', 'counter', 'Entity cache hits', cache.hits),
+        ('orchestrix_cache_misses_total', 'counter', 'Entity cache misses', cache.misses),
+        ('orchestrix_cache_evictions_total', 'counter', 'Entity cache evictions', cache.evictions),
+        ('orchestrix_cache_invalidations_total', 'counter', 'Entity cache invalidations', cache.invalidations),
+        ('orchestrix_cache_size', 'gauge', 'Entries in the entity cache', cache.size),
+        ('orchestrix_cache_hit_ratio', 'gauge', 'Entity cache hits per lookup',
+         cache.hits / lookups if lookups else 0.0),
+    ]
+    for name, kind, help, value in counters:
+        _family(lines, name, kind, help)
+        lines.append(f'{name} {value}')
+
+    replicas = db_replicas()
+    if replicas is not None:
+        stats = replicas.stats()
+        _family(lines, 'orchestrix_db_replica_healthy', 'gauge', 'Whether the replica passed its last health check')
+        for r in stats:
+            lines.append(f'orchestrix_db_replica_healthy{_labels(replica=r.url)} {int(r.healthy)}')
+        _family(lines, 'orchestrix_db_replica_sessions_total', 'counter', 'Read sessions opened on the replica')
+        for r in stats:
+            lines.append(f'orchestrix_db_replica_sessions_total{_labels(replica=r.url)} {r.sessions}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,130 @@
+from pydantic import BaseModel
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+import asyncio
+import itertools
+import logging
+import math
+import time
+
+__all__ = ['SAFE_METHODS', 'PRIMARY_COOKIE', 'ReplicaStats', 'Replica', 'ReplicaSet',
+           'replica_health_loop', 'reads_from_primary', 'ReadYourWritesMiddleware']
+
+logger = logging.getLogger(__name__)
+
+# methods of requests that only read
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+# cookie holding the time until which the reads of a client that wrote go
+# to the primary, replicas may not have its writes yet
+PRIMARY_COOKIE = 'orchestrix_primary_until'
+
+class ReplicaStats(BaseModel):
+    url: str
+    healthy: bool
+    sessions: int = 0
+    failed_checks: int = 0
+    last_error: str | None = None
+
+class Replica:
+
+    def __init__(self, url: str, engine: AsyncEngine):
+        self.url = make_url(url).render_as_string(hide_password=True)
+        self.engine = engine
+        self.sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        # replicas are used until a check fails
+        self.healthy = True
+        self.sessions = 0
+        self.failed_checks = 0
+        self.last_error: str | None = None
+
+    async def check(self, timeout: float):
+        try:
+            async with asyncio.timeout(timeout):
+                async with self.engine.connect() as conn:
+                    await conn.exec_driver_sql('SELECT 1')
+        except Exception as e:
+            if self.healthy:
+                logger.warning('Replica %s failed its health check, reading from the others: %s', self.url, e)
+            self.healthy = False
+            self.failed_checks += 1
+            self.last_error = str(e) or type(e).__name__
+            return
+        if not self.healthy:
+            logger.info('Replica %s is healthy again', self.url)
+        self.healthy = True
+
+    def stats(self) -> ReplicaStats:
+        return ReplicaStats(url=self.url, healthy=self.healthy, sessions=self.sessions,
+                            failed_checks=self.failed_checks, last_error=self.last_error)
+
+class ReplicaSet:
+    """
+    Read-only copies of the primary database. Sessions are handed out
+    round robin over the replicas that passed their last health check.
+    """
+
+    def __init__(self, replicas: list[Replica]):
+        self.replicas = replicas
+        self._next = itertools.count()
+
+    def session(self) -> AsyncSession | None:
+        """
+        Session of the next healthy replica, None when none is healthy
+        """
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        replica = healthy[next(self._next) % len(healthy)]
+        replica.sessions += 1
+        return replica.sessionmaker()
+
+    async def check(self, timeout: float):
+        await asyncio.gather(*[r.check(timeout) for r in self.replicas])
+
+    async def dispose(self):
+        for r in self.replicas:
+            await r.engine.dispose()
+
+    def stats(self) -> list[ReplicaStats]:
+        return [r.stats() for r in self.replicas]
+
+async def replica_health_loop(replicas: ReplicaSet, interval: float, timeout: float):
+    while True:
+        await asyncio.sleep(interval)
+        await replicas.check(timeout)
+
+def reads_from_primary(request) -> bool:
+    """
+    Whether the client wrote within the read-your-writes window
+    """
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE)) > time.time()
+    except (TypeError, ValueError):
+        return False
+
+class ReadYourWritesMiddleware:
+    """
+    Marks clients whose request wrote with a cookie sending their reads
+    to the primary for `window` seconds. The cookie holds the deadline, so
+    it works across workers.
+    """
+
+    def __init__(self, app, window: float):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] in SAFE_METHODS:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start' and message['status'] < 400:
+                cookie = (f'{PRIMARY_COOKIE}={time.time() + self.window:.3f}; '
+                          f'Max-Age={math.ceil(self.window)}; Path=/; HttpOnly; SameSite=Lax')
+                message = {**message, 'headers': [*message.get('headers', []),
+                                                  (b'set-cookie', cookie.encode('latin-1'))]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
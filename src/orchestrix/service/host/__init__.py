@@ -1,3 +1,9 @@
 from .model import *
 
-router = HostService.router()
\ No newline at end of file
+from .heartbeat import heartbeat_buffer
+
+def __getattr__(name):
+    # routes are built on first use, see orchestrix.fw.routing
+    if name == 'router':
+        return HostService.router()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
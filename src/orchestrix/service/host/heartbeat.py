@@ -0,0 +1,137 @@
+from datetime import datetime
+from pydantic import BaseModel
+from sqlalchemy.dialects import postgresql, sqlite
+import asyncio
+import logging
+import sqlalchemy as sa
+import time
+from orchestrix.db import db_write_session
+from orchestrix.fw.exc import FieldValidationError
+from orchestrix.fw.model import ts_now, resolve_identifier
+from orchestrix.fw.service import BaseResult, chunked
+from .model import HostService, HostStateEnum, HostStateUpdate, HostHeartbeat
+from .offline import offline_detector
+
+__all__ = ['Heartbeat', 'HeartbeatStats', 'HeartbeatBuffer', 'heartbeat_buffer', 'heartbeat_flush_loop']
+
+logger = logging.getLogger(__name__)
+
+class Heartbeat(BaseModel):
+    state: HostStateEnum = HostStateEnum.ONLINE
+
+class HeartbeatStats(BaseModel):
+    received: int = 0
+    pending: int = 0
+    flushes: int = 0
+    flushed: int = 0
+    state_changes: int = 0
+    conflicts: int = 0
+    unknown: int = 0
+    last_flush_duration: float = 0.0
+
+class HeartbeatBuffer:
+    """
+    Heartbeats are kept in memory, coalesced to the latest report of each
+    host, and written in batches by `flush`. A new host version is only
+    written when the reported state differs from the current one, the time
+    a host was last seen goes to the unversioned `host_heartbeats` table.
+    """
+
+    def __init__(self):
+        self._pending: dict[str, tuple[HostStateEnum, datetime]] = {}
+        self._lock = asyncio.Lock()
+        self._stats = HeartbeatStats()
+        # latest report of each host seen by this process
+        self.last_seen: dict[str, datetime] = {}
+
+    def report(self, urn: str, state: HostStateEnum, seen: datetime | None = None):
+        seen = seen or ts_now()
+        self._pending[urn] = (state, seen)
+        self.last_seen[urn] = seen
+        offline_detector.touch(urn, seen)
+        self._stats.received += 1
+
+    def stats(self) -> HeartbeatStats:
+        return self._stats.model_copy(update={'pending': len(self._pending)})
+
+    async def flush(self) -> int:
+        """
+        Write the buffered heartbeats, returning the number of hosts written
+        """
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            start = time.perf_counter()
+            try:
+                written = await self._write(pending)
+            except BaseException:
+                # keep the reports for the next flush unless newer ones arrived
+                for urn, report in pending.items():
+                    self._pending.setdefault(urn, report)
+                raise
+            self._stats.flushes += 1
+            self._stats.flushed += written
+            self._stats.last_flush_duration = time.perf_counter() - start
+            return written
+
+    async def _write(self, pending: dict[str, tuple[HostStateEnum, datetime]]) -> int:
+        async with db_write_session() as db:
+            svc = HostService(None, db)
+            current = await svc.get_many(list(pending))
+
+            unknown = [urn for urn in pending if urn not in current]
+            for urn in unknown:
+                del pending[urn]
+                self.last_seen.pop(urn, None)
+            self._stats.unknown += len(unknown)
+
+            # state changes skip validate_data, the tenant of an existing host is not checked again
+            changes = [(current[urn], HostStateUpdate(state=state)) 
+                       for urn, (state, _) in pending.items() if current[urn].state != state]
+            if changes:
+                results = await svc.bulk_system_update(changes)
+                conflicts = sum(1 for r in results if r.status == 'error')
+                self._stats.state_changes += len(changes) - conflicts
+                self._stats.conflicts += conflicts
+
+            await self._upsert_last_seen(db, [{'urn': urn, 'state': state, 'last_seen': seen}
+                                              for urn, (state, seen) in pending.items()])
+            await db.commit()
+        return len(pending)
+
+    async def _upsert_last_seen(self, db, rows: list[dict]):
+        if not rows:
+            return
+        dialect = db.get_bind().dialect
+        upsert_insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}.get(dialect.name)
+        if upsert_insert is not None:
+            stmt = upsert_insert(HostHeartbeat)
+            stmt = stmt.on_conflict_do_update(index_elements=['urn'], set_={
+                'state': stmt.excluded.state,
+                'last_seen': stmt.excluded.last_seen
+            })
+            await db.exec(stmt, params=rows)
+            return
+        for chunk in chunked(rows):
+            await db.exec(sa.delete(HostHeartbeat).where(HostHeartbeat.urn.in_([r['urn'] for r in chunk])))
+        await db.exec(sa.insert(HostHeartbeat), params=rows)
+
+heartbeat_buffer = HeartbeatBuffer()
+
+async def heartbeat_flush_loop(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await heartbeat_buffer.flush()
+        except Exception:
+            logger.exception('Heartbeat flush failed')
+
+async def heartbeat(urn: str, data: Heartbeat | None = None) -> BaseResult:
+    kind, _ = resolve_identifier(urn)
+    if kind != 'urn':
+        raise FieldValidationError(field_location=['path', 'urn'], message='Heartbeats are reported by host URN')
+    heartbeat_buffer.report(urn, data.state if data else HostStateEnum.ONLINE)
+    return {
+        "status": "success"
+    }
@@ -1,19 +1,21 @@
 import sqlalchemy as sa
 from fastapi import Depends
-from pydantic import AfterValidator, field_validator
+from pydantic import AfterValidator, BaseModel, field_validator
 from uuid import UUID
 from uuid_extensions import uuid7
 from orchestrix.db import metadata, DbSession
-from orchestrix.fw.service import Service, redefine_model
+from orchestrix.fw.service import Service, Expansion, redefine_model
 from orchestrix.fw.model import Core, CoreIndex, is_valid_urn
+from orchestrix.fw.exc import NotFoundError
 from ..tenant.model import TenantService, Tenant
 import fastapi
 from sqlmodel import SQLModel, Field, select
 from typing import Annotated, Literal
+from datetime import datetime
 import asyncio
 import enum
 
-__all__ = ['Host', 'HostSchema', 'HostService']
+__all__ = ['Host', 'HostSchema', 'HostService', 'HostStateEnum', 'HostStateUpdate', 'HostHeartbeat']
 
 class HostStateEnum(enum.StrEnum):
     NEW = enum.auto()
@@ -32,6 +34,19 @@ class HostSchema(Core):
 class Host(SQLModel, HostSchema, table=True):
     __tablename__ = 'hosts'
 
+class HostStateUpdate(BaseModel):
+    state: HostStateEnum
+
+class HostHeartbeat(SQLModel, table=True):
+    """
+    When a host last reported in. Not versioned, a row per host is
+    overwritten on every flush of the heartbeat buffer.
+    """
+    __tablename__ = 'host_heartbeats'
+    urn: str = Field(primary_key=True, max_length=128)
+    state: HostStateEnum
+    last_seen: datetime = Field(sa_type=sa.TIMESTAMP(timezone=True), nullable=False)
+
 class HostService(Service[Host]):
 
     @classmethod
@@ -41,6 +56,24 @@ class HostService(Service[Host]):
     @classmethod
     def schema_class(cls) -> type[HostSchema]:
         return HostSchema
+
+    @classmethod
+    def expansions(cls) -> dict[str, Expansion]:
+        return {
+            'tenant': Expansion(service=TenantService, local_field='tenant_urn', remote_field='urn')
+        }
+
+    @classmethod
+    def fast_serialization(cls) -> bool:
+        # fleet listings are the largest responses served
+        return True
+
+    @classmethod
+    def register_views(cls, router: fastapi.APIRouter, service_path: str, model_path: str):
+        super().register_views(router, service_path, model_path)
+        from .heartbeat import heartbeat
+        router.add_api_route(f'{model_path}/+heartbeat', heartbeat, methods=['POST'],
+                             operation_id='orchestrix-heartbeat-host', status_code=202)
     
     def urn(self, model: Host):
         namespace = self.urn_namespace()
@@ -48,9 +81,26 @@ class HostService(Service[Host]):
         urn = f'urn:{namespace}:{entity_type}:host({model.tenant_urn},{model.name})'
         return urn
 
+    def invalidate(self, records: list[Host], *, retired: bool = False):
+        super().invalidate(records, retired=retired)
+        if not retired:
+            from .offline import offline_detector
+            offline_detector.schedule(records)
+
     async def validate_data(self, data: HostSchema):
         await TenantService(self.request, self.db).get(data.tenant_urn)
         return await super().validate_data(data)
+
+    async def validate_many(self, items: list[HostSchema]):
+        # the tenants of the whole batch are looked up in one query
+        tenants = await TenantService(self.request, self.db).existing_urns([d.tenant_urn for d in items])
+        results = []
+        for data in items:
+            if data.tenant_urn not in tenants:
+                results.append(NotFoundError(message=f'{Tenant.__name__}({data.tenant_urn})'))
+                continue
+            results.append(await super().validate_data(data))
+        return results
     
     async def get_tenant(self, model: Host):
         result = await self.db.exec(select(Tenant).where((Tenant.urn==model.tenant_urn) & (Tenant.active == True)))
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+from pydantic import BaseModel
+from sqlmodel import select
+import asyncio
+import heapq
+import logging
+import time
+from orchestrix.db import db_sessionmaker, db_write_session
+from orchestrix.fw.model import ts_now, localize
+from orchestrix.fw.service import chunked
+from .model import Host, HostService, HostStateEnum, HostStateUpdate, HostHeartbeat
+
+__all__ = ['OfflineDetector', 'OfflineDetectorStats', 'offline_detector', 'EXPIRING_STATES']
+
+logger = logging.getLogger(__name__)
+
+# states a host leaves for OFFLINE when it stops reporting
+EXPIRING_STATES = (HostStateEnum.ONLINE, HostStateEnum.WARNING, HostStateEnum.ERROR)
+
+class OfflineDetectorStats(BaseModel):
+    tracked: int = 0
+    expired: int = 0
+    rescheduled: int = 0
+    conflicts: int = 0
+    last_run_duration: float = 0.0
+
+class OfflineDetector:
+    """
+    Moves hosts that stopped reporting to OFFLINE. The deadline of every
+    reporting host is kept in a heap, so a check only pops the hosts that
+    are overdue and costs nothing for the rest of the fleet. Overdue hosts
+    are checked against the database, which also sees heartbeats received
+    by other processes, before they are expired in one bulk write.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[datetime, str]] = []
+        self._deadlines: dict[str, datetime] = {}
+        self._stats = OfflineDetectorStats()
+
+    def timeout(self) -> timedelta:
+        from orchestrix.env import env
+        return timedelta(seconds=env.host_offline_timeout)
+
+    def touch(self, urn: str, seen: datetime):
+        """
+        Push back the deadline of a host last seen at `seen`
+        """
+        deadline = localize(seen) + self.timeout()
+        current = self._deadlines.get(urn)
+        if current is not None and current >= deadline:
+            return
+        self._deadlines[urn] = deadline
+        # earlier deadlines of the host stay in the heap and are skipped when popped
+        heapq.heappush(self._heap, (deadline, urn))
+        if len(self._heap) > 2 * len(self._deadlines) + 1024:
+            self._heap = [(d, u) for u, d in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def schedule(self, records: list[Host]):
+        for r in records:
+            if r.active and r.state in EXPIRING_STATES:
+                self.touch(r.urn, r.modified)
+
+    def due(self, now: datetime) -> list[str]:
+        urns = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, urn = heapq.heappop(self._heap)
+            if self._deadlines.get(urn) == deadline:
+                del self._deadlines[urn]
+                urns.append(urn)
+        return urns
+
+    def stats(self) -> OfflineDetectorStats:
+        return self._stats.model_copy(update={'tracked': len(self._deadlines)})
+
+    async def load(self):
+        """
+        Schedule every host in an expiring state, from its last heartbeat
+        or else from when it was last written
+        """
+        query = (select(Host.urn, Host.modified, HostHeartbeat.last_seen)
+                 .outerjoin(HostHeartbeat, HostHeartbeat.urn == Host.urn)
+                 .where((Host.active == True) & Host.state.in_(EXPIRING_STATES)))
+        async with db_sessionmaker()() as db:
+            result = await db.stream(query)
+            async for urn, modified, last_seen in result:
+                self.touch(urn, max(localize(modified), localize(last_seen)) if last_seen else modified)
+
+    async def expire(self, now: datetime | None = None) -> int:
+        """
+        Set overdue hosts OFFLINE, returning how many were expired
+        """
+        now = now or ts_now()
+        urns = self.due(now)
+        if not urns:
+            return 0
+        start = time.perf_counter()
+        timeout = self.timeout()
+        try:
+            async with db_write_session() as db:
+                svc = HostService(None, db)
+                current = await svc.get_many(urns)
+                last_seen = {}
+                for chunk in chunked(urns):
+                    result = await db.exec(select(HostHeartbeat.urn, HostHeartbeat.last_seen)
+                                           .where(HostHeartbeat.urn.in_(chunk)))
+                    last_seen.update({urn: localize(seen) for urn, seen in result.all()})
+
+                changes = []
+                for urn in urns:
+                    model = current.get(urn)
+                    if model is None or model.state not in EXPIRING_STATES:
+                        continue
+                    seen = max(localize(model.modified), last_seen.get(urn, localize(model.modified)))
+                    if seen + timeout > now:
+                        # reported to another process, or written since it was scheduled
+                        self.touch(urn, seen)
+                        self._stats.rescheduled += 1
+                        continue
+                    changes.append((model, HostStateUpdate(state=HostStateEnum.OFFLINE)))
+                results = await svc.bulk_system_update(changes) if changes else []
+                await db.commit()
+        except BaseException:
+            # the deadlines were popped, the hosts are checked again next run
+            for urn in urns:
+                self.touch(urn, now - timeout)
+            raise
+
+        conflicts = sum(1 for r in results if r.status == 'error')
+        expired = len(changes) - conflicts
+        self._stats.expired += expired
+        self._stats.conflicts += conflicts
+        self._stats.last_run_duration = time.perf_counter() - start
+        if expired:
+            logger.info('%d hosts went offline', expired)
+        return expired
+
+    async def run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.expire()
+            except Exception:
+                logger.exception('Offline host check failed')
+
+offline_detector = OfflineDetector()
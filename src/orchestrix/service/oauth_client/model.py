@@ -4,8 +4,9 @@ from pydantic import AfterValidator, field_validator
 from uuid import UUID
 from uuid_extensions import uuid7
 from orchestrix.db import metadata, DbSession
-from orchestrix.fw.service import Service, redefine_model
+from orchestrix.fw.service import Service, Expansion, redefine_model
 from orchestrix.fw.model import Core, CoreIndex, is_valid_urn
+from orchestrix.fw.exc import NotFoundError
 from ..tenant import TenantService, Tenant
 import fastapi
 from sqlmodel import SQLModel, Field, select
@@ -33,6 +34,12 @@ class OAuthClientService(Service[OAuthClient]):
     def schema_class(cls) -> type[OAuthClientSchema]:
         return OAuthClientSchema
     
+    @classmethod
+    def expansions(cls) -> dict[str, Expansion]:
+        return {
+            'tenant': Expansion(service=TenantService, local_field='tenant_urn', remote_field='urn')
+        }
+
     @classmethod
     def urn_entity_type(cls) -> Literal['oauth_client']:
         return 'oauth_client'
@@ -46,6 +53,17 @@ class OAuthClientService(Service[OAuthClient]):
     async def validate_data(self, data: OAuthClientSchema):
         await TenantService(self.request, self.db).get(data.tenant_urn)
         return await super().validate_data(data)
+
+    async def validate_many(self, items: list[OAuthClientSchema]):
+        # the tenants of the whole batch are looked up in one query
+        tenants = await TenantService(self.request, self.db).existing_urns([d.tenant_urn for d in items])
+        results = []
+        for data in items:
+            if data.tenant_urn not in tenants:
+                results.append(NotFoundError(message=f'{Tenant.__name__}({data.tenant_urn})'))
+                continue
+            results.append(await super().validate_data(data))
+        return results
     
     async def get_tenant(self, model: OAuthClient):
         return await TenantService(self.request, self.db).get(model.tenant_urn)
\ No newline at end of file
@@ -1,3 +1,7 @@
 from .model import *
 
-
+def __getattr__(name):
+    # routes are built on first use, see orchestrix.fw.routing
+    if name == 'router':
+        return TenantService.router()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
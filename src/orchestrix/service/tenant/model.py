@@ -5,11 +5,11 @@ import fastapi
 from typing import Annotated
 from uuid_extensions import uuid7
 from orchestrix.db import DbSession, metadata
-from orchestrix.fw.service import Service, redefine_model
+from orchestrix.fw.service import Service, Expansion, redefine_model
 from orchestrix.fw.model import Core, CoreIndex
 from sqlmodel import SQLModel, Field, Session, select, Relationship
 
-__all__ = ['Tenant', 'TenantSchema', 'TenantService', 'router']
+__all__ = ['Tenant', 'TenantSchema', 'TenantService']
 
 class TenantSchema(Core):
     pass
@@ -27,5 +27,12 @@ class TenantService(Service[Tenant]):
     @classmethod
     def schema_class(cls) -> type[TenantSchema]:
         return TenantSchema
-    
-router = TenantService.router()   
+
+    @classmethod
+    def expansions(cls) -> dict[str, Expansion]:
+        from ..host.model import HostService
+        from ..oauth_client.model import OAuthClientService
+        return {
+            'hosts': Expansion(service=HostService, local_field='urn', remote_field='tenant_urn', many=True),
+            'oauth_clients': Expansion(service=OAuthClientService, local_field='urn', remote_field='tenant_urn', many=True)
+        }
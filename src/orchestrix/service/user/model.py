@@ -6,6 +6,7 @@ from uuid_extensions import uuid7
 from orchestrix.db import metadata, DbSession
 from orchestrix.fw.service import Service, redefine_model
 from orchestrix.fw.model import Core, CoreIndex, is_valid_urn
+from orchestrix.fw.exc import NotFoundError, OrchestrixError
 from ..tenant import TenantService, Tenant
 import fastapi
 from sqlmodel import SQLModel, Field, select
@@ -50,6 +51,21 @@ class UserService(Service[User]):
         await TenantService(self.request, self.db).get(data.tenant_urn)
         await self.validate_password(data)
         return await super().validate_data(data)
+
+    async def validate_many(self, items: list[UserSchema]):
+        # the tenants of the whole batch are looked up in one query
+        tenants = await TenantService(self.request, self.db).existing_urns([d.tenant_urn for d in items])
+        results = []
+        for data in items:
+            if data.tenant_urn not in tenants:
+                results.append(NotFoundError(message=f'{Tenant.__name__}({data.tenant_urn})'))
+                continue
+            try:
+                await self.validate_password(data)
+                results.append(await super().validate_data(data))
+            except OrchestrixError as e:
+                results.append(e)
+        return results
     
     async def validate_password(self, data: UserSchema):
         pass
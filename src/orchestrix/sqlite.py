@@ -0,0 +1,188 @@
+from contextlib import asynccontextmanager
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import AsyncIterator, Callable
+import asyncio
+import logging
+import sqlalchemy as sa
+import time
+from .env import env
+
+__all__ = ['configure_sqlite', 'WriteQueue', 'on_commit', 'DEFERRED_COMMIT_KEY']
+
+logger = logging.getLogger(__name__)
+
+# session.info key of the callbacks a write queue runs once its group commits
+DEFERRED_COMMIT_KEY = 'orchestrix.deferred_commit'
+
+def on_commit(session: sa.orm.Session, callback: Callable[[], None]):
+    """
+    Run `callback` once the transaction of `session` is committed to the
+    database. A session of the write queue only commits a savepoint, its
+    callbacks wait for the commit of its group.
+    """
+    deferred = session.info.get(DEFERRED_COMMIT_KEY)
+    if deferred is None:
+        callback()
+    else:
+        deferred.append(callback)
+
+def configure_sqlite(engine: AsyncEngine):
+    """
+    Set the pragmas of the SQLite profile on every new connection
+    """
+    pragmas = {
+        'journal_mode': env.sqlite_journal_mode,
+        'synchronous': env.sqlite_synchronous,
+        'busy_timeout': env.sqlite_busy_timeout,
+        'mmap_size': env.sqlite_mmap_size,
+        'cache_size': env.sqlite_cache_size,
+    }
+
+    @sa.event.listens_for(engine.sync_engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+class WriteQueue:
+    """
+    SQLite allows one writer at a time, transactions of concurrent writers
+    fail with "database is locked" once they wait longer than the busy
+    timeout. The queue runs writing sessions one at a time on a single
+    connection, each in a savepoint of a shared `BEGIN IMMEDIATE`
+    transaction. The transaction commits once no session is waiting, or
+    after `max_group` sessions, and the sessions of the group return when
+    it did. Reads keep using the other connections of the pool.
+    """
+
+    def __init__(self, engine: AsyncEngine, max_group: int = 100):
+        self.engine = engine
+        self.max_group = max_group
+        self._lock = asyncio.Lock()
+        self._waiting = 0
+        self._conn: AsyncConnection | None = None
+        self._group: list[tuple[asyncio.Future, list[Callable[[], None]]]] = []
+        # ends of sessions that run on when the session is cancelled
+        self._tasks: set[asyncio.Task] = set()
+        self.sessions = 0
+        self.commits = 0
+        self.failed_commits = 0
+        self.wait_time_total = 0.0
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        start = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._lock.acquire()
+        except asyncio.CancelledError:
+            # the session holding the lock may have left its group open for this one
+            self._detach(self._flush())
+            raise
+        finally:
+            self._waiting -= 1
+        self.wait_time_total += time.perf_counter() - start
+        self.sessions += 1
+        try:
+            conn = await self._begin()
+            callbacks: list[Callable[[], None]] = []
+            session = AsyncSession(bind=conn, join_transaction_mode='create_savepoint',
+                                   expire_on_commit=False)
+            session.sync_session.info[DEFERRED_COMMIT_KEY] = callbacks
+            try:
+                yield session
+            finally:
+                # rolls back the savepoint of a session that failed
+                await session.close()
+            committed = asyncio.get_running_loop().create_future()
+            self._group.append((committed, callbacks))
+        finally:
+            # runs to the end when this session is cancelled, so the lock is
+            # released and the transaction is not left open
+            await asyncio.shield(self._detach(self._leave()))
+        await committed
+
+    def _detach(self, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush(self):
+        await self._lock.acquire()
+        await self._leave()
+
+    async def _leave(self):
+        """
+        Release the lock, ending the transaction first when the last session
+        of the group left or the database rolled it back
+        """
+        try:
+            if self._conn is not None and (self._waiting == 0 or len(self._group) >= self.max_group
+                                           or not await self._in_transaction(self._conn)):
+                await self._end()
+        finally:
+            self._lock.release()
+
+    async def _begin(self) -> AsyncConnection:
+        if self._conn is None:
+            conn = await self.engine.connect()
+            try:
+                # take the write lock up front, a deferred transaction that
+                # read first fails instead of waiting when another process wrote
+                await conn.exec_driver_sql('BEGIN IMMEDIATE')
+            except BaseException:
+                await conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    async def _in_transaction(conn: AsyncConnection) -> bool:
+        # sqlite rolls the whole transaction back on some errors, the
+        # savepoints released into it are lost with it
+        return await conn.run_sync(lambda c: c.connection.driver_connection.in_transaction)
+
+    async def _end(self):
+        """
+        Commit the group and resolve the sessions waiting on it, or roll the
+        transaction back when no session of it succeeded, then close its
+        connection
+        """
+        conn, group = self._conn, self._group
+        self._conn, self._group = None, []
+        if not group:
+            try:
+                await conn.rollback()
+            except Exception:
+                logger.exception('Rollback of the write transaction failed')
+                await conn.invalidate()
+            finally:
+                await conn.close()
+            return
+        try:
+            if not await self._in_transaction(conn):
+                raise RuntimeError('The write transaction was rolled back by the database')
+            await conn.commit()
+        except Exception as e:
+            self.failed_commits += 1
+            logger.exception('Group commit of %d write sessions failed', len(group))
+            for committed, _ in group:
+                if not committed.done():
+                    committed.set_exception(e)
+            await conn.invalidate()
+            return
+        finally:
+            await conn.close()
+        self.commits += 1
+        for committed, callbacks in group:
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception:
+                    logger.exception('Commit callback failed')
+            # a session cancelled while waiting for the commit cancelled its future
+            if not committed.done():
+                committed.set_result(None)
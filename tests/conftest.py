@@ -0,0 +1,73 @@
+from fastapi.testclient import TestClient
+import pytest
+from orchestrix.env import env
+from orchestrix.fw import cache as fw_cache, service as fw_service
+from orchestrix.fw.cache import LRUCache
+from orchestrix.fw.watch import change_notifier
+from orchestrix.metrics import metrics
+from orchestrix.service.host.heartbeat import heartbeat_buffer
+from orchestrix.service.host.offline import offline_detector
+from orchestrix import db as orchestrix_db
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+@pytest.fixture(autouse=True)
+def db_url(tmp_path, monkeypatch):
+    """
+    A scratch SQLite database per test, with the process wide state of
+    the previous test cleared
+    """
+    url = f'sqlite+aiosqlite:///{tmp_path}/orchestrix.db'
+    monkeypatch.setattr(env, 'db_url', url)
+    monkeypatch.setattr(env, 'compaction_interval', 0)
+    monkeypatch.setattr(env, 'db_schema', 'create')
+    monkeypatch.setattr(fw_cache, 'default_cache', None)
+    monkeypatch.setattr(fw_service, 'default_cache', None)
+    heartbeat_buffer.__init__()
+    offline_detector.__init__()
+    change_notifier.__init__()
+    metrics.reset()
+    orchestrix_db._counters.reset()
+    yield url
+    assert orchestrix_db._engine is None, 'a test left the engine open'
+
+@pytest.fixture
+def cache(monkeypatch):
+    """
+    Enable the entity cache for the test
+    """
+    cache = LRUCache(maxsize=1000, ttl=60)
+    monkeypatch.setattr(fw_cache, 'default_cache', cache)
+    monkeypatch.setattr(fw_service, 'default_cache', cache)
+    return cache
+
+@pytest.fixture
+def client(db_url):
+    from orchestrix.app import app
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+async def engine(db_url):
+    """
+    The process engine with the schema created, for tests calling services
+    directly. Mark the test with `pytest.mark.anyio`.
+    """
+    engine = orchestrix_db.init_engine()
+    await orchestrix_db.prepare_schema(engine)
+    yield engine
+    await orchestrix_db.dispose_engine()
+
+@pytest.fixture
+def tenant(client) -> str:
+    r = client.post('/tenants', json={'name': 'acme'})
+    assert r.status_code == 200, r.text
+    return r.json()['record']['urn']
+
+@pytest.fixture
+def host_payload(tenant):
+    def payload(name: str, **data) -> dict:
+        return {'name': name, 'tenant_urn': tenant, 'hostname': f'{name}.local', **data}
+    return payload
@@ -0,0 +1,36 @@
+TENANT = 'urn:orchestrix:tenant:acme'
+
+def documents(hosts: int, **data) -> list[dict]:
+    docs = [{'metadata': {'entity_type': 'host'},
+             'data': {'name': f'h{i}', 'tenant_urn': TENANT, 'hostname': f'h{i}', **data}} 
+            for i in range(hosts)]
+    # children listed first still resolve, parents are applied first
+    return docs + [{'metadata': {'entity_type': 'tenant', 'urn': TENANT}, 'data': {'name': 'acme'}}]
+
+def actions(response) -> list[str]:
+    assert response.status_code == 200, response.text
+    return [r['action'] for r in response.json()['results']]
+
+def test_apply_creates_then_converges(client):
+    assert actions(client.post('/+apply', json={'documents': documents(3)})) == ['create'] * 4
+    assert actions(client.post('/+apply', json={'documents': documents(3)})) == ['unchanged'] * 4
+    docs = documents(3)
+    docs[1]['data']['state'] = 'online'
+    assert actions(client.post('/+apply', json={'documents': docs})) == ['unchanged', 'update', 'unchanged', 'unchanged']
+    assert client.get('/hosts/h1').json()['record']['version'] == 2
+
+def test_dry_run_writes_nothing(client):
+    r = client.post('/+apply', params={'dry_run': True}, json={'documents': documents(2)})
+    assert actions(r) == ['create'] * 3 and r.json()['dry_run']
+    assert client.get('/tenants').json()['records'] == []
+
+def test_apply_is_all_or_nothing(client):
+    docs = documents(2)
+    docs.append({'metadata': {'entity_type': 'bogus'}, 'data': {}})
+    docs.append({'metadata': {'entity_type': 'host', 'urn': 'urn:orchestrix:host:other'}, 'data': docs[0]['data']})
+    r = client.post('/+apply', json={'documents': docs})
+    assert r.status_code == 422
+    locs = [d['loc'][:4] for d in r.json()['detail']]
+    assert ['body', 'documents', 3, 'metadata'] in locs
+    assert ['body', 'documents', 4, 'metadata'] in locs
+    assert client.get('/tenants').json()['records'] == []
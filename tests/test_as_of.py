@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+import sqlite3
+from orchestrix.db import db_sessionmaker
+from orchestrix.fw.model import ts_now
+from orchestrix.service.host import HostService
+from orchestrix.service.tenant import TenantService
+
+async def tick():
+    # versions written in the same clock tick could not be told apart
+    await asyncio.sleep(0.01)
+
+@pytest.mark.anyio
+async def test_as_of_reads_the_versions_current_then(engine):
+    async with db_sessionmaker()() as db:
+        tenant = await TenantService(None, db).create(TenantService.createmodel_class()(name='acme'))
+        svc = HostService(None, db)
+        h1 = await svc.create(HostService.createmodel_class()(name='h1', tenant_urn=tenant.urn, hostname='a'))
+        await tick()
+        first = ts_now()
+        await tick()
+        await svc.update(h1.urn, HostService.updatemodel_class()(tenant_urn=tenant.urn, hostname='b'))
+        h2 = await svc.create(HostService.createmodel_class()(name='h2', tenant_urn=tenant.urn, hostname='c'))
+        await tick()
+        second = ts_now()
+        await tick()
+        await svc.delete(h1.urn)
+        await db.commit()
+
+        page = await svc.list_active(as_of=first)
+        assert [(r.name, r.hostname) for r in page.records] == [('h1', 'a')]
+        page = await svc.list_active(as_of=second, etag=True)
+        assert sorted((r.name, r.hostname) for r in page.records) == [('h1', 'b'), ('h2', 'c')]
+        assert [r.name for r in (await svc.list_active()).records] == ['h2']
+        assert (await svc.get(h1.urn, as_of=first)).hostname == 'a'
+        assert (await svc.get(h1.urn, as_of=second)).version == 2
+
+@pytest.mark.anyio
+async def test_as_of_listing_uses_the_modified_index(engine, db_url):
+    db = sqlite3.connect(db_url.split(':///', 1)[1])
+    plan = db.execute('EXPLAIN QUERY PLAN SELECT max(uid), count(*) FROM hosts '
+                      'WHERE modified <= ? AND (deleted IS NULL OR deleted > ?)', ('', '')).fetchall()
+    assert 'COVERING INDEX ix_host_modified_deleted' in plan[0][3]
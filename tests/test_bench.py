@@ -0,0 +1,34 @@
+from datetime import datetime
+import pytest
+from orchestrix.bench.crud import OPERATIONS, OperationResult, SuiteResult, compare, percentile, run_suite
+
+def suite(**results: tuple[float, float]) -> SuiteResult:
+    return SuiteResult(started=datetime.now(), dialect='sqlite', tenants=1, hosts=1, oauth_clients=0, 
+                       duration=1, results=[OperationResult(operation=op, concurrency=1, throughput=t, p99_ms=p)
+                                            for op, (t, p) in results.items()])
+
+def test_percentile():
+    # of sorted latencies
+    assert percentile([], 0.5) == 0
+    assert percentile([1, 2, 3, 4], 0.5) == 3
+    assert percentile(list(range(100)), 0.99) == 99
+    assert percentile([1, 2], 1) == 2
+
+def test_compare_reports_regressions_beyond_the_threshold():
+    baseline = suite(get=(1000, 10), list=(100, 50), update=(200, 20))
+    current = suite(get=(850, 10), list=(95, 60), create=(10, 1000))
+    regressions = compare(baseline, current, threshold=10)
+    assert [(r.operation, r.metric, round(r.change)) for r in regressions] == [
+        ('get', 'throughput', -15), ('list', 'p99_ms', 20)]
+    assert compare(baseline, current, threshold=25) == []
+
+@pytest.mark.anyio
+async def test_suite_runs_every_operation(db_url):
+    measured = []
+    result = await run_suite(operations=list(OPERATIONS), concurrency=[2], duration=0.05,
+                             tenants=2, hosts=10, oauth_clients=2, progress=measured.append)
+    assert [r.operation for r in result.results] == list(OPERATIONS)
+    assert result.dialect == 'sqlite' and measured == result.results
+    for r in result.results:
+        assert r.requests > 0 and r.errors == 0, r
+    assert SuiteResult.model_validate_json(result.model_dump_json()) == result
@@ -0,0 +1,81 @@
+def test_bulk_create_update_delete(client, tenant, host_payload):
+    r = client.post('/hosts/+bulk', json={'records': [host_payload(f'h{i}') for i in range(5)]})
+    assert r.status_code == 200, r.text
+    urns = [x['record']['urn'] for x in r.json()['results']]
+    assert r.json()['status'] == 'success' and len(urns) == 5
+
+    r = client.put('/hosts/+bulk', json={'records': [
+        {'urn': urn, 'data': {'tenant_urn': tenant, 'hostname': 'up'}} for urn in urns]})
+    assert r.status_code == 200, r.text
+    assert {x['record']['version'] for x in r.json()['results']} == {2}
+
+    r = client.request('DELETE', '/hosts/+bulk', json={'urns': urns[:2]})
+    assert r.json()['status'] == 'success'
+    assert client.get(f'/hosts/{urns[0]}').status_code == 404
+    assert len(client.get('/hosts').json()['records']) == 3
+
+def test_atomic_bulk_writes_nothing_on_error(client, tenant, host_payload):
+    client.post('/hosts', json=host_payload('h0'))
+    r = client.post('/hosts/+bulk', json={'records': [host_payload('h0'), host_payload('h1')]})
+    assert r.status_code >= 400
+    assert [x['name'] for x in client.get('/hosts').json()['records']] == ['h0']
+
+def test_partial_bulk_reports_failed_items(client, tenant, host_payload):
+    client.post('/hosts', json=host_payload('h0'))
+    r = client.post('/hosts/+bulk', params={'mode': 'partial'}, json={'records': [
+        host_payload('h0'), host_payload('h1'), host_payload('h1'),
+        host_payload('h2', tenant_urn='urn:orchestrix:tenant:missing')]})
+    assert r.status_code == 200, r.text
+    assert [x['status'] for x in r.json()['results']] == ['error', 'success', 'error', 'error']
+    assert sorted(x['name'] for x in client.get('/hosts').json()['records']) == ['h0', 'h1']
+
+def test_bulk_update_of_missing_record(client, tenant):
+    r = client.put('/hosts/+bulk', params={'mode': 'partial'}, json={'records': [
+        {'urn': 'urn:orchestrix:host:host(x,y)', 'data': {'tenant_urn': tenant, 'hostname': 'x'}}]})
+    assert r.json()['results'][0]['status'] == 'error'
+
+def test_bulk_create_continues_history_of_deleted_urn(client, tenant, host_payload):
+    created = client.post('/hosts', json=host_payload('h0')).json()['record']
+    assert client.delete(f"/hosts/{created['urn']}").status_code == 200
+
+    for mode in ('atomic', 'partial'):
+        r = client.post('/hosts/+bulk', params={'mode': mode}, 
+                        json={'records': [host_payload('h0'), host_payload(f'new_{mode}')]})
+        assert r.status_code == 200, r.text
+        assert r.json()['status'] == 'success', r.json()
+        record = r.json()['results'][0]['record']
+        assert record['id'] == created['id']
+        assert client.delete(f"/hosts/{created['urn']}").status_code == 200
+
+    history = client.get('/hosts/+search', params={'only_active': False, 'name': 'h0'}).json()['records']
+    assert [h['version'] for h in history] == [1, 2, 3]
+
+def test_apply_recreates_deleted_urn(client, tenant, host_payload):
+    urn = client.post('/hosts', json=host_payload('h0')).json()['record']['urn']
+    client.delete(f'/hosts/{urn}')
+    r = client.post('/+apply', json={'documents': [
+        {'metadata': {'entity_type': 'host', 'urn': urn}, 'data': host_payload('h0')}]})
+    assert r.status_code == 200, r.text
+    assert r.json()['results'][0]['action'] == 'create'
+    assert client.get(f'/hosts/{urn}').json()['record']['version'] == 2
+
+def test_bulk_validation_queries_do_not_grow_with_the_batch(client, tenant, host_payload):
+    from orchestrix.metrics import metrics
+
+    def queries(method, url, json):
+        before = metrics.queries
+        r = client.request(method, url, json=json)
+        assert r.status_code == 200, r.text
+        return metrics.queries - before
+
+    counts = []
+    for size in (2, 40):
+        names = [f'q{size}_{i}' for i in range(size)]
+        created = queries('POST', '/hosts/+bulk', {'records': [host_payload(n) for n in names]})
+        urns = [f'urn:orchestrix:host:host({tenant},{n})' for n in names]
+        updated = queries('PUT', '/hosts/+bulk', {'records': [
+            {'urn': urn, 'data': {'tenant_urn': tenant, 'hostname': 'up'}} for urn in urns]})
+        applied = queries('POST', '/+apply', {'documents': [
+            {'metadata': {'entity_type': 'host'}, 'data': host_payload(f'{n}_applied')} for n in names]})
+        counts.append((created, updated, applied))
+    assert counts[0] == counts[1]
@@ -0,0 +1,57 @@
+import pytest
+from orchestrix.db import db_sessionmaker
+from orchestrix.env import OrchestrixSettings
+from orchestrix.fw.cache import LRUCache
+from orchestrix.fw.exc import NotFoundError
+from orchestrix.service.host import HostService
+from orchestrix.service.tenant import TenantService
+
+def test_cache_is_off_by_default(monkeypatch, client, tenant):
+    monkeypatch.delenv('ORCHESTRIX_CACHE_ENABLED', raising=False)
+    assert OrchestrixSettings().cache_enabled is False
+    client.get(f'/tenants/{tenant}')
+    assert client.get('/+cache').json()['hits'] == 0
+
+def test_get_reads_through_the_cache(cache, client, tenant, host_payload):
+    urn = client.post('/hosts', json=host_payload('h')).json()['record']['urn']
+    before = client.get('/+cache').json()
+    for _ in range(3):
+        assert client.get(f'/hosts/{urn}').status_code == 200
+    stats = client.get('/+cache').json()
+    assert stats['misses'] - before['misses'] == 1
+    assert stats['hits'] - before['hits'] == 2
+
+def test_writes_invalidate_cached_records(cache, client, tenant, host_payload):
+    urn = client.post('/hosts', json=host_payload('h')).json()['record']['urn']
+    client.get(f'/hosts/{urn}')
+    client.put(f'/hosts/{urn}', json={'tenant_urn': tenant, 'hostname': 'new'})
+    record = client.get(f'/hosts/{urn}').json()['record']
+    assert (record['hostname'], record['version']) == ('new', 2)
+    assert client.get('/hosts/h').json()['record']['version'] == 2
+    client.delete(f'/hosts/{urn}')
+    assert client.get(f'/hosts/{urn}').status_code == 404
+
+def test_version_floor_rejects_stale_values():
+    cache = LRUCache(ttl=60)
+    cache.invalidate('k', 2)
+    cache.set('k', 'v1', 1)
+    assert cache.get('k') is None
+    cache.set('k', 'v2', 2)
+    assert cache.get('k') == 'v2'
+
+@pytest.mark.anyio
+async def test_transaction_reads_its_own_writes(cache, engine):
+    async with db_sessionmaker()() as db:
+        tenant = await TenantService(None, db).create(TenantService.createmodel_class()(name='acme'))
+        host = await HostService(None, db).create(
+            HostService.createmodel_class()(name='h', tenant_urn=tenant.urn, hostname='h'))
+        await db.commit()
+    async with db_sessionmaker()() as db:
+        svc = HostService(None, db)
+        await svc.get(host.urn)
+        await svc.delete(host.urn)
+        with pytest.raises(NotFoundError):
+            await svc.get(host.urn)
+        await db.rollback()
+    async with db_sessionmaker()() as db:
+        assert (await HostService(None, db).get(host.urn)).version == 1
@@ -0,0 +1,86 @@
+from click.testing import CliRunner
+import asyncio
+import httpx
+import json
+import pytest
+from orchestrix import cli
+from orchestrix.fw import command
+
+@pytest.fixture
+def server(monkeypatch):
+    """
+    Answer the requests of CLI commands, recording how many are in flight
+    for each path
+    """
+    state = {'requests': [], 'in_flight': {}, 'max_in_flight': {}, 'overlap': 0}
+
+    async def handler(request: httpx.Request):
+        path = request.url.path
+        state['requests'].append((request.method, path, json.loads(request.content or b'null')))
+        state['in_flight'][path] = state['in_flight'].get(path, 0) + 1
+        state['max_in_flight'][path] = max(state['max_in_flight'].get(path, 0), state['in_flight'][path])
+        state['overlap'] = max(state['overlap'], sum(state['in_flight'].values()))
+        await asyncio.sleep(0.01)
+        state['in_flight'][path] -= 1
+        if path == '/+apply':
+            docs = json.loads(request.content)['documents']
+            return httpx.Response(200, json={'results': [{'action': 'create', 'urn': d['metadata'].get('urn')} 
+                                                         for d in docs]})
+        return httpx.Response(200, json={'status': 'success'})
+
+    def client(*, concurrency: int = 8, http2: bool = False):
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(command, 'async_client', client)
+    return state
+
+def write(tmp_path, documents: list[dict]) -> str:
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps(documents))
+    return str(path)
+
+def test_update_serializes_documents_of_one_record(server, tmp_path):
+    docs = [{'name': name, 'hostname': f'{name}{i}'} for i in range(3) for name in ('a', 'b', 'c')]
+    result = CliRunner().invoke(cli.cli, ['host', 'update', write(tmp_path, docs), '-c', '8'])
+    assert result.exit_code == 0, result.output
+    assert set(server['max_in_flight'].values()) == {1}
+    # different records still update concurrently
+    assert server['overlap'] == 3
+    for name in ('a', 'b', 'c'):
+        sent = [body['hostname'] for _, path, body in server['requests'] if path.endswith(f'/{name}')]
+        assert sent == [f'{name}0', f'{name}1', f'{name}2']
+
+def test_apply_rejects_zero_batch_size(server, tmp_path):
+    result = CliRunner().invoke(cli.cli, ['apply', write(tmp_path, []), '--batch-size', '0'])
+    assert result.exit_code == 2
+    assert server['requests'] == []
+
+def test_apply_of_empty_manifest(server, tmp_path):
+    result = CliRunner().invoke(cli.cli, ['apply', write(tmp_path, [])])
+    assert result.exit_code == 0, result.output
+    assert server['requests'] == []
+
+def test_apply_in_batches(server, tmp_path):
+    docs = [{'metadata': {'entity_type': 'tenant', 'urn': f'urn:orchestrix:tenant:t{i}'}, 'data': {'name': f't{i}'}}
+            for i in range(5)]
+    result = CliRunner().invoke(cli.cli, ['apply', write(tmp_path, docs), '--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert [len(body['documents']) for _, _, body in server['requests']] == [2, 2, 1]
+
+def test_apply_rejects_documents_without_metadata(server, tmp_path):
+    docs = [{'metadata': {'entity_type': 'tenant'}, 'data': {'name': 't0'}}, {'data': {'name': 't1'}}]
+    result = CliRunner().invoke(cli.cli, ['apply', write(tmp_path, docs), '--batch-size', '1'])
+    assert result.exit_code == 2
+    assert 'Document 1 has no metadata.entity_type' in result.output
+    assert server['requests'] == []
+
+def test_jobs_without_a_json_result(capsys):
+    async def no_content():
+        return httpx.Response(204)
+
+    async def text():
+        return httpx.Response(200, text='ok')
+
+    failed = asyncio.run(command.run_concurrently([('a', no_content), ('b', text)]))
+    assert failed == 0
+    out = capsys.readouterr().out
+    assert 'a: 204' in out and 'b: 200' in out
@@ -0,0 +1,41 @@
+import asyncio
+import httpx
+import pytest
+import sqlite3
+from orchestrix.app import app, lifespan
+from orchestrix.env import env
+
+def test_create_returns_the_inserted_record(client, tenant, host_payload):
+    r = client.post('/hosts', json=host_payload('h'))
+    assert r.status_code == 200, r.text
+    assert (r.json()['record']['version'], r.json()['record']['active']) == (1, True)
+    r = client.post('/hosts', json=host_payload('h'))
+    assert r.status_code == 422
+    assert r.json()['detail'][0]['type'] == 'already_exist_error'
+
+def test_create_after_delete_continues_the_history(client, tenant, host_payload):
+    first = client.post('/hosts', json=host_payload('h')).json()['record']
+    client.delete(f"/hosts/{first['urn']}")
+    again = client.post('/hosts', json=host_payload('h')).json()['record']
+    assert (again['id'], again['version']) == (first['id'], 2)
+
+@pytest.mark.anyio
+@pytest.mark.parametrize('write_queue', [True, False])
+async def test_concurrent_creates_leave_one_active_row(monkeypatch, db_url, write_queue):
+    monkeypatch.setattr(env, 'sqlite_write_queue', write_queue)
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            r = await client.post('/tenants', json={'name': 'acme'})
+            tenant = r.json()['record']['urn']
+
+            async def create():
+                await asyncio.sleep(0)
+                return await client.post('/hosts', json={'name': 'h', 'tenant_urn': tenant, 'hostname': 'h'})
+            responses = await asyncio.gather(*[create() for _ in range(20)])
+
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses == [200] + [422] * 19, [r.text for r in responses if r.status_code != 422]
+    assert {r.json()['detail'][0]['type'] for r in responses[1:] if r.status_code == 422} <= {'already_exist_error'}
+    db = sqlite3.connect(db_url.split(':///', 1)[1])
+    assert db.execute('SELECT count(*) FROM hosts WHERE active').fetchone() == (1,)
@@ -0,0 +1,39 @@
+from sqlalchemy.pool import StaticPool
+import pytest
+from orchestrix import db
+from orchestrix.db import create_engine, db_engine, dispose_engine, init_engine, pool_stats, InstrumentedPool
+from orchestrix.env import env
+
+def test_engine_honours_pool_settings(monkeypatch):
+    monkeypatch.setattr(env, 'db_pool_size', 3)
+    monkeypatch.setattr(env, 'db_max_overflow', 7)
+    monkeypatch.setattr(env, 'db_pool_timeout', 12)
+    engine = create_engine()
+    assert isinstance(engine.pool, InstrumentedPool)
+    assert engine.pool.size() == 3
+    assert engine.pool._max_overflow == 7
+    assert engine.pool._timeout == 12
+
+def test_memory_database_uses_one_connection():
+    engine = create_engine('sqlite+aiosqlite:///:memory:')
+    assert isinstance(engine.pool, StaticPool)
+
+@pytest.mark.anyio
+async def test_engine_is_shared_per_process():
+    engine = init_engine()
+    try:
+        assert db_engine() is engine
+        assert init_engine() is engine
+    finally:
+        await dispose_engine()
+    assert db._engine is None
+
+def test_requests_reuse_pooled_connections(client, tenant):
+    for _ in range(20):
+        assert client.get(f'/tenants/{tenant}').status_code == 200
+    stats = pool_stats()
+    assert stats.checkouts >= 20
+    # connections are returned to the pool and reused, not opened per request
+    assert stats.connects <= env.db_pool_size + env.db_max_overflow
+    assert stats.checked_out == 0
+    assert client.get('/+pool').json()['checkouts'] >= stats.checkouts
@@ -0,0 +1,58 @@
+def conditional_get(client, url: str, **params):
+    r = client.get(url, params=params)
+    assert r.status_code == 200 and r.headers['etag']
+    return r.headers['etag'], client.get(url, params=params, headers={'If-None-Match': r.headers['etag']})
+
+def test_unchanged_listing_is_not_modified(client, tenant, host_payload):
+    client.post('/hosts', json=host_payload('h1'))
+    for url, params in [('/hosts', {}), ('/hosts/+history', {}), ('/hosts/+search', {'name': 'h1'}), 
+                        ('/hosts', {'fields': 'name'})]:
+        etag, r = conditional_get(client, url, **params)
+        assert r.status_code == 304 and r.headers['etag'] == etag and not r.content
+
+def test_record_etag_follows_its_version(client, tenant, host_payload):
+    urn = client.post('/hosts', json=host_payload('h1')).json()['record']['urn']
+    etag, r = conditional_get(client, f'/hosts/{urn}')
+    assert r.status_code == 304
+    client.put(f'/hosts/{urn}', json={'tenant_urn': tenant, 'hostname': 'x'})
+    assert client.get(f'/hosts/{urn}', headers={'If-None-Match': etag}).status_code == 200
+
+def test_delete_changes_the_history_etag(client, tenant, host_payload):
+    urn = client.post('/hosts', json=host_payload('h1')).json()['record']['urn']
+    client.post('/hosts', json=host_payload('h2'))
+    etags = {url: client.get(url).headers['etag'] for url in ('/hosts/+history', '/hosts')}
+
+    # deleting adds no version, it changes when the last one was deleted
+    client.delete(f'/hosts/{urn}')
+    for url, etag in etags.items():
+        r = client.get(url, headers={'If-None-Match': etag})
+        assert r.status_code == 200, url
+        assert r.headers['etag'] != etag
+
+def test_replaced_record_changes_the_listing_etag(client, tenant, host_payload):
+    urn = client.post('/hosts', json=host_payload('h1')).json()['record']['urn']
+    etag = client.get('/hosts').headers['etag']
+    # same number of active records
+    client.delete(f'/hosts/{urn}')
+    client.post('/hosts', json=host_payload('h2'))
+    assert client.get('/hosts', headers={'If-None-Match': etag}).status_code == 200
+
+def test_expanded_listings_are_not_tagged(client, tenant, host_payload):
+    client.post('/hosts', json=host_payload('h1'))
+    etag = client.get('/hosts').headers['etag']
+    r = client.get('/hosts', params={'expand': 'tenant'}, headers={'If-None-Match': etag})
+    assert r.status_code == 200 and 'etag' not in r.headers
+
+def test_page_etag_only_follows_its_own_records(client, tenant, host_payload):
+    urns = [client.post('/hosts', json=host_payload(f'h{i}')).json()['record']['urn'] for i in range(9)]
+    first = client.get('/hosts', params={'page_size': 3})
+    cursor = first.json()['meta']['next_page'].split('cursor=')[1].split('&')[0]
+    second = client.get('/hosts', params={'page_size': 3, 'cursor': cursor})
+
+    # the new version of a record of the first page is listed at the end
+    client.put(f'/hosts/{urns[0]}', json={'tenant_urn': tenant, 'hostname': 'x'})
+    r = client.get('/hosts', params={'page_size': 3}, headers={'If-None-Match': first.headers['etag']})
+    assert r.status_code == 200
+    r = client.get('/hosts', params={'page_size': 3, 'cursor': cursor}, 
+                   headers={'If-None-Match': second.headers['etag']})
+    assert r.status_code == 304
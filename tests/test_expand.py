@@ -0,0 +1,31 @@
+from orchestrix.env import env
+
+def test_to_one_expansion_embeds_the_related_record(client, tenant, host_payload):
+    urn = client.post('/hosts', json=host_payload('h')).json()['record']['urn']
+    r = client.get(f'/hosts/{urn}', params={'expand': 'tenant'})
+    assert r.status_code == 200, r.text
+    assert r.json()['record']['tenant']['urn'] == tenant
+    records = client.get('/hosts', params={'expand': 'tenant'}).json()['records']
+    assert [h['tenant']['name'] for h in records] == ['acme']
+
+def test_to_many_expansion_is_capped_and_counted(client, tenant, host_payload, monkeypatch):
+    monkeypatch.setattr(env, 'expand_limit', 3)
+    names = [f'h{i}' for i in range(5)]
+    for name in names:
+        client.post('/hosts', json=host_payload(name))
+    client.delete(f"/hosts/{client.get('/hosts/h4').json()['record']['urn']}")
+    client.post('/tenants', json={'name': 'empty'})
+
+    r = client.get('/tenants', params={'expand': 'hosts,oauth_clients'})
+    assert r.status_code == 200, r.text
+    acme, empty = sorted(r.json()['records'], key=lambda t: t['name'])
+    # the first created active hosts
+    assert [h['name'] for h in acme['hosts']] == names[:3]
+    assert (acme['hosts_count'], acme['oauth_clients'], acme['oauth_clients_count']) == (4, [], 0)
+    assert (empty['hosts'], empty['hosts_count']) == ([], 0)
+
+    record = client.get(f'/tenants/{tenant}', params={'expand': 'hosts'}).json()['record']
+    assert (len(record['hosts']), record['hosts_count']) == (3, 4)
+
+def test_unknown_expansion_is_rejected(client, tenant):
+    assert client.get('/tenants', params={'expand': 'nope'}).status_code == 422
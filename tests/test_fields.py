@@ -0,0 +1,31 @@
+def test_sparse_fields(client, tenant, host_payload):
+    for name in ('h1', 'h2'):
+        client.post('/hosts', json=host_payload(name))
+    r = client.get('/hosts', params={'fields': 'name,hostname'})
+    assert r.status_code == 200, r.text
+    records = r.json()['records']
+    assert [set(h) for h in records] == [{'name', 'hostname'}] * 2
+    assert [h['hostname'] for h in records] == ['h1.local', 'h2.local']
+
+def test_sparse_fields_page_like_records(client, tenant, host_payload):
+    for i in range(3):
+        client.post('/hosts', json=host_payload(f'h{i}'))
+    first = client.get('/hosts', params={'fields': 'name', 'page_size': 2}).json()
+    assert [h['name'] for h in first['records']] == ['h0', 'h1']
+    rest = client.get(first['meta']['next_page']).json()
+    assert [h['name'] for h in rest['records']] == ['h2']
+
+def test_columnar_layout(client, tenant, host_payload):
+    for name in ('h1', 'h2'):
+        client.post('/hosts', json=host_payload(name))
+    body = client.get('/hosts', params={'fields': 'name,version', 'layout': 'columnar'}).json()
+    assert 'records' not in body
+    assert body['columns'] == {'name': ['h1', 'h2'], 'version': [1, 1]}
+    # every field without a selection
+    columns = client.get('/hosts/+search', params={'layout': 'columnar', 'name': 'h2'}).json()['columns']
+    assert columns['hostname'] == ['h2.local'] and columns['tenant_urn'] == [tenant]
+
+def test_invalid_field_selections(client, tenant):
+    assert client.get('/hosts', params={'fields': 'nope'}).status_code == 422
+    assert client.get('/hosts', params={'fields': 'name', 'expand': 'tenant'}).status_code == 422
+    assert client.get('/hosts', params={'layout': 'columnar', 'expand': 'tenant'}).status_code == 422
@@ -0,0 +1,56 @@
+import pytest
+from orchestrix.db import db_sessionmaker, db_write_session
+from orchestrix.service.host import HostService
+from orchestrix.service.host.heartbeat import heartbeat_buffer
+from orchestrix.service.host.model import HostStateEnum, HostStateUpdate
+from orchestrix.service.tenant import TenantService
+
+@pytest.mark.anyio
+async def test_heartbeats_write_a_version_only_when_the_state_changes(engine):
+    async with db_write_session() as db:
+        tenant = await TenantService(None, db).create(TenantService.createmodel_class()(name='acme'))
+        svc = HostService(None, db)
+        hosts = [await svc.create(HostService.createmodel_class()(name=f'h{i}', tenant_urn=tenant.urn, 
+                                                                  hostname='h', state='online'))
+                 for i in range(3)]
+        await db.commit()
+
+    for _ in range(5):
+        for host in hosts:
+            heartbeat_buffer.report(host.urn, HostStateEnum.ONLINE)
+    heartbeat_buffer.report(hosts[0].urn, HostStateEnum.WARNING)
+    heartbeat_buffer.report('urn:orchestrix:host:missing', HostStateEnum.ONLINE)
+    assert heartbeat_buffer.stats().pending == 4
+    assert await heartbeat_buffer.flush() == 3
+
+    stats = heartbeat_buffer.stats()
+    assert (stats.received, stats.pending, stats.state_changes, stats.unknown) == (17, 0, 1, 1)
+    async with db_sessionmaker()() as db:
+        current = await HostService(None, db).get_many([h.urn for h in hosts])
+    assert [(current[h.urn].state, current[h.urn].version) for h in hosts] == [
+        ('warning', 2), ('online', 1), ('online', 1)]
+
+def test_heartbeat_route_is_buffered(client, host_payload):
+    urn = client.post('/hosts', json=host_payload('h')).json()['record']['urn']
+    r = client.post(f'/hosts/{urn}/+heartbeat', json={'state': 'warning'})
+    assert r.status_code == 202
+    assert client.get(f'/hosts/{urn}').json()['record']['state'] != 'warning'
+    assert client.get('/+heartbeat').json()['pending'] == 1
+    assert client.post('/hosts/h/+heartbeat').status_code == 422
+
+@pytest.mark.anyio
+async def test_system_updates_of_superseded_records_fail(engine):
+    async with db_write_session() as db:
+        tenant = await TenantService(None, db).create(TenantService.createmodel_class()(name='acme'))
+        svc = HostService(None, db)
+        h1, h2 = [await svc.create(HostService.createmodel_class()(name=n, tenant_urn=tenant.urn, hostname='h'))
+                  for n in ('h1', 'h2')]
+        await db.commit()
+        # written by someone else since the records were loaded
+        await svc.update(h1.urn, HostService.updatemodel_class()(tenant_urn=tenant.urn, hostname='x'))
+        results = await svc.bulk_system_update([(h, HostStateUpdate(state=HostStateEnum.OFFLINE)) 
+                                                for h in (h1, h2)])
+        await db.commit()
+        assert [r.status for r in results] == ['error', 'success']
+        assert results[1].record.state == 'offline' and results[1].record.version == 2
+        assert (await svc.get(h1.urn)).hostname == 'x'
@@ -0,0 +1,38 @@
+from uuid import UUID
+import pytest
+from orchestrix.fw.model import is_valid_name, is_valid_urn, resolve_identifier
+
+ID = '0192b6f0-7c3e-7a1b-9c2d-3e4f5a6b7c8d'
+
+@pytest.mark.parametrize('identifier, kind', [
+    ('urn:orchestrix:host:host(urn:orchestrix:tenant:t,h)', 'urn'),
+    ('urn:NOT VALID', 'urn'),
+    (ID, 'id'),
+    (ID.replace('-', ''), 'id'),
+    (UUID(ID), 'id'),
+    ('h1', 'name'),
+    ('a' * 36, 'name'),
+])
+def test_resolve_identifier(identifier, kind):
+    resolved_kind, value = resolve_identifier(identifier)
+    assert resolved_kind == kind
+    if kind == 'id':
+        assert value == UUID(ID)
+
+def test_validators():
+    assert is_valid_name('h_1') == 'h_1'
+    for name in ('', 'Upper', 'a' * 65):
+        with pytest.raises(ValueError):
+            is_valid_name(name)
+    assert is_valid_urn('urn:orchestrix:tenant:t')
+    for urn in ('', 'orchestrix:tenant:t', 'urn:x:y:' + 'a' * 130):
+        with pytest.raises(ValueError):
+            is_valid_urn(urn)
+
+def test_get_by_urn_id_and_name(client, tenant, host_payload):
+    record = client.post('/hosts', json=host_payload('h')).json()['record']
+    for identifier in (record['urn'], record['id'], record['id'].replace('-', ''), 'h'):
+        r = client.get(f'/hosts/{identifier}')
+        assert r.status_code == 200, identifier
+        assert r.json()['record']['uid'] == record['uid']
+    assert client.get('/hosts/urn:orchestrix:host:missing').status_code == 404
@@ -0,0 +1,42 @@
+import logging
+from orchestrix.env import env
+from orchestrix.metrics import Histogram, metrics
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((1, 5))
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+    assert histogram.cumulative() == [('1', 2), ('5', 3), ('+Inf', 4)]
+    assert (histogram.count, histogram.sum) == (4, 14.5)
+
+def test_requests_and_queries_are_measured(client, tenant, host_payload):
+    client.post('/hosts', json=host_payload('h1'))
+    client.get('/hosts')
+    client.get('/no/such/route')
+
+    assert metrics.requests[('orchestrix-list-host', 'GET', 200)].count == 1
+    assert metrics.requests[('unmatched', 'GET', 404)].count == 1
+    assert metrics.request_queries['orchestrix-list-host'].sum >= 1
+    assert metrics.queries >= metrics.request_queries['orchestrix-list-host'].sum
+
+    r = client.get('/+metrics')
+    assert r.headers['content-type'].startswith('text/plain; version=0.0.4')
+    text = r.text
+    assert ('orchestrix_request_duration_seconds_count{operation_id="orchestrix-list-host",'
+            'method="GET",status="200"} 1') in text
+    assert '# TYPE orchestrix_db_queries_total counter' in text
+    assert 'orchestrix_db_pool_checkouts_total' in text
+    assert 'orchestrix_cache_hit_ratio 0.0' in text
+
+def test_server_timing_header(client, tenant, monkeypatch):
+    assert 'server-timing' not in client.get('/hosts').headers
+    monkeypatch.setattr(env, 'debug_query_header', True)
+    timing = client.get('/hosts').headers['server-timing']
+    assert timing.startswith('db;dur=') and 'queries"' in timing
+
+def test_slow_queries_are_logged(client, tenant, monkeypatch, caplog):
+    monkeypatch.setattr(env, 'slow_query_threshold', 1e-9)
+    with caplog.at_level(logging.WARNING, logger='orchestrix.db.slow'):
+        client.get('/hosts')
+    assert metrics.slow_queries >= 1
+    assert any('orchestrix-list-host' in r.getMessage() for r in caplog.records)
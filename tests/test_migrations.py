@@ -0,0 +1,71 @@
+from alembic import command
+from alembic.config import Config
+from pathlib import Path
+from sqlmodel import SQLModel
+import pytest
+import sqlalchemy as sa
+import sqlite3
+
+ROOT = Path(__file__).parent.parent
+
+@pytest.fixture
+def alembic_config(db_url, monkeypatch) -> Config:
+    monkeypatch.chdir(ROOT)
+    return Config(str(ROOT / 'alembic.ini'))
+
+def database(db_url: str) -> sqlite3.Connection:
+    return sqlite3.connect(db_url.split(':///', 1)[1])
+
+def indexes(db: sqlite3.Connection, table: str) -> set[str]:
+    return {row[1] for row in db.execute(f'PRAGMA index_list({table})')}
+
+def test_upgrade_adds_active_urn_index_to_existing_tables(alembic_config, db_url):
+    command.upgrade(alembic_config, '476d25360634')
+    db = database(db_url)
+    # versions left active by creates that raced before the index existed
+    for version, modified in [(1, '2026-01-01 00:00:00'), (2, '2026-01-02 00:00:00')]:
+        db.execute("INSERT INTO tenants (uid, id, urn, name, created, modified, version, active) "
+                   "VALUES (?, ?, 'urn:orchestrix:tenant:t', 't', ?, ?, ?, 1)",
+                   (f'{version:032x}', f'{version:032x}', modified, modified, version))
+    db.commit()
+    command.upgrade(alembic_config, 'head')
+
+    assert 'ix_tenant_urn_active' in indexes(db, 'tenants')
+    rows = db.execute('SELECT version, active, deleted FROM tenants ORDER BY version').fetchall()
+    assert rows == [(1, 0, '2026-01-01 00:00:00'), (2, 1, None)]
+    with pytest.raises(sqlite3.IntegrityError):
+        db.execute("INSERT INTO tenants (uid, id, urn, name, created, modified, version, active) "
+                   "VALUES ('ff', 'ff', 'urn:orchestrix:tenant:t', 't', '', '', 3, 1)")
+
+def test_downgrade_to_initial_schema(alembic_config, db_url):
+    command.upgrade(alembic_config, 'head')
+    command.downgrade(alembic_config, '476d25360634')
+    db = database(db_url)
+    assert 'ix_tenant_urn_active' not in indexes(db, 'tenants')
+    assert 'host_heartbeats' not in {r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+def schema(db: sqlite3.Connection) -> dict[str, set[tuple]]:
+    tables = [r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                       "AND name NOT IN ('alembic_version') AND name NOT LIKE 'sqlite_%'")]
+    return {t: {(r[1], r[2], r[4]) for r in db.execute(f'PRAGMA index_list({t})')} for t in tables}
+
+@pytest.mark.filterwarnings('ignore:.*expression-based index')
+def test_migrations_build_the_schema_of_the_models(alembic_config, db_url, tmp_path):
+    command.upgrade(alembic_config, 'head')
+    command.check(alembic_config)
+    SQLModel.metadata.create_all(sa.create_engine(f'sqlite:///{tmp_path}/created.db'))
+    # expression indexes are not compared by alembic
+    assert schema(database(db_url)) == schema(sqlite3.connect(tmp_path / 'created.db'))
+
+def test_upgrade_retires_duplicate_active_ids(alembic_config, db_url):
+    command.upgrade(alembic_config, 'b0e6c3a1d2f4')
+    db = database(db_url)
+    # versions left active by updates that raced before the index existed
+    for version in (1, 2):
+        db.execute("INSERT INTO tenants (uid, id, urn, name, created, modified, version, active) "
+                   "VALUES (?, 'aa', ?, 't', '', '2026-01-01 00:00:00', ?, 1)",
+                   (f'{version:032x}', f'urn:orchestrix:tenant:t{version}', version))
+    db.commit()
+    command.upgrade(alembic_config, 'head')
+    assert db.execute('SELECT version, active FROM tenants ORDER BY version').fetchall() == [(1, 0), (2, 1)]
+    assert ('ix_tenant_id_active', 1, 1) in schema(db)['tenants']
@@ -0,0 +1,100 @@
+from datetime import timedelta
+import pytest
+from orchestrix.db import db_sessionmaker, db_write_session
+from orchestrix.env import env
+from orchestrix.fw.model import ts_now
+from orchestrix.service.host import HostService
+from orchestrix.service.host.heartbeat import heartbeat_buffer
+from orchestrix.service.host.offline import offline_detector
+from orchestrix.service.tenant import TenantService
+
+async def create_hosts(**states: str) -> dict:
+    async with db_write_session() as db:
+        tenant = await TenantService(None, db).create(TenantService.createmodel_class()(name='acme'))
+        svc = HostService(None, db)
+        hosts = {name: await svc.create(HostService.createmodel_class()(name=name, tenant_urn=tenant.urn, 
+                                                                        hostname='h', state=state))
+                 for name, state in states.items()}
+        await db.commit()
+    return hosts
+
+async def states(hosts: dict) -> dict:
+    async with db_sessionmaker()() as db:
+        current = await HostService(None, db).get_many([h.urn for h in hosts.values()])
+    return {name: current[h.urn].state for name, h in hosts.items()}
+
+def test_deadlines_are_popped_once_and_pushed_back(monkeypatch):
+    monkeypatch.setattr(env, 'host_offline_timeout', 60)
+    now = ts_now()
+    offline_detector.touch('a', now)
+    offline_detector.touch('b', now)
+    offline_detector.touch('b', now + timedelta(seconds=30))
+    # an older report does not bring the deadline forward
+    offline_detector.touch('b', now)
+    assert offline_detector.stats().tracked == 2
+    assert offline_detector.due(now + timedelta(seconds=59)) == []
+    assert offline_detector.due(now + timedelta(seconds=60)) == ['a']
+    assert offline_detector.due(now + timedelta(seconds=80)) == []
+    assert offline_detector.due(now + timedelta(seconds=90)) == ['b']
+    assert offline_detector.stats().tracked == 0
+
+@pytest.mark.anyio
+async def test_hosts_that_stop_reporting_go_offline(engine, monkeypatch):
+    monkeypatch.setattr(env, 'host_offline_timeout', 60)
+    hosts = await create_hosts(quiet='online', failing='error', new='new')
+    # writes schedule the hosts in an expiring state
+    assert offline_detector.stats().tracked == 2
+    assert await offline_detector.expire(ts_now()) == 0
+
+    assert await offline_detector.expire(ts_now() + timedelta(seconds=61)) == 2
+    assert await states(hosts) == {'quiet': 'offline', 'failing': 'offline', 'new': 'new'}
+    assert offline_detector.stats().expired == 2
+    # offline hosts are not scheduled again
+    assert offline_detector.stats().tracked == 0
+
+@pytest.mark.anyio
+async def test_hosts_seen_by_another_process_are_rescheduled(engine, monkeypatch):
+    monkeypatch.setattr(env, 'host_offline_timeout', 60)
+    hosts = await create_hosts(seen='online', quiet='online')
+    later = ts_now() + timedelta(seconds=50)
+    heartbeat_buffer.report(hosts['seen'].urn, 'online', later)
+    await heartbeat_buffer.flush()
+    # only the database knows of the heartbeat
+    offline_detector.__init__()
+    offline_detector.schedule(list(hosts.values()))
+
+    assert await offline_detector.expire(ts_now() + timedelta(seconds=61)) == 1
+    assert await states(hosts) == {'seen': 'online', 'quiet': 'offline'}
+    assert offline_detector.stats().rescheduled == 1
+    assert offline_detector.due(later + timedelta(seconds=60)) == [hosts['seen'].urn]
+
+@pytest.mark.anyio
+async def test_load_schedules_from_the_last_heartbeat(engine, monkeypatch):
+    monkeypatch.setattr(env, 'host_offline_timeout', 60)
+    hosts = await create_hosts(seen='online', quiet='warning', off='offline')
+    later = ts_now() + timedelta(seconds=50)
+    heartbeat_buffer.report(hosts['seen'].urn, 'online', later)
+    await heartbeat_buffer.flush()
+    offline_detector.__init__()
+
+    await offline_detector.load()
+    assert offline_detector.stats().tracked == 2
+    assert offline_detector.due(ts_now() + timedelta(seconds=61)) == [hosts['quiet'].urn]
+    assert offline_detector.due(later + timedelta(seconds=60)) == [hosts['seen'].urn]
+
+@pytest.mark.anyio
+async def test_hosts_are_checked_again_after_a_failed_write(engine, monkeypatch):
+    monkeypatch.setattr(env, 'host_offline_timeout', 60)
+    hosts = await create_hosts(quiet='online')
+    bulk_system_update = HostService.bulk_system_update
+    async def failing(self, items, **kwargs):
+        monkeypatch.setattr(HostService, 'bulk_system_update', bulk_system_update)
+        raise RuntimeError('database went away')
+    monkeypatch.setattr(HostService, 'bulk_system_update', failing)
+
+    later = ts_now() + timedelta(seconds=61)
+    with pytest.raises(RuntimeError):
+        await offline_detector.expire(later)
+    assert offline_detector.stats().tracked == 1
+    assert await offline_detector.expire(later) == 1
+    assert await states(hosts) == {'quiet': 'offline'}
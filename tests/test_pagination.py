@@ -0,0 +1,49 @@
+def walk(client, path: str, **params) -> tuple[list[str], list[dict]]:
+    names, metas = [], []
+    r = client.get(path, params=params)
+    while True:
+        assert r.status_code == 200, r.text
+        names += [rec['name'] for rec in r.json()['records']]
+        metas.append(r.json()['meta'])
+        next_page = r.json()['meta']['next_page']
+        if not next_page:
+            return names, metas
+        r = client.get(next_page)
+
+def test_list_pages_through_every_record_once(client, tenant, host_payload):
+    expected = [f'h{i:02}' for i in range(25)]
+    for name in expected:
+        assert client.post('/hosts', json=host_payload(name)).status_code == 200
+    names, metas = walk(client, '/hosts', page_size=10)
+    assert names == expected
+    assert [m['page_size'] for m in metas] == [10, 10, 10]
+    assert metas[-1]['next_page'] is None
+
+def test_prev_cursor_returns_the_previous_page(client, tenant, host_payload):
+    for i in range(6):
+        client.post('/hosts', json=host_payload(f'h{i}'))
+    first = client.get('/hosts', params={'page_size': 3}).json()
+    assert first['meta']['prev_page'] is None
+    second = client.get(first['meta']['next_page']).json()
+    back = client.get(second['meta']['prev_page']).json()
+    assert [r['name'] for r in back['records']] == [r['name'] for r in first['records']]
+
+def test_history_and_search_are_paginated(client, tenant, host_payload):
+    urn = client.post('/hosts', json=host_payload('h')).json()['record']['urn']
+    for i in range(4):
+        r = client.put(f'/hosts/{urn}', json={'tenant_urn': tenant, 'hostname': f'v{i}'})
+        assert r.status_code == 200, r.text
+    client.post('/hosts', json=host_payload('other'))
+
+    history, _ = walk(client, f'/hosts/{urn}/+history', page_size=2)
+    assert history == ['h'] * 5
+    names, _ = walk(client, '/hosts/+search', page_size=1, hostname='v3')
+    assert names == ['h']
+
+def test_page_size_is_bounded(client, tenant):
+    assert client.get('/hosts', params={'page_size': 0}).status_code == 422
+    assert client.get('/hosts', params={'page_size': 10**6}).status_code == 422
+
+def test_invalid_cursor_is_rejected(client, tenant):
+    r = client.get('/hosts', params={'cursor': 'not-a-cursor'})
+    assert 400 <= r.status_code < 500
@@ -0,0 +1,59 @@
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel
+import fastapi
+import sqlalchemy as sa
+import time
+from orchestrix.env import env
+from orchestrix.replica import PRIMARY_COOKIE, ReadYourWritesMiddleware
+
+def replica_url(tmp_path, name: str) -> str:
+    path = tmp_path / f'{name}.db'
+    engine = sa.create_engine(f'sqlite:///{path}')
+    SQLModel.metadata.create_all(engine)
+    engine.dispose()
+    return f'sqlite+aiosqlite:///{path}'
+
+def test_reads_go_to_the_replicas(tmp_path, monkeypatch):
+    monkeypatch.setattr(env, 'db_replica_urls', [replica_url(tmp_path, 'r1'), replica_url(tmp_path, 'r2')])
+    from orchestrix.app import app
+    with TestClient(app) as client:
+        assert client.post('/tenants', json={'name': 'acme'}).status_code == 200
+        # set when the app was imported with replicas configured
+        client.cookies.clear()
+        # the replicas are not fed by the primary here, they never see the write
+        assert client.get('/tenants').json()['records'] == []
+        client.cookies.set(PRIMARY_COOKIE, str(time.time() + 60))
+        assert [t['name'] for t in client.get('/tenants').json()['records']] == ['acme']
+        client.cookies.set(PRIMARY_COOKIE, str(time.time() - 1))
+        assert client.get('/tenants').json()['records'] == []
+
+        stats = client.get('/+replicas').json()
+        assert [r['healthy'] for r in stats] == [True, True]
+        # round robin over the healthy replicas
+        assert sorted(r['sessions'] for r in stats) == [1, 1]
+
+def test_unhealthy_replicas_fall_back_to_the_primary(tmp_path, monkeypatch):
+    monkeypatch.setattr(env, 'db_replica_urls', [f'sqlite+aiosqlite:///{tmp_path}/missing/replica.db'])
+    from orchestrix.app import app
+    with TestClient(app) as client:
+        client.post('/tenants', json={'name': 'acme'})
+        assert [t['name'] for t in client.get('/tenants').json()['records']] == ['acme']
+        [replica] = client.get('/+replicas').json()
+        assert not replica['healthy'] and replica['failed_checks'] == 1 and replica['last_error']
+        assert '/missing/' in replica['url']
+        assert 'orchestrix_db_replica_healthy{replica=' in client.get('/+metrics').text
+
+def test_writes_send_the_client_to_the_primary():
+    app = fastapi.FastAPI()
+
+    @app.api_route('/', methods=['GET', 'POST'])
+    def index(fail: bool = False):
+        if fail:
+            raise fastapi.HTTPException(409)
+        return {}
+
+    client = TestClient(ReadYourWritesMiddleware(app, window=5))
+    assert PRIMARY_COOKIE not in client.get('/').cookies
+    assert PRIMARY_COOKIE not in client.post('/', params={'fail': True}).cookies
+    until = float(client.post('/').cookies[PRIMARY_COOKIE])
+    assert time.time() < until <= time.time() + 5
@@ -0,0 +1,87 @@
+from datetime import timedelta
+import pytest
+import sqlite3
+from orchestrix.db import db_sessionmaker
+from orchestrix.env import OrchestrixSettings
+from orchestrix.fw.model import ts_now
+from orchestrix.fw.retention import RetentionPolicy, compact
+from orchestrix.service.host import HostService
+from orchestrix.service.tenant import TenantService
+
+@pytest.fixture
+def policy(monkeypatch):
+    policy = RetentionPolicy(keep_last=3)
+    monkeypatch.setattr(HostService, 'retention', classmethod(lambda cls: policy))
+    return policy
+
+async def write_history(hosts: int, updates: int) -> list[str]:
+    async with db_sessionmaker()() as db:
+        tenant = await TenantService(None, db).create(TenantService.createmodel_class()(name='acme'))
+        svc = HostService(None, db)
+        UpdateModel = HostService.updatemodel_class()
+        urns = []
+        for i in range(hosts):
+            host = await svc.create(HostService.createmodel_class()(name=f'h{i}', tenant_urn=tenant.urn, 
+                                                                    hostname='h'))
+            for j in range(updates):
+                await svc.update(host.urn, UpdateModel(tenant_urn=tenant.urn, hostname=f'h{j}'))
+            urns.append(host.urn)
+        await db.commit()
+    return urns
+
+def versions(db_url: str) -> list[tuple]:
+    db = sqlite3.connect(db_url.split(':///', 1)[1])
+    return db.execute('SELECT name, version, active FROM hosts ORDER BY name, version').fetchall()
+
+def test_compaction_is_opt_in(monkeypatch):
+    monkeypatch.delenv('ORCHESTRIX_COMPACTION_INTERVAL', raising=False)
+    assert OrchestrixSettings().compaction_interval == 0
+    assert HostService.retention() is None
+
+@pytest.mark.anyio
+async def test_without_policy_history_is_kept(engine, db_url):
+    await write_history(1, 5)
+    assert (await compact(HostService)).reclaimed == 0
+    assert len(versions(db_url)) == 6
+
+@pytest.mark.anyio
+async def test_compaction_keeps_the_last_versions(engine, db_url, policy):
+    await write_history(4, 9)
+    assert (await compact(HostService, dry_run=True)).reclaimed == 4 * 6
+    assert len(versions(db_url)) == 40
+
+    # pages smaller than the reclaimable set, and not dividing it
+    result = await compact(HostService, batch_size=7)
+    assert result.reclaimed == 4 * 6
+    rows = versions(db_url)
+    for i in range(4):
+        assert [(v, a) for n, v, a in rows if n == f'h{i}'] == [(7, 0), (8, 0), (9, 0), (10, 1)]
+    assert (await compact(HostService)).reclaimed == 0
+
+@pytest.mark.anyio
+async def test_recent_and_daily_versions_are_kept(engine, db_url, policy):
+    policy.keep_last, policy.keep_for, policy.thin_daily = 0, timedelta(days=1), True
+    await write_history(1, 5)
+    assert (await compact(HostService)).reclaimed == 0
+    # a day later, only the last version of the day it was written is kept
+    assert (await compact(HostService, now=ts_now() + timedelta(days=2))).reclaimed == 4
+    assert [v for _, v, _ in versions(db_url)] == [5, 6]
+    policy.max_age = timedelta(days=30)
+    assert (await compact(HostService, now=ts_now() + timedelta(days=60))).reclaimed == 1
+    assert [v for _, v, _ in versions(db_url)] == [6]
+
+@pytest.mark.anyio
+async def test_each_batch_ranks_only_its_records(engine, db_url, policy, monkeypatch):
+    from orchestrix.fw import retention
+    ranked = []
+    original = retention.reclaimable_query
+    def spy(model_class, policy, now, dialect_name, ids=None):
+        ranked.append(ids)
+        return original(model_class, policy, now, dialect_name, ids)
+    monkeypatch.setattr(retention, 'reclaimable_query', spy)
+
+    await write_history(5, 5)
+    assert (await compact(HostService, batch_size=2)).reclaimed == 5 * 2
+    assert [len(ids) for ids in ranked] == [2, 2, 1]
+    assert len({i for ids in ranked for i in ids}) == 5
+    assert all(len([r for r in versions(db_url) if r[0] == f'h{i}']) == 4 for i in range(5))
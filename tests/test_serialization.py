@@ -0,0 +1,28 @@
+import json
+import pytest
+from orchestrix.bench import serialization
+from orchestrix.fw.service import PaginationMeta
+from orchestrix.service.host import HostService
+
+def responses(client, urn: str, cursor: str) -> list[dict]:
+    return [client.get('/hosts').json(),
+            client.get(f'/hosts/{urn}').json(),
+            client.get('/hosts/+watch', params={'since': cursor, 'timeout': 0}).json()]
+
+def test_fast_serialization_responds_the_same(client, tenant, host_payload, monkeypatch):
+    assert HostService.fast_serialization()
+    cursor = client.get('/hosts/+watch', params={'timeout': 0}).json()['cursor']
+    urn = client.post('/hosts', json=host_payload('h1', state='online')).json()['record']['urn']
+    client.post('/hosts', json=host_payload('h2'))
+    fast = responses(client, urn, cursor)
+
+    monkeypatch.setattr(HostService, 'fast_serialization', classmethod(lambda cls: False))
+    assert responses(client, urn, cursor) == fast
+
+@pytest.mark.anyio
+async def test_fast_path_matches_the_response_model():
+    field = serialization.list_route().response_field
+    records = serialization.make_records(3)
+    meta = PaginationMeta(page_size=3)
+    assert (json.loads(await serialization.standard(field, records, meta)) ==
+            json.loads(await serialization.fast(field, records, meta)))
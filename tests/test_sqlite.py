@@ -0,0 +1,145 @@
+import asyncio
+import pytest
+import sqlalchemy as sa
+import sqlite3
+from orchestrix.sqlite import WriteQueue, on_commit
+
+@pytest.fixture
+async def queue(engine):
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql('CREATE TABLE items (name TEXT)')
+    return WriteQueue(engine)
+
+async def insert(session, name: str):
+    await session.execute(sa.text('INSERT INTO items VALUES (:name)'), {'name': name})
+
+def names(db_url: str) -> list[str]:
+    db = sqlite3.connect(db_url.split(':///', 1)[1])
+    return [name for name, in db.execute('SELECT name FROM items ORDER BY name')]
+
+def assert_idle(queue: WriteQueue, db_url: str):
+    assert queue._conn is None and not queue._lock.locked()
+    assert queue.engine.pool.checkedout() == 0
+    # the write lock of the database is free
+    db = sqlite3.connect(db_url.split(':///', 1)[1], timeout=0)
+    db.execute('BEGIN IMMEDIATE')
+    db.rollback()
+
+@pytest.mark.anyio
+async def test_concurrent_sessions_commit_together(queue, db_url):
+    committed = []
+
+    async def write(name: str):
+        async with queue.session() as session:
+            await insert(session, name)
+            on_commit(session.sync_session, lambda: committed.append(name))
+            await session.commit()
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*[write(f'n{i}') for i in range(5)])
+    assert names(db_url) == [f'n{i}' for i in range(5)]
+    assert sorted(committed) == names(db_url)
+    assert queue.commits < 5
+    assert_idle(queue, db_url)
+
+@pytest.mark.anyio
+async def test_failed_session_is_rolled_back(queue, db_url):
+    with pytest.raises(RuntimeError):
+        async with queue.session() as session:
+            await insert(session, 'failed')
+            raise RuntimeError()
+    # the last session out ends the transaction
+    assert_idle(queue, db_url)
+
+    async with queue.session() as session:
+        await insert(session, 'ok')
+        await session.commit()
+    assert names(db_url) == ['ok']
+    assert_idle(queue, db_url)
+
+@pytest.mark.anyio
+async def test_failed_session_in_a_group(queue, db_url):
+    async def write(name: str, fail: bool):
+        async with queue.session() as session:
+            await insert(session, name)
+            await asyncio.sleep(0)
+            if fail:
+                raise RuntimeError()
+            await session.commit()
+
+    results = await asyncio.gather(write('a', False), write('b', True), write('c', False), 
+                                   return_exceptions=True)
+    assert [type(r) for r in results] == [type(None), RuntimeError, type(None)]
+    assert names(db_url) == ['a', 'c']
+    assert_idle(queue, db_url)
+
+@pytest.mark.anyio
+async def test_cancelled_waiter(queue, db_url):
+    entered, leave = asyncio.Event(), asyncio.Event()
+
+    async def holder():
+        async with queue.session() as session:
+            await insert(session, 'holder')
+            await session.commit()
+            entered.set()
+            await leave.wait()
+
+    async def waiter():
+        async with queue.session() as session:
+            await insert(session, 'waiter')
+            await session.commit()
+
+    first = asyncio.create_task(holder())
+    await entered.wait()
+    second = asyncio.create_task(waiter())
+    await asyncio.sleep(0)
+    assert queue._waiting == 1
+    second.cancel()
+    leave.set()
+    await asyncio.wait_for(first, 5)
+    with pytest.raises(asyncio.CancelledError):
+        await second
+    assert names(db_url) == ['holder']
+    assert_idle(queue, db_url)
+
+@pytest.mark.anyio
+async def test_waiter_cancelled_after_the_group_was_left_open(queue, db_url):
+    async def holder(waiter: asyncio.Task):
+        async with queue.session() as session:
+            await insert(session, 'holder')
+            await session.commit()
+            # leaving with a session waiting keeps the transaction open for it
+            waiter.cancel()
+
+    async def waiter():
+        async with queue.session() as session:
+            await insert(session, 'waiter')
+
+    await queue._lock.acquire()
+    second = asyncio.create_task(waiter())
+    first = asyncio.create_task(holder(second))
+    await asyncio.sleep(0)
+    # the holder queued first
+    queue._lock.release()
+    await asyncio.wait_for(asyncio.gather(first, second, return_exceptions=True), 5)
+    assert 'holder' in names(db_url)
+    assert_idle(queue, db_url)
+
+@pytest.mark.anyio
+async def test_cancelled_running_session(queue, db_url):
+    entered = asyncio.Event()
+
+    async def write():
+        async with queue.session() as session:
+            await insert(session, 'cancelled')
+            entered.set()
+            await asyncio.sleep(3600)
+
+    task = asyncio.create_task(write())
+    await entered.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await asyncio.sleep(0)
+    assert names(db_url) == []
+    assert_idle(queue, db_url)
@@ -0,0 +1,83 @@
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from pathlib import Path
+import asyncio
+import fastapi
+import json
+import pytest
+from orchestrix import app as orchestrix_app, db as orchestrix_db
+from orchestrix.env import OrchestrixSettings, env
+from orchestrix.fw.routing import LazyRouter, install_openapi
+from orchestrix.service.host import HostService
+from orchestrix.service.tenant import TenantService
+
+ROOT = Path(__file__).parent.parent
+
+def lazy_app(cache_path: str | None = None) -> tuple[fastapi.FastAPI, list[LazyRouter]]:
+    app = fastapi.FastAPI(lifespan=orchestrix_app.lifespan)
+    routers = [LazyRouter(TenantService.register(), tags=['tenant']), 
+               LazyRouter(HostService.register(), tags=['host'])]
+    app.router.routes.extend(routers)
+    install_openapi(app, cache_path)
+    return app, routers
+
+def test_lazy_routes_are_built_on_the_first_request():
+    app, (tenants, hosts) = lazy_app()
+    with TestClient(app) as client:
+        assert not tenants.loaded and not hosts.loaded
+        assert client.post('/tenants', json={'name': 'acme'}).status_code == 200
+        assert tenants.loaded and not hosts.loaded
+        assert client.get('/tenants/acme').json()['record']['name'] == 'acme'
+        assert client.get('/nothing').status_code == 404
+        assert not hosts.loaded
+
+def test_openapi_document_is_cached(tmp_path):
+    cache_path = str(tmp_path / 'openapi.json')
+    app, routers = lazy_app(cache_path)
+    with TestClient(app) as client:
+        document = client.get('/openapi.json').json()
+    assert any(p.startswith('/hosts') for p in document['paths'])
+    assert json.loads(Path(cache_path).read_text())['document'] == document
+
+    # a later start of the same code serves it without building routes
+    app, routers = lazy_app(cache_path)
+    with TestClient(app) as client:
+        assert client.get('/openapi.json').json() == document
+    assert not any(r.loaded for r in routers)
+
+def test_schema_check_requires_a_migrated_database(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setattr(env, 'db_schema', 'check')
+    app, _ = lazy_app()
+    with pytest.raises(RuntimeError, match='alembic upgrade head'):
+        with TestClient(app):
+            pass
+    asyncio.run(orchestrix_db.dispose_engine())
+
+    command.upgrade(Config(str(ROOT / 'alembic.ini')), 'head')
+    with TestClient(app) as client:
+        assert client.get('/tenants').status_code == 200
+
+def test_schema_is_checked_by_default(monkeypatch):
+    monkeypatch.delenv('ORCHESTRIX_DB_SCHEMA', raising=False)
+    assert OrchestrixSettings().db_schema == 'check'
+
+def test_shutdown_waits_for_cancelled_tasks(monkeypatch):
+    finished = []
+
+    async def background(interval: float):
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            # work the task finishes on cancellation, with the engine still open
+            await asyncio.sleep(0.01)
+            finished.append(orchestrix_db._engine is not None)
+            raise
+
+    monkeypatch.setattr(orchestrix_app, 'compaction_loop', background)
+    monkeypatch.setattr(env, 'compaction_interval', 60)
+    app, _ = lazy_app()
+    with TestClient(app):
+        pass
+    assert finished == [True]
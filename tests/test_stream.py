@@ -0,0 +1,29 @@
+import json
+from orchestrix.fw.command import iter_stream
+
+def lines(response) -> list[dict]:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_list_streams_ndjson(client, tenant, host_payload):
+    for i in range(12):
+        client.post('/hosts', json=host_payload(f'h{i}'))
+    r = client.get('/hosts', params={'stream': True})
+    assert r.headers['content-type'].startswith('application/x-ndjson')
+    assert [rec['name'] for rec in lines(r)] == [f'h{i}' for i in range(12)]
+
+def test_accept_header_streams_full_history(client, tenant, host_payload):
+    urn = client.post('/hosts', json=host_payload('h')).json()['record']['urn']
+    client.put(f'/hosts/{urn}', json={'tenant_urn': tenant, 'hostname': 'z'})
+    r = client.get('/hosts/+history', headers={'Accept': 'application/x-ndjson'})
+    assert [rec['version'] for rec in lines(r)] == [1, 2]
+
+def test_stream_selected_fields(client, tenant, host_payload):
+    client.post('/hosts', json=host_payload('h'))
+    r = client.get('/hosts', params={'stream': True, 'fields': 'name,hostname'})
+    assert lines(r) == [{'name': 'h', 'hostname': 'h.local'}]
+
+def test_iter_stream_reads_records_and_errors(client, tenant, host_payload, capsys):
+    client.post('/hosts', json=host_payload('h'))
+    assert [r['name'] for r in iter_stream(client, '/hosts/h/+history')] == ['h']
+    assert list(iter_stream(client, '/hosts/missing/+history')) == []
+    assert 'ERROR 404' in capsys.readouterr().err
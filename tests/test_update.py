@@ -0,0 +1,47 @@
+import pytest
+from orchestrix.db import db_sessionmaker
+from orchestrix.fw.exc import PreconditionFailedError
+from orchestrix.service.host import HostService
+from orchestrix.service.tenant import TenantService
+
+def test_update_supersedes_the_active_version(client, tenant, host_payload):
+    created = client.post('/hosts', json=host_payload('h')).json()['record']
+    r = client.put(f"/hosts/{created['urn']}", json={'tenant_urn': tenant, 'hostname': 'new'})
+    assert r.status_code == 200, r.text
+    updated = r.json()['record']
+    assert (updated['id'], updated['version'], updated['active']) == (created['id'], 2, True)
+
+    old, new = client.get(f"/hosts/{created['urn']}/+history").json()['records']
+    assert old['active'] is False
+    # the new version takes over the instant the old one is superseded
+    assert old['deleted'] == new['modified']
+    assert new['created'].rstrip('Z') == created['created'].rstrip('Z')
+
+def test_if_match_guards_updates_and_deletes(client, tenant, host_payload):
+    urn = client.post('/hosts', json=host_payload('h')).json()['record']['urn']
+    body = {'tenant_urn': tenant, 'hostname': 'b'}
+    r = client.put(f'/hosts/{urn}', json=body, headers={'If-Match': '"1"'})
+    assert r.status_code == 200 and r.headers['etag'].startswith('"2-')
+    assert client.put(f'/hosts/{urn}', json=body, headers={'If-Match': '"1"'}).status_code == 412
+    assert client.put('/hosts/h', json=body, headers={'If-Match': 'W/"2"'}).status_code == 200
+    assert client.put(f'/hosts/{urn}', json=body, headers={'If-Match': 'zz'}).status_code == 422
+    assert client.delete(f'/hosts/{urn}', headers={'If-Match': '"2"'}).status_code == 412
+    assert client.delete(f'/hosts/{urn}', headers={'If-Match': '"3"'}).status_code == 200
+    assert client.delete('/hosts/missing').status_code == 404
+
+@pytest.mark.anyio
+async def test_records_survive_a_rolled_back_savepoint(engine):
+    async with db_sessionmaker()() as db:
+        tenant = await TenantService(None, db).create(TenantService.createmodel_class()(name='acme'))
+        svc = HostService(None, db)
+        host = await svc.create(HostService.createmodel_class()(name='h', tenant_urn=tenant.urn, hostname='h'))
+        await db.commit()
+        current = await svc.get_many([host.urn])
+        with pytest.raises(RuntimeError):
+            async with db.begin_nested():
+                await svc.retire_records(list(current.values()))
+                raise RuntimeError()
+        # the loaded record is still readable for a retry
+        assert current[host.urn].hostname == 'h'
+        with pytest.raises(PreconditionFailedError):
+            await svc.retire(host.urn, expected_version=2)
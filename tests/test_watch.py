@@ -0,0 +1,108 @@
+from datetime import timedelta
+import pytest
+import sqlalchemy as sa
+from orchestrix.db import db_sessionmaker
+from orchestrix.env import env
+from orchestrix.fw.service import WATCH_START, decode_watch_cursor
+from orchestrix.service.host import Host, HostService
+from orchestrix.service.tenant import TenantService
+
+def test_watch_returns_changes_after_the_cursor(client, tenant, host_payload):
+    cursor = client.get('/hosts/+watch', params={'timeout': 0}).json()['cursor']
+    urn = client.post('/hosts', json=host_payload('h1')).json()['record']['urn']
+    client.post('/hosts', json=host_payload('h2'))
+
+    r = client.get('/hosts/+watch', params={'since': cursor, 'timeout': 0}).json()
+    assert [h['name'] for h in r['records']] == ['h1', 'h2']
+    assert client.get('/hosts/+watch', params={'since': r['cursor'], 'timeout': 0}).json()['records'] == []
+
+    # the deleted version is the one read before, changed again
+    client.delete(f'/hosts/{urn}')
+    r = client.get('/hosts/+watch', params={'since': r['cursor'], 'timeout': 0}).json()
+    assert [(h['name'], h['active']) for h in r['records']] == [('h1', False)]
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get('/hosts/+watch', params={'since': 'zz', 'timeout': 0}).status_code == 422
+
+async def create_hosts(db, *names: str) -> list[Host]:
+    tenants = TenantService(None, db)
+    tenant = (await tenants.search(name='acme')).records or [
+        await tenants.create(TenantService.createmodel_class()(name='acme'))]
+    svc = HostService(None, db)
+    return [await svc.create(HostService.createmodel_class()(name=n, tenant_urn=tenant[0].urn, hostname=n))
+            for n in names]
+
+async def backdate(db, host: Host, seconds: float):
+    # a transaction that took its timestamp this long before it committed
+    await db.exec(sa.update(Host).where(Host.uid == host.uid)
+                  .values(modified=host.modified - timedelta(seconds=seconds)))
+
+@pytest.mark.anyio
+async def test_changes_committed_out_of_order_are_read_once(engine, monkeypatch):
+    monkeypatch.setattr(env, 'watch_overlap', 1.0)
+    async with db_sessionmaker()() as db:
+        svc = HostService(None, db)
+        await create_hosts(db, 'h1')
+        await db.commit()
+        page = await svc.changes(WATCH_START)
+        assert [h.name for h in page.records] == ['h1']
+        cursor = page.next_cursor
+
+        late, lost = await create_hosts(db, 'h2', 'h3')
+        await backdate(db, late, 0.5)
+        await backdate(db, lost, 5)
+        await db.commit()
+
+        page = await svc.changes(cursor)
+        # h3 committed later than the overlap after its timestamp
+        assert [h.name for h in page.records] == ['h2']
+        assert (await svc.changes(page.next_cursor)).records == []
+
+@pytest.mark.anyio
+async def test_pages_of_changes_within_the_overlap(engine, monkeypatch):
+    monkeypatch.setattr(env, 'watch_overlap', 60.0)
+    async with db_sessionmaker()() as db:
+        svc = HostService(None, db)
+        await create_hosts(db, *[f'h{i}' for i in range(7)])
+        await db.commit()
+        cursor, names = WATCH_START, []
+        while (page := await svc.changes(cursor, page_size=2)).records:
+            names += [h.name for h in page.records]
+            cursor = page.next_cursor
+        assert sorted(names) == [f'h{i}' for i in range(7)]
+        # the cursor holds every change read within the overlap
+        assert len(decode_watch_cursor(cursor).seen) == 7
+
+@pytest.mark.anyio
+async def test_cursor_drops_changes_older_than_the_overlap(engine, monkeypatch):
+    monkeypatch.setattr(env, 'watch_overlap', 1.0)
+    async with db_sessionmaker()() as db:
+        svc = HostService(None, db)
+        h1, h2 = await create_hosts(db, 'h1', 'h2')
+        await backdate(db, h1, 10)
+        await db.commit()
+        page = await svc.changes(WATCH_START)
+        assert [h.name for h in page.records] == ['h1', 'h2']
+        assert set(decode_watch_cursor(page.next_cursor).seen) == {h2.uid}
+
+@pytest.mark.anyio
+async def test_cursor_of_a_large_write_is_bounded(engine, monkeypatch):
+    monkeypatch.setattr(env, 'watch_overlap', 60.0)
+    monkeypatch.setattr(env, 'watch_cursor_limit', 5)
+    async with db_sessionmaker()() as db:
+        svc = HostService(None, db)
+        hosts = await create_hosts(db, *[f'h{i}' for i in range(30)])
+        await db.commit()
+        cursor = (await svc.changes()).next_cursor
+        # one bulk update gives every new version the same timestamp
+        UpdateModel = HostService.updatemodel_class()
+        await svc.bulk_update([(h.urn, UpdateModel(tenant_urn=h.tenant_urn, hostname='up')) for h in hosts])
+        await db.commit()
+
+        names = []
+        while (page := await svc.changes(cursor, page_size=4)).records:
+            names += [h.name for h in page.records]
+            cursor = page.next_cursor
+            assert len(decode_watch_cursor(cursor).seen) <= 5
+        assert sorted(names) == sorted(h.name for h in hosts)
+        assert len(cursor) < 200